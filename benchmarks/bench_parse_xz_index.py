@@ -0,0 +1,87 @@
+"""Microbenchmark of parse_xz_index.
+
+Compare the bulk decoding of records with the implementation decoding
+each record separately, that was used before.
+
+Usage: python benchmarks/bench_parse_xz_index.py [NB_RECORDS]
+"""
+
+from collections.abc import Callable
+import random
+import sys
+from timeit import repeat
+
+from xz.common import (
+    XZError,
+    crc32,
+    decode_mbi,
+    encode_mbi,
+    pad,
+    parse_xz_index_packed,
+)
+
+
+def parse_xz_index_per_record(index: bytes) -> list[tuple[int, int]]:
+    """Implementation before bulk decoding, for reference."""
+    if len(index) < 8 or len(index) % 4:
+        raise XZError("index length")
+    index = memoryview(index)
+    if index[0]:
+        raise XZError("index indicator")
+    if crc32(index[:-4]) != index[-4:]:
+        raise XZError("index crc32")
+    size, nb_records = decode_mbi(index[1:])
+    index = index[1 + size : -4]
+    records = []
+    for _ in range(nb_records):
+        if not index:
+            raise XZError("index size")
+        size, unpadded_size = decode_mbi(index)
+        if not unpadded_size:
+            raise XZError("index record unpadded size")
+        index = index[size:]
+        if not index:
+            raise XZError("index size")
+        size, uncompressed_size = decode_mbi(index)
+        if not uncompressed_size:
+            raise XZError("index record uncompressed size")
+        index = index[size:]
+        records.append((unpadded_size, uncompressed_size))
+    if any(index):
+        raise XZError("index padding")
+    return records
+
+
+def create_index(nb_records: int) -> bytes:
+    rand = random.Random(42)
+    index = bytearray(b"\x00")
+    index += encode_mbi(nb_records)
+    for _ in range(nb_records):
+        index += encode_mbi(rand.randint(1, 1 << 21))  # unpadded size
+        index += encode_mbi(rand.randint(1, 1 << 24))  # uncompressed size
+    index += pad(len(index))
+    index += crc32(index)
+    return bytes(index)
+
+
+def bench(name: str, func: Callable[[], object], number: int = 3) -> None:
+    best = min(repeat(func, number=1, repeat=number))
+    print(f"{name:<12} {best * 1000:10.1f} ms")
+
+
+def main() -> None:
+    nb_records = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    index = create_index(nb_records)
+    print(f"{nb_records} records, index of {len(index)} bytes")
+
+    expected = parse_xz_index_per_record(index)
+    values = parse_xz_index_packed(index)
+    assert list(zip(values[::2], values[1::2])) == expected
+
+    bench("per record", lambda: parse_xz_index_per_record(index))
+
+    bench("bulk", lambda: parse_xz_index_packed(index))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Microbenchmark of small writes.
+
+Compare writing line by line into a XZ file with and without the write
+buffer (see the write_buffer_size argument of XZFile).
+
+Usage: python benchmarks/bench_small_writes.py [NB_LINES]
+"""
+
+from io import DEFAULT_BUFFER_SIZE, BytesIO
+import sys
+from timeit import repeat
+
+import xz
+
+LINE = b"2021-05-13 12:00:00 INFO request handled in 12ms path=/api/items\n"
+
+
+def write_lines(nb_lines: int, write_buffer_size: int) -> bytes:
+    fileobj = BytesIO()
+    with xz.open(fileobj, "w", write_buffer_size=write_buffer_size) as xzfile:
+        for _ in range(nb_lines):
+            xzfile.write(LINE)
+    return fileobj.getvalue()
+
+
+def bench(name: str, nb_lines: int, write_buffer_size: int, number: int = 3) -> None:
+    best = min(
+        repeat(
+            lambda: write_lines(nb_lines, write_buffer_size), number=1, repeat=number
+        )
+    )
+    print(f"{name:<12} {best * 1000:10.1f} ms")
+
+
+def main() -> None:
+    nb_lines = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    print(f"{nb_lines} lines of {len(LINE)} bytes")
+
+    assert write_lines(nb_lines, 0) == write_lines(nb_lines, DEFAULT_BUFFER_SIZE)
+
+    bench("unbuffered", nb_lines, 0)
+    bench("buffered", nb_lines, DEFAULT_BUFFER_SIZE)
+
+
+if __name__ == "__main__":
+    main()
@@ -34,17 +34,28 @@ except ImportError:  # pragma: no cover
     __version__ = "0.0.0.dev0-unknown"
 
 
+from xz.cache import BlockCache
 from xz.common import XZError
 from xz.file import XZFile
 from xz.open import xz_open
-from xz.strategy import KeepBlockReadStrategy, RollingBlockReadStrategy
+from xz.strategy import (
+    CostBlockReadStrategy,
+    KeepBlockReadStrategy,
+    MemoryBlockReadStrategy,
+    RollingBlockReadStrategy,
+    SharedBlockReadStrategy,
+)
 
 open = xz_open  # noqa: A001
 
 
 __all__: tuple[str, ...] = (
+    "BlockCache",
+    "CostBlockReadStrategy",
     "KeepBlockReadStrategy",
+    "MemoryBlockReadStrategy",
     "RollingBlockReadStrategy",
+    "SharedBlockReadStrategy",
     "XZError",
     "XZFile",
     "__version__",
@@ -1,11 +1,16 @@
+from contextlib import AbstractContextManager, nullcontext
+from functools import cached_property
 from io import DEFAULT_BUFFER_SIZE, SEEK_SET
 from lzma import FORMAT_XZ, LZMACompressor, LZMADecompressor, LZMAError
-from typing import Optional, Union
+from threading import Lock
+from typing import TYPE_CHECKING, Optional, Union
 
+from xz.cache import BlockCache
 from xz.common import (
     XZError,
     create_xz_header,
     create_xz_index_footer,
+    parse_xz_block_header,
     parse_xz_footer,
     parse_xz_index,
 )
@@ -13,9 +18,14 @@ from xz.io import IOAbstract, IOCombiner, IOStatic
 from xz.strategy import KeepBlockReadStrategy
 from xz.typing import _BlockReadStrategyType, _LZMAFiltersType, _LZMAPresetType
 
+if TYPE_CHECKING:
+    from _typeshed import WriteableBuffer
+
 
 class BlockRead:
     read_size = DEFAULT_BUFFER_SIZE
+    skip_size = 16 * DEFAULT_BUFFER_SIZE
+    max_output_size = 16 * DEFAULT_BUFFER_SIZE
 
     def __init__(
         self,
@@ -23,8 +33,12 @@ class BlockRead:
         check: int,
         unpadded_size: int,
         uncompressed_size: int,
+        memlimit: Optional[int] = None,
+        window_size: int = 0,
     ) -> None:
         self.length = uncompressed_size
+        self.memlimit = memlimit
+        self.window_size = window_size
         self.fileobj = IOCombiner(
             IOStatic(create_xz_header(check)),
             fileobj,
@@ -37,10 +51,26 @@ class BlockRead:
     def reset(self) -> None:
         self.fileobj.seek(0, SEEK_SET)
         self.pos = 0
-        self.decompressor = LZMADecompressor(format=FORMAT_XZ)
+        self.decompressor = LZMADecompressor(format=FORMAT_XZ, memlimit=self.memlimit)
+        # most recent output, ending at self.pos
+        self.window = bytearray()
+
+    def _add_to_window(self, data: bytes) -> None:
+        if self.window_size:
+            self.window += data
+            excess = len(self.window) - self.window_size
+            if excess > 0:
+                del self.window[:excess]
 
     def decompress(self, pos: int, size: int) -> bytes:
         if pos < self.pos:
+            window_pos = pos - self.pos + len(self.window)
+            if window_pos >= 0:
+                # short backward seek: no need to restart from the beginning
+                data_output = bytes(self.window[window_pos : window_pos + size])
+                if len(data_output) < size and self.pos < self.length:
+                    data_output += self.decompress(self.pos, size - len(data_output))
+                return data_output
             self.reset()
 
         skip_before = pos - self.pos
@@ -55,8 +85,21 @@ class BlockRead:
         else:
             data_input = b""
 
-        data_output = self.decompressor.decompress(data_input, skip_before + size)
+        if skip_before > self.skip_size:
+            # skip data by small chunks, so that memory usage
+            # does not depend on how far we are seeking
+            data_output = self.decompressor.decompress(data_input, self.skip_size)
+            self.pos += len(data_output)
+            self._add_to_window(data_output)
+            return b""
+
+        # decompress data by small chunks as well, so that memory usage
+        # does not depend on the size of the read (the output is copied)
+        data_output = self.decompressor.decompress(
+            data_input, skip_before + min(size, self.max_output_size)
+        )
         self.pos += len(data_output)
+        self._add_to_window(data_output)
 
         if self.pos == self.length:
             # we reached the end of the block
@@ -70,7 +113,36 @@ class BlockRead:
         return data_output[skip_before:]
 
 
+def decompress_block(
+    data: bytes,
+    check: int,
+    unpadded_size: int,
+    uncompressed_size: int,
+    memlimit: Optional[int] = None,
+) -> bytes:
+    """Decompress a whole block at once.
+
+    Contrary to BlockRead, no state is kept between calls, so this can be
+    called from worker threads (the lzma module releases the GIL).
+    """
+    decompressor = LZMADecompressor(format=FORMAT_XZ, memlimit=memlimit)
+    try:
+        data_output = decompressor.decompress(
+            create_xz_header(check)
+            + data
+            + create_xz_index_footer(check, [(unpadded_size, uncompressed_size)])
+        )
+    except LZMAError as ex:
+        raise XZError(f"block: error while decompressing: {ex}") from ex
+    if not decompressor.eof:
+        raise XZError("block: data eof")
+    return data_output
+
+
 class BlockWrite:
+    # compressed data is written to fileobj by chunks of at least this size
+    buffer_size = DEFAULT_BUFFER_SIZE
+
     def __init__(
         self,
         fileobj: IOAbstract,
@@ -82,35 +154,70 @@ class BlockWrite:
         self.check = check
         self.compressor = LZMACompressor(FORMAT_XZ, check, preset, filters)
         self.pos = 0
+        self.output_buffer = bytearray()
         if self.compressor.compress(b"") != create_xz_header(check):
             raise XZError("block: compressor header")
 
-    def _write(self, data: bytes) -> None:
-        if data:
+    def _write(self, data: bytes, *, force: bool = False) -> None:
+        self.output_buffer += data
+        if self.output_buffer and (
+            force or len(self.output_buffer) >= self.buffer_size
+        ):
             self.fileobj.seek(self.pos)
-            self.fileobj.write(data)
-            self.pos += len(data)
+            self.fileobj.write(self.output_buffer)
+            self.pos += len(self.output_buffer)
+            self.output_buffer = bytearray()
 
     def compress(self, data: bytes) -> None:
         self._write(self.compressor.compress(data))
 
     def finish(self) -> tuple[int, int]:
-        data = self.compressor.flush()
-
-        # footer
-        check, backward_size = parse_xz_footer(data[-12:])
-        if check != self.check:
-            raise XZError("block: compressor footer check")
-
-        # index
-        records = parse_xz_index(data[-12 - backward_size : -12])
-        if len(records) != 1:
-            raise XZError("block: compressor index records length")
-
-        # remaining block data
-        self._write(data[: -12 - backward_size])
-
-        return records[0]  # (unpadded_size, uncompressed_size)
+        data, record = _split_compressor_end(self.compressor.flush(), self.check)
+        self._write(data, force=True)  # remaining block data
+        return record
+
+
+def _split_compressor_end(data: bytes, check: int) -> tuple[bytes, tuple[int, int]]:
+    """Split the end of the output of a compressor of a single block.
+
+    Return the remaining block data, and the index record
+    (unpadded_size, uncompressed_size) of the block.
+    """
+    # footer
+    footer_check, backward_size = parse_xz_footer(data[-12:])
+    if footer_check != check:
+        raise XZError("block: compressor footer check")
+
+    # index
+    records = parse_xz_index(data[-12 - backward_size : -12])
+    if len(records) != 1:
+        raise XZError("block: compressor index records length")
+
+    return data[: -12 - backward_size], records[0]
+
+
+def compress_block(
+    data: Union[bytes, bytearray, memoryview],
+    check: int,
+    preset: _LZMAPresetType = None,
+    filters: _LZMAFiltersType = None,
+) -> tuple[bytes, int, int]:
+    """Compress a whole block at once.
+
+    Return the raw data of the block (including its padding), its unpadded
+    size and its uncompressed size. The raw data is identical to the one
+    written by BlockWrite for the same data, but no state is kept between
+    calls, so this can be called from worker threads.
+    """
+    compressor = LZMACompressor(FORMAT_XZ, check, preset, filters)
+    header = create_xz_header(check)
+    output = compressor.compress(data) + compressor.flush()
+    if output[: len(header)] != header:
+        raise XZError("block: compressor header")
+    block_data, (unpadded_size, uncompressed_size) = _split_compressor_end(
+        output[len(header) :], check
+    )
+    return block_data, unpadded_size, uncompressed_size
 
 
 class XZBlock(IOAbstract):
@@ -123,6 +230,9 @@ class XZBlock(IOAbstract):
         preset: _LZMAPresetType = None,
         filters: _LZMAFiltersType = None,
         block_read_strategy: Optional[_BlockReadStrategyType] = None,
+        block_cache: Optional[BlockCache] = None,
+        memlimit: Optional[int] = None,
+        seek_window: int = 0,
     ) -> None:
         super().__init__(uncompressed_size)
         self.fileobj = fileobj
@@ -130,38 +240,131 @@ class XZBlock(IOAbstract):
         self.preset = preset
         self.filters = filters
         self.block_read_strategy = block_read_strategy or KeepBlockReadStrategy()
+        self.block_cache = block_cache
+        self.memlimit = memlimit
+        self.seek_window = seek_window
         self.unpadded_size = unpadded_size
         self.operation: Union[BlockRead, BlockWrite, None] = None
+        # holds the block while it has a block reader, see _BlockIndex
+        self.reading_blocks: Optional[set[XZBlock]] = None
+        # threads reading the block wait for each other, see pread
+        self._lock = Lock()
+        # cache hits and misses are counted once per read, see _read_at
+        self._cache_hit = self._cache_missed = False
 
     @property
     def uncompressed_size(self) -> int:
         return self._length
 
+    def pread(self, pos: int, size: int) -> bytes:
+        """Read at most size bytes from pos, without changing the position.
+
+        This can be called from several threads at once.
+        """
+        size = min(size, self._length - pos)
+        parts = []
+        with self._lock:
+            self._cache_hit = self._cache_missed = False
+            while size > 0:
+                data = self._read_at(pos, size)  # do not stop if nothing was read
+                parts.append(data)
+                pos += len(data)
+                size -= len(data)
+        return b"".join(parts)
+
+    def read(self, size: int = -1) -> bytes:
+        self._cache_hit = self._cache_missed = False
+        return super().read(size)
+
+    def _readinto_loop(self, buffer: "WriteableBuffer", *, once: bool) -> int:
+        self._cache_hit = self._cache_missed = False
+        return super()._readinto_loop(buffer, once=once)
+
     def _read(self, size: int) -> bytes:
+        with self._lock:
+            return self._read_at(self._pos, size)
+
+    def _read_at(self, pos: int, size: int) -> bytes:
+        if self.block_cache is not None:
+            # data is cached and decompressed by chunks, which must
+            # not count as several hits or misses for the same read
+            cached = self.block_cache.get(
+                self,
+                pos,
+                count_hit=not self._cache_hit,
+                count_miss=not self._cache_missed,
+            )
+            if cached is not None:
+                self._cache_hit = True
+                return bytes(cached[:size])
+            self._cache_missed = True
+
         # enforce read mode
-        if not isinstance(self.operation, BlockRead):
+        # (operation is kept in a local variable, as a strategy shared
+        # with other threads may clear it at any time)
+        operation = self.operation
+        if not isinstance(operation, BlockRead):
             self._write_end()
             self.clear()
-            self.block_read_strategy.on_create(self)
-            self.operation = BlockRead(
+            operation = BlockRead(
                 self.fileobj,
                 self.check,
                 self.unpadded_size,
                 self.uncompressed_size,
+                self.memlimit,
+                self.seek_window,
             )
+            # so that other threads do not evict the block before its
+            # reader is registered (clear would then skip on_delete)
+            with self._strategy_lock:
+                self.operation = operation
+                if self.reading_blocks is not None:
+                    self.reading_blocks.add(self)
+                self.block_read_strategy.on_create(self)
 
         # read data
         self.block_read_strategy.on_read(self)
         try:
-            data = self.operation.decompress(self._pos, size)
+            data = operation.decompress(pos, size)
         except LZMAError as ex:
             raise XZError(f"block: error while decompressing: {ex}") from ex
 
-        if self._pos + len(data) == self._length:
+        if pos + len(data) == self._length:
             self.clear()
 
+        if self.block_cache is not None:
+            self.block_cache.put(self, pos, data)
+
         return data
 
+    @property
+    def _strategy_lock(self) -> AbstractContextManager[object]:
+        # the strategies which can be used by several threads at once
+        # have a lock, see _BlockReadStrategyType
+        lock = getattr(self.block_read_strategy, "lock", None)
+        if isinstance(lock, AbstractContextManager):
+            return lock
+        return nullcontext()
+
+    @cached_property
+    def dict_size(self) -> int:
+        """Dictionary size of the block, as stored in its header."""
+        self.fileobj.seek(0, SEEK_SET)
+        header = self.fileobj.read(1)
+        if header:
+            header += self.fileobj.read(header[0] * 4 + 3)
+        return parse_xz_block_header(header)
+
+    @property
+    def read_memory_usage(self) -> int:
+        """Estimation of the memory used by a reader of the block."""
+        return self.dict_size + self.seek_window + BlockRead.skip_size
+
+    def read_compressed(self) -> bytes:
+        """Return the raw data of the block, as stored in fileobj."""
+        self.fileobj.seek(0, SEEK_SET)
+        return self.fileobj.read()
+
     def writable(self) -> bool:
         return isinstance(self.operation, BlockWrite) or not self._length
 
@@ -169,6 +372,9 @@ class XZBlock(IOAbstract):
         # enforce write mode
         if not isinstance(self.operation, BlockWrite):
             self.clear()
+            if self.block_cache is not None:
+                # data is being rewritten, what was cached is stale
+                self.block_cache.remove(self)
             self.operation = BlockWrite(
                 self.fileobj,
                 self.check,
@@ -196,4 +402,6 @@ class XZBlock(IOAbstract):
     def clear(self) -> None:
         if isinstance(self.operation, BlockRead):
             self.block_read_strategy.on_delete(self)
+            if self.reading_blocks is not None:
+                self.reading_blocks.discard(self)
         self.operation = None  # free memory
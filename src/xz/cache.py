@@ -0,0 +1,99 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import TYPE_CHECKING, Optional
+
+from xz.utils import FloorDict
+
+if TYPE_CHECKING:
+    # avoid circular dependency
+    from xz.block import XZBlock
+
+
+class BlockCache:
+    """Keep recently decompressed data of blocks, up to max_size bytes.
+
+    Data is stored by ranges, as returned by the block readers.
+    When the total size exceeds max_size, least recently used
+    ranges are evicted first.
+
+    It can be used by several threads at once.
+    """
+
+    def __init__(self, max_size: int = 8 * 1024 * 1024) -> None:
+        if max_size < 0:
+            raise ValueError("max_size must be positive or zero")
+        self.max_size = max_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._ranges: OrderedDict[tuple[XZBlock, int], bytes] = OrderedDict()
+        self._block_ranges: dict[XZBlock, FloorDict[bytes]] = {}
+        self._lock = Lock()
+
+    def __repr__(self) -> str:
+        return (
+            f"<{self.__class__.__name__} size={self.size}/{self.max_size}"
+            f" hits={self.hits} misses={self.misses}>"
+        )
+
+    def get(
+        self,
+        block: "XZBlock",
+        pos: int,
+        *,
+        count_hit: bool = True,
+        count_miss: bool = True,
+    ) -> Optional[memoryview]:
+        """Return cached data of block starting at pos, or None if not cached.
+
+        Use count_hit/count_miss=False when a hit/miss was already counted
+        for the same lookup (e.g. for the next chunks of a read).
+        """
+        with self._lock:
+            try:
+                start, data = self._block_ranges[block].get_with_index(pos)
+            except KeyError:
+                pass
+            else:
+                if pos < start + len(data):
+                    if count_hit:
+                        self.hits += 1
+                    self._ranges.move_to_end((block, start))
+                    return memoryview(data)[pos - start :]
+            if count_miss:
+                self.misses += 1
+            return None
+
+    def put(self, block: "XZBlock", pos: int, data: bytes) -> None:
+        """Store data of block starting at pos."""
+        if not data or len(data) > self.max_size:
+            return
+        with self._lock:
+            self._remove(block, pos)
+            self._ranges[block, pos] = data
+            self._block_ranges.setdefault(block, FloorDict())[pos] = data
+            self.size += len(data)
+            while self.size > self.max_size:
+                self._remove(*next(iter(self._ranges)))
+
+    def _remove(self, block: "XZBlock", pos: int) -> None:
+        data = self._ranges.pop((block, pos), None)
+        if data is not None:
+            self.size -= len(data)
+            block_ranges = self._block_ranges[block]
+            del block_ranges[pos]
+            if not block_ranges:
+                del self._block_ranges[block]
+
+    def remove(self, block: "XZBlock") -> None:
+        """Remove all cached data of block (e.g. once its file is closed)."""
+        with self._lock:
+            for pos in list(self._block_ranges.get(block, ())):
+                self._remove(block, pos)
+
+    def clear(self) -> None:
+        """Remove all cached data; hits and misses counters are kept."""
+        with self._lock:
+            self._ranges.clear()
+            self._block_ranges.clear()
+            self.size = 0
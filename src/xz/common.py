@@ -1,9 +1,12 @@
 # ruff: noqa: PLR2004
 
+from array import array
 from binascii import crc32 as crc32int
+from collections.abc import Iterable
+from itertools import chain
 import lzma
 from struct import pack, unpack
-from typing import cast
+from typing import Union, cast
 
 HEADER_MAGIC = b"\xfd7zXZ\x00"
 FOOTER_MAGIC = b"YZ"
@@ -31,6 +34,44 @@ def decode_mbi(data: bytes) -> tuple[int, int]:
     raise XZError("invalid mbi")
 
 
+def encode_mbis(values: "array[int]") -> bytes:
+    """Encode consecutive mbi."""
+    data = bytearray()
+    append = data.append
+    for value in values:
+        remaining = value
+        while remaining >= 0x80:
+            append((remaining & 0x7F) | 0x80)
+            remaining >>= 7
+        append(remaining)
+    return bytes(data)
+
+
+def decode_mbis(data: bytes, count: int) -> tuple["array[int]", int]:
+    """Decode at most count consecutive mbi.
+
+    Return the values and the number of bytes they use in data;
+    fewer values are returned if data ends before.
+    """
+    values = array("Q")
+    if not count:
+        return (values, 0)
+    append = values.append
+    value = shift = 0
+    for size, byte in enumerate(data):
+        if byte & 0x80:
+            value |= (byte & 0x7F) << shift
+            shift += 7
+            if shift == 63:  # more than 9 bytes
+                raise XZError("invalid mbi")
+        else:
+            append(value | (byte << shift))
+            value = shift = 0
+            if len(values) == count:
+                return (values, size + 1)
+    return (values, len(data) - shift // 7)
+
+
 def crc32(data: bytes) -> bytes:
     return pack("<I", crc32int(data))
 
@@ -46,6 +87,15 @@ def pad(value: int) -> bytes:
     return b"\x00" * (round_up(value) - value)
 
 
+def get_check_size(check: int) -> int:
+    """Return the size of the check field of blocks, in bytes."""
+    if not 0 <= check <= 0xF:
+        raise XZError("check id")
+    if not check:
+        return 0
+    return 4 << ((check - 1) // 3)
+
+
 def create_xz_header(check: int) -> bytes:
     if not 0 <= check <= 0xF:
         raise XZError("header check")
@@ -54,23 +104,33 @@ def create_xz_header(check: int) -> bytes:
     return HEADER_MAGIC + flags + crc32(flags)
 
 
-def create_xz_index_footer(check: int, records: list[tuple[int, int]]) -> bytes:
+def create_xz_index_footer(
+    check: int, records: Union[Iterable[tuple[int, int]], "array[int]"]
+) -> bytes:
+    """Create the index and footer of a stream.
+
+    The records are (unpadded size, uncompressed size),
+    possibly packed in an array (see parse_xz_index_packed).
+    """
     if not 0 <= check <= 0xF:
         raise XZError("footer check")
+    if not isinstance(records, array):
+        records = array("Q", chain.from_iterable(records))
+    if 0 in records[::2]:
+        raise XZError("index record unpadded size")
     # index
-    index = b"\x00"
-    index += encode_mbi(len(records))
-    for unpadded_size, uncompressed_size in records:
-        if not unpadded_size:
-            raise XZError("index record unpadded size")
-        index += encode_mbi(unpadded_size)
-        index += encode_mbi(uncompressed_size)
+    # (built in place in a bytearray, to stay linear in the number of records)
+    index = bytearray(b"\x00")
+    index += encode_mbi(len(records) // 2)
+    index += encode_mbis(records)
     index += pad(len(index))
     index += crc32(index)
     # stream footer
     footer = pack("<IBB", (len(index) // 4) - 1, 0, check)
-    footer = crc32(footer) + footer + FOOTER_MAGIC
-    return index + footer
+    index += crc32(footer)
+    index += footer
+    index += FOOTER_MAGIC
+    return bytes(index)
 
 
 def parse_xz_header(header: bytes) -> int:
@@ -89,7 +149,11 @@ def parse_xz_header(header: bytes) -> int:
     return check
 
 
-def parse_xz_index(index: bytes) -> list[tuple[int, int]]:
+def parse_xz_index_packed(index: bytes) -> "array[int]":
+    """Parse an index, and return its records packed in a single array.
+
+    The values alternate between unpadded size and uncompressed size.
+    """
     if len(index) < 8 or len(index) % 4:
         raise XZError("index length")
     index = memoryview(index)
@@ -100,25 +164,28 @@ def parse_xz_index(index: bytes) -> list[tuple[int, int]]:
     size, nb_records = decode_mbi(index[1:])
     index = index[1 + size : -4]
     # records
-    records = []
-    for _ in range(nb_records):
-        if not index:
-            raise XZError("index size")
-        size, unpadded_size = decode_mbi(index)
-        if not unpadded_size:
-            raise XZError("index record unpadded size")
-        index = index[size:]
-        if not index:
-            raise XZError("index size")
-        size, uncompressed_size = decode_mbi(index)
-        if not uncompressed_size:
+    values, size = decode_mbis(index, 2 * nb_records)
+    try:
+        zero_pos = values.index(0)
+    except ValueError:
+        pass
+    else:
+        if zero_pos % 2:
             raise XZError("index record uncompressed size")
-        index = index[size:]
-        records.append((unpadded_size, uncompressed_size))
+        raise XZError("index record unpadded size")
+    if len(values) != 2 * nb_records:
+        if size != len(index):
+            raise XZError("invalid mbi")
+        raise XZError("index size")
     # index padding
-    if any(index):
+    if any(index[size:]):
         raise XZError("index padding")
-    return records
+    return values
+
+
+def parse_xz_index(index: bytes) -> list[tuple[int, int]]:
+    values = parse_xz_index_packed(index)
+    return list(zip(values[::2], values[1::2]))
 
 
 def parse_xz_footer(footer: bytes) -> tuple[int, int]:
@@ -138,5 +205,41 @@ def parse_xz_footer(footer: bytes) -> tuple[int, int]:
     return (check, backward_size)
 
 
+def parse_xz_block_header(header: bytes) -> int:
+    """Return the dictionary size of the LZMA2 filter of a block header."""
+    if len(header) < 8 or len(header) != (header[0] + 1) * 4:
+        raise XZError("block header length")
+    if crc32(header[:-4]) != header[-4:]:
+        raise XZError("block header crc32")
+    flags = header[1]
+    if flags & 0x3C:
+        raise XZError("block header flags")
+    data = memoryview(header)[2:-4]
+    # compressed size and uncompressed size
+    for flag in (0x40, 0x80):
+        if flags & flag:
+            size, _ = decode_mbi(data)
+            data = data[size:]
+    # filters
+    filter_id, props = 0, data[:0]
+    for _ in range((flags & 0x03) + 1):
+        size, filter_id = decode_mbi(data)
+        data = data[size:]
+        size, props_size = decode_mbi(data)
+        props = data[size : size + props_size]
+        if len(props) != props_size:
+            raise XZError("block header filters")
+        data = data[size + props_size :]
+    # padding
+    if any(data):
+        raise XZError("block header padding")
+    # LZMA2 is always the last filter
+    if filter_id != lzma.FILTER_LZMA2 or len(props) != 1 or props[0] > 40:
+        raise XZError("block header filters")
+    if props[0] == 40:
+        return 0xFFFFFFFF
+    return (2 | (props[0] & 1)) << (props[0] // 2 + 11)
+
+
 # find default value for check implicitly used by lzma
 DEFAULT_CHECK = parse_xz_header(lzma.compress(b"")[:12])
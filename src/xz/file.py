@@ -1,11 +1,20 @@
-from io import SEEK_CUR, SEEK_END
+from collections import deque
+from collections.abc import Iterator
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from io import DEFAULT_BUFFER_SIZE, SEEK_CUR, SEEK_END, UnsupportedOperation
+from itertools import islice
+import mmap as mmap_module
 import os
 import sys
-from typing import BinaryIO, Optional, cast
+from typing import TYPE_CHECKING, BinaryIO, Optional, TypeVar, Union, cast
 import warnings
 
+from xz.block import XZBlock, decompress_block
+from xz.cache import BlockCache
 from xz.common import DEFAULT_CHECK, XZError
-from xz.io import IOCombiner, IOProxy
+from xz.io import IOCombiner, IOProxy, IOSequentialWriter
+from xz.sequential import SequentialRead
+from xz.sidecar import _IndexFilenameType, get_signature, load_index, save_index
 from xz.strategy import RollingBlockReadStrategy
 from xz.stream import XZStream
 from xz.typing import (
@@ -14,7 +23,12 @@ from xz.typing import (
     _LZMAFiltersType,
     _LZMAPresetType,
 )
-from xz.utils import AttrProxy, parse_mode
+from xz.utils import parse_mode
+
+if TYPE_CHECKING:
+    from _typeshed import WriteableBuffer
+
+_SizeT = TypeVar("_SizeT", int, Optional[int])
 
 
 class XZFile(IOCombiner[XZStream]):
@@ -36,7 +50,19 @@ class XZFile(IOCombiner[XZStream]):
         check: int = -1,
         preset: _LZMAPresetType = None,
         filters: _LZMAFiltersType = None,
+        block_size: Optional[int] = None,
+        stream_size: Optional[int] = None,
+        write_buffer_size: int = DEFAULT_BUFFER_SIZE,
         block_read_strategy: Optional[_BlockReadStrategyType] = None,
+        block_cache: Optional[BlockCache] = None,
+        memlimit: Optional[int] = None,
+        seek_window: int = 0,
+        threads: int = 1,
+        processes: int = 1,
+        read_ahead: int = 0,
+        mmap: bool = False,
+        index_file: Optional[_IndexFilenameType] = None,
+        lazy: bool = False,
     ) -> None:
         """Open an XZ file in binary mode.
 
@@ -53,10 +79,25 @@ class XZFile(IOCombiner[XZStream]):
          - "x" and "x+" are like "w" and "w+", except that an
            FileExistsError is raised if the file already exists
 
+        In "r", "w" and "x" modes, the file object does not need to be
+        seekable (e.g. a pipe or a socket): the data is then read or
+        written sequentially, and the XZFile is not seekable either.
+        When reading sequentially, streams and blocks are parsed as they
+        are reached, so that the stream_boundaries and block_boundaries
+        attributes grow progressively; the length of the XZFile is the
+        number of bytes read so far, and the arguments used to speed up
+        random access (threads, read_ahead, index_file, etc.) are ignored.
+
         The following arguments are used during writing:
          - check: when creating a new stream
          - preset: when creating a new block
          - filters: when creating a new block
+         - block_size: to create a new block automatically once the
+           current one contains that many uncompressed bytes
+         - stream_size: to create a new stream automatically once the
+           current one contains that many uncompressed bytes
+         - write_buffer_size: writes smaller than that many bytes are
+           batched together before being compressed (0 to disable)
 
         For more information about the check/preset/filters arguments,
         refer to the documentation of the lzma module.
@@ -65,21 +106,90 @@ class XZFile(IOCombiner[XZStream]):
         for freeing block readers, and implement a different tradeoff
         between memory consumption and read speed when alternating reads
         between several blocks.
+
+        The block_cache argument allows to keep recently decompressed
+        data, so that reading it again does not need to decompress it.
+        A BlockCache instance can be shared between several files; the
+        data of a file is removed from it when the file is closed.
+
+        The memlimit argument limits the memory (in bytes) that each
+        decompressor may use; a XZError is raised when reading a block
+        that would need more.
+
+        The seek_window argument allows to keep that many bytes of the
+        most recent output of each block reader, so that short backward
+        seeks inside a block do not need to decompress it again from its
+        beginning. It is disabled by default, as it uses that much memory
+        per block reader.
+
+        The threads argument allows to decompress in parallel the blocks
+        entirely covered by a single read call; use 0 to match the number
+        of CPUs. The default of 1 means that no threads are used.
+        When block_size is set, it also allows to compress blocks in
+        parallel during writing; the output is the same whatever the
+        number of threads.
+
+        The processes argument allows to compress blocks in parallel in
+        worker processes instead of threads (when block_size is set),
+        which is useful when other threads contend for the GIL; use 0 to
+        match the number of CPUs. Data is passed to and from the worker
+        processes through shared memory. The workers are started with the
+        "spawn" method: scripts using processes must guard their main code
+        with if __name__ == "__main__".
+
+        The read_ahead argument allows to decompress in the background
+        the blocks following the one being read, which speeds up
+        sequential reads. Its value is the maximum number of
+        uncompressed bytes to decompress ahead of the current block,
+        but the next block is decompressed ahead even if it is bigger.
+
+        The mmap argument allows to read the file through a memory map
+        instead of its file object, which avoids system calls when
+        reading compressed data. It is only supported in "r" mode, for
+        files having a file descriptor.
+
+        The index_file argument is the name of a sidecar index file,
+        previously created with save_index, used to open the file without
+        parsing all of its streams. It is ignored if missing or outdated.
+
+        The lazy argument allows to only read the index of each stream
+        when opening the file: the stream headers are checked and the
+        blocks are created when a stream is first used. This speeds up
+        opening files with many streams or blocks, but some errors are
+        then only raised when reading.
         """
         self._close_fileobj = False
+        self._write_buffer = bytearray()
         self._close_check_empty = False
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._process_executor: Optional[Executor] = None
+        self._read_ahead_futures: dict[XZBlock, Future[bytes]] = {}
+        self._mmap: Optional[mmap_module.mmap] = None
+        self._sequential_writer: Optional[IOSequentialWriter] = None
+        self._sequential_reader: Optional[SequentialRead] = None
 
         super().__init__()
 
         self._mode, self._readable, self._writable = parse_mode(mode)
 
+        self.threads = self._workers_count("threads", threads)
+        self.processes = self._workers_count("processes", processes)
+        self.read_ahead = self._check_size("read_ahead", read_ahead, allow_zero=True)
+        self._check_size("block_size", block_size)
+        self.stream_size = self._check_size("stream_size", stream_size)
+        self.write_buffer_size = self._check_size(
+            "write_buffer_size", write_buffer_size, allow_zero=True
+        )
+
         # create strategy
         if block_read_strategy is None:
-            self.block_read_strategy: _BlockReadStrategyType = (
-                RollingBlockReadStrategy()
-            )
+            self.block_read_strategy = RollingBlockReadStrategy()
         else:
             self.block_read_strategy = block_read_strategy
+        self.block_cache = block_cache
+        self.memlimit = memlimit
+        self.seek_window = self._check_size("seek_window", seek_window, allow_zero=True)
+        self.index_file = index_file
 
         # get fileobj
         if isinstance(filename, (str, bytes, os.PathLike)):
@@ -90,25 +200,22 @@ class XZFile(IOCombiner[XZStream]):
         else:
             raise TypeError("filename must be a str, bytes, file or PathLike object")
 
-        # check fileobj
-        if not self.fileobj.seekable():
-            raise ValueError("filename is not seekable")
-        if self._readable and not self.fileobj.readable():
-            raise ValueError("filename is not readable")
-        if self._writable and not self.fileobj.writable():
-            raise ValueError("filename is not writable")
+        self._check_fileobj()
+        if mmap:
+            self._map_fileobj()
 
         # init
-        if self._mode[0] in "wx":
+        if self._sequential_writer is None and self._mode[0] in "wx":
             self.fileobj.truncate(0)
-        if self._readable:
-            self._init_parse()
-        if self._mode[0] == "r" and not self._fileobjs:
-            raise XZError("file: no streams")
+        if self._readable and self._sequential_reader is None:
+            self._init_parse(lazy=lazy)
 
         self.check = check if check != -1 else DEFAULT_CHECK
         self.preset = preset
         self.filters = filters
+        self.block_size = block_size
+        if self._writable:
+            self._init_last_stream_write()
 
         self._close_check_empty = self._mode[0] != "r"
 
@@ -119,8 +226,75 @@ class XZFile(IOCombiner[XZStream]):
         except KeyError:
             return None
 
-    preset = AttrProxy[_LZMAPresetType]("_last_stream")
-    filters = AttrProxy[_LZMAFiltersType]("_last_stream")
+    # the settings below apply to the data written after they are changed,
+    # so the small writes batched before are flushed first (see write)
+
+    @property
+    def check(self) -> int:
+        return self._check
+
+    @check.setter
+    def check(self, value: int) -> None:
+        self._flush_write_buffer()
+        self._check = value
+
+    @property
+    def preset(self) -> _LZMAPresetType:
+        last_stream = self._last_stream
+        return self._preset if last_stream is None else last_stream.preset
+
+    @preset.setter
+    def preset(self, value: _LZMAPresetType) -> None:
+        self._flush_write_buffer()
+        self._preset = value
+        last_stream = self._last_stream
+        if last_stream is not None:
+            last_stream.preset = value
+
+    @property
+    def filters(self) -> _LZMAFiltersType:
+        last_stream = self._last_stream
+        return self._filters if last_stream is None else last_stream.filters
+
+    @filters.setter
+    def filters(self, value: _LZMAFiltersType) -> None:
+        self._flush_write_buffer()
+        self._filters = value
+        last_stream = self._last_stream
+        if last_stream is not None:
+            last_stream.filters = value
+
+    @property
+    def block_size(self) -> Optional[int]:
+        last_stream = self._last_stream
+        return self._block_size if last_stream is None else last_stream.block_size
+
+    @block_size.setter
+    def block_size(self, value: Optional[int]) -> None:
+        self._flush_write_buffer()
+        self._block_size = value
+        last_stream = self._last_stream
+        if last_stream is not None:
+            last_stream.block_size = value
+
+    @property
+    def stream_size(self) -> Optional[int]:
+        return self._stream_size
+
+    @stream_size.setter
+    def stream_size(self, value: Optional[int]) -> None:
+        self._flush_write_buffer()
+        self._stream_size = value
+
+    @property
+    def block_read_strategy(self) -> _BlockReadStrategyType:
+        return self._block_read_strategy
+
+    @block_read_strategy.setter
+    def block_read_strategy(self, value: _BlockReadStrategyType) -> None:
+        # used by the streams created when flushing
+        self._flush_write_buffer()
+        self._block_read_strategy = value
 
     @property
     def mode(self) -> str:
@@ -129,6 +303,9 @@ class XZFile(IOCombiner[XZStream]):
     def readable(self) -> bool:
         return self._readable
 
+    def seekable(self) -> bool:
+        return self._sequential_writer is None and self._sequential_reader is None
+
     def writable(self) -> bool:
         return self._writable
 
@@ -143,8 +320,23 @@ class XZFile(IOCombiner[XZStream]):
                     stacklevel=2,
                 )
         finally:
-            if self._close_fileobj:
-                self.fileobj.close()  # self.fileobj exists at this point
+            if self._executor is not None:
+                self._read_ahead_futures.clear()
+                self._executor.shutdown(cancel_futures=True)
+            # the strategy and the cache may be shared with other files
+            block_cache = getattr(self, "block_cache", None)  # unset if init failed
+            for block in self._created_blocks():
+                block.clear()
+                if block_cache is not None:
+                    block_cache.remove(block)
+            if self._process_executor is not None:
+                self._process_executor.shutdown(cancel_futures=True)
+            try:
+                if self._mmap is not None:
+                    self._mmap.close()
+            finally:
+                if self._close_fileobj:
+                    self.fileobj.close()  # self.fileobj exists at this point
             if sys.version_info < (3, 10):  # pragma: no cover
                 # fix coverage issue on some Python versions
                 # see https://github.com/nedbat/coveragepy/issues/1480
@@ -152,52 +344,442 @@ class XZFile(IOCombiner[XZStream]):
 
     @property
     def stream_boundaries(self) -> list[int]:
+        if self._sequential_reader is not None:
+            return list(self._sequential_reader.stream_boundaries)
+        self._flush_write_buffer()
         return list(self._fileobjs)
 
     @property
     def block_boundaries(self) -> list[int]:
+        if self._sequential_reader is not None:
+            return list(self._sequential_reader.block_boundaries)
+        self._flush_write_buffer()
         return [
             stream_pos + block_boundary
             for stream_pos, stream in self._fileobjs.items()
             for block_boundary in stream.block_boundaries
         ]
 
-    def _init_parse(self) -> None:
-        self.fileobj.seek(0, SEEK_END)
+    def _created_blocks(self) -> Iterator[XZBlock]:
+        for stream in self._fileobjs.values():
+            yield from stream.created_blocks()
+
+    def _iter_blocks(self, pos: int) -> Iterator[tuple[int, XZBlock]]:
+        for stream_pos, stream in self._fileobjs.items_from(pos):
+            for block_pos, block in stream.iter_blocks(max(pos - stream_pos, 0)):
+                yield (stream_pos + block_pos, block)
+
+    def read(self, size: int = -1) -> bytes:
+        """Read at most size bytes, returned as a bytes object.
+
+        If the size argument is negative, read until EOF is reached.
+        Return an empty bytes object at or after EOF.
+        """
+        if self._sequential_reader is None:
+            self._flush_write_buffer()
+            return super().read(size)
+        self._check_not_closed()
+        return self._read_sequential(size)
+
+    def pread(self, offset: int, size: int = -1) -> bytes:
+        """Read at most size bytes from offset, returned as a bytes object.
+
+        Contrary to read, the position is neither used nor changed, so
+        that pread can be called from several threads at once: threads
+        reading different blocks decompress them in parallel, while
+        threads reading the same block wait for each other.
+
+        The default block_read_strategy can be used by several threads;
+        other strategies must be wrapped in a SharedBlockReadStrategy.
+
+        If the size argument is negative, read until EOF is reached.
+        """
+        self._check_not_closed()
+        if not self.readable():
+            raise UnsupportedOperation("read")
+        if not self.seekable():
+            raise UnsupportedOperation("pread")
+        if offset < 0:
+            raise ValueError("offset must be positive or zero")
+        end = self._length if size < 0 else min(offset + size, self._length)
+        if offset >= end:
+            return b""
+        self._flush_write_buffer()
+        parts = []
+        for block_pos, block in self._iter_blocks(offset):
+            if block_pos >= end:
+                break
+            start = max(offset - block_pos, 0)
+            parts.append(block.pread(start, end - block_pos - start))
+        return b"".join(parts)
+
+    def _read_sequential(self, size: int) -> bytes:
+        reader = cast("SequentialRead", self._sequential_reader)
+        parts = []
+        remaining = size
+        while remaining:
+            data = reader.read(remaining)
+            if not data:
+                break
+            parts.append(data)
+            if remaining > 0:
+                remaining -= len(data)
+        data = b"".join(parts)
+        # the length is only known up to what was read so far
+        self._pos = self._length = self._pos + len(data)
+        return data
+
+    def _readinto_loop(self, buffer: "WriteableBuffer", *, once: bool) -> int:
+        if self._sequential_reader is None:
+            self._flush_write_buffer()
+            return super()._readinto_loop(buffer, once=once)
+        self._check_not_closed()
+        with memoryview(buffer) as view, view.cast("B") as view_bytes:
+            done = 0
+            while done < len(view_bytes):
+                read_size = self._sequential_reader.readinto(view_bytes[done:])
+                if not read_size:
+                    break  # EOF
+                done += read_size
+                if once:
+                    break
+            self._pos = self._length = self._pos + done
+            return done
+
+    def _read(self, size: int) -> bytes:
+        if self.threads == 1 and not self.read_ahead:
+            return super()._read(size)
+        # decompressed blocks are copied once into the output
+        with memoryview(bytearray(size)) as buffer:
+            size = self._readinto(buffer)
+            return buffer[:size].tobytes()
+
+    def _readinto(self, buffer: memoryview) -> int:
+        if self.threads == 1 and not self.read_ahead:
+            return super()._readinto(buffer)
+
+        blocks = self._covered_blocks(len(buffer)) if self.threads > 1 else []
+        if len(blocks) > 1:
+            # keep a bounded number of blocks in flight,
+            # so that big reads do not hold all their blocks in memory
+            blocks_iter = iter(blocks)
+            futures = deque(
+                self._pop_decompress_future(block)
+                for block in islice(blocks_iter, 2 * self.threads)
+            )
+            size = 0
+            while futures:
+                data = futures.popleft().result()
+                buffer[size : size + len(data)] = data
+                size += len(data)
+                for block in islice(blocks_iter, 1):
+                    futures.append(self._pop_decompress_future(block))
+        else:
+            block_pos, block = next(self._iter_blocks(self._pos))
+            offset = self._pos - block_pos
+            future = self._read_ahead_futures.get(block)
+            if future is None:
+                # read until the end of the current block only,
+                # so that the next call starts on a block boundary
+                size = super()._readinto(buffer[: len(block) - offset])
+            else:
+                data = memoryview(future.result())[offset : offset + len(buffer)]
+                size = len(data)
+                buffer[:size] = data
+
+        if self.read_ahead:
+            self._schedule_read_ahead(self._pos + size)
+        return size
+
+    def _covered_blocks(self, size: int) -> list[XZBlock]:
+        """Return the blocks entirely covered by a read of size bytes."""
+        blocks = []
+        for block_pos, block in self._iter_blocks(self._pos):
+            if (
+                block_pos < self._pos
+                or block_pos + len(block) > self._pos + size
+                or block.writable()
+            ):
+                break
+            blocks.append(block)
+        return blocks
+
+    def _pop_decompress_future(self, block: XZBlock) -> Future[bytes]:
+        future = self._read_ahead_futures.pop(block, None)
+        if future is not None:
+            return future
+        # raw data is read from the calling thread
+        # only the decompression itself is performed by workers
+        return self._get_executor().submit(
+            decompress_block,
+            block.read_compressed(),
+            block.check,
+            block.unpadded_size,
+            block.uncompressed_size,
+            self.memlimit,
+        )
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.threads)
+        return self._executor
+
+    @property
+    def _compress_executor(self) -> Optional[Executor]:
+        if self.processes > 1:
+            if self._process_executor is None:
+                from xz.process import (  # noqa: PLC0415
+                    SharedMemoryProcessPoolExecutor,
+                )
+
+                self._process_executor = SharedMemoryProcessPoolExecutor(self.processes)
+            return self._process_executor
+        return self._get_executor() if self.threads > 1 else None
+
+    @property
+    def _max_pending_blocks(self) -> int:
+        # enough to keep all the workers busy
+        return 2 * (self.processes if self.processes > 1 else self.threads)
+
+    def _schedule_read_ahead(self, pos: int) -> None:
+        """Decompress in the background the blocks following pos.
+
+        The block containing pos is kept if it was already decompressed,
+        but is not counted against the read_ahead limit. The block
+        following pos is always decompressed, even if bigger than the
+        read_ahead limit.
+        """
+        current = []
+        ahead: list[XZBlock] = []
+        remaining = self.read_ahead
+        for block_pos, block in self._iter_blocks(pos):
+            if block_pos < pos:
+                if block in self._read_ahead_futures and pos < block_pos + len(block):
+                    current.append(block)
+                continue
+            if block.writable() or (ahead and len(block) > remaining):
+                break
+            remaining -= len(block)
+            ahead.append(block)
+        blocks = current + ahead
+        if blocks == list(self._read_ahead_futures):
+            return  # nothing to change
+        futures = {block: self._pop_decompress_future(block) for block in blocks}
+        for future in self._read_ahead_futures.values():
+            future.cancel()  # no longer needed
+        self._read_ahead_futures = futures
+
+    @staticmethod
+    def _check_size(name: str, value: _SizeT, *, allow_zero: bool = False) -> _SizeT:
+        if value is None:
+            return value
+        if allow_zero:
+            if value < 0:
+                raise ValueError(f"{name} must be positive or zero")
+        elif value <= 0:
+            raise ValueError(f"{name} must be positive")
+        return value
+
+    @staticmethod
+    def _workers_count(name: str, value: int) -> int:
+        if value < 0:
+            raise ValueError(f"{name} must be positive or zero")
+        return value or os.cpu_count() or 1
+
+    def _check_fileobj(self) -> None:
+        seekable = self.fileobj.seekable()
+        if not seekable and self._mode not in {"r", "w", "x"}:
+            raise ValueError("filename is not seekable")
+        if self._readable and not self.fileobj.readable():
+            raise ValueError("filename is not readable")
+        if self._writable and not self.fileobj.writable():
+            raise ValueError("filename is not writable")
+        if not seekable:
+            if self._writable:
+                self._sequential_writer = IOSequentialWriter(self.fileobj)
+            else:
+                self._sequential_reader = SequentialRead(self.fileobj, self.memlimit)
+
+    def _init_last_stream_write(self) -> None:
+        # writing may continue in the last existing stream
+        last_stream = self._last_stream
+        if last_stream is not None:
+            last_stream.executor = self._compress_executor
+            last_stream.max_pending_blocks = self._max_pending_blocks
+
+    def _map_fileobj(self) -> None:
+        if self._mode != "r":
+            raise ValueError("mmap is only supported in read mode")
+        try:
+            fileno = self.fileobj.fileno()
+        except (AttributeError, UnsupportedOperation):
+            raise ValueError("filename has no file descriptor to mmap") from None
+        if os.fstat(fileno).st_size:  # empty files cannot be mapped
+            self._mmap = mmap_module.mmap(fileno, 0, access=mmap_module.ACCESS_READ)
+
+    def _init_parse(self, *, lazy: bool) -> None:
+        # a memory map has the methods of a file object used below
+        fileobj = self.fileobj if self._mmap is None else cast("BinaryIO", self._mmap)
+
+        if self.index_file is not None:
+            layout = load_index(self.index_file, get_signature(self.fileobj))
+            if layout is not None:
+                for stream_layout in layout:
+                    self._append(
+                        XZStream.from_records(
+                            fileobj,
+                            *stream_layout,
+                            self.block_read_strategy,
+                            self.block_cache,
+                            self.memlimit,
+                            self.seek_window,
+                            lazy=lazy,
+                        )
+                    )
+                return
+
+        fileobj.seek(0, SEEK_END)
 
         streams = []
 
-        while self.fileobj.tell():
-            if self.fileobj.tell() % 4:
+        while fileobj.tell():
+            if fileobj.tell() % 4:
                 raise XZError("file: invalid size")
-            self.fileobj.seek(-4, SEEK_CUR)
-            if any(self.fileobj.read(4)):
-                streams.append(XZStream.parse(self.fileobj, self.block_read_strategy))
+            fileobj.seek(-4, SEEK_CUR)
+            if any(fileobj.read(4)):
+                streams.append(
+                    XZStream.parse(
+                        fileobj,
+                        self.block_read_strategy,
+                        self.block_cache,
+                        self.memlimit,
+                        self.seek_window,
+                        lazy=lazy,
+                    )
+                )
             else:
-                self.fileobj.seek(-4, SEEK_CUR)  # stream padding
+                fileobj.seek(-4, SEEK_CUR)  # stream padding
 
+        if not streams and self._mode[0] == "r":
+            raise XZError("file: no streams")
         while streams:
             self._append(streams.pop())
 
+    def save_index(self, index_file: _IndexFilenameType) -> None:
+        """Save the layout of the streams and blocks in a sidecar index file.
+
+        The index file is created or refreshed, and can then be given
+        as the index_file argument when opening the file again.
+        """
+        self._check_not_closed()
+        if self._writable or self._sequential_reader is not None:
+            raise UnsupportedOperation("save_index")
+        save_index(
+            index_file,
+            get_signature(self.fileobj),
+            [
+                (
+                    stream.fileobj.start,
+                    stream.fileobj.start + len(stream.fileobj),
+                    stream.check,
+                    stream.records,
+                )
+                for stream in self._fileobjs.values()
+            ],
+        )
+
     def _create_fileobj(self) -> XZStream:
-        stream_pos = sum(len(stream.fileobj) for stream in self._fileobjs.values())
+        last_stream = self._last_stream
+        if last_stream is None:
+            stream_pos = 0
+        else:
+            stream_pos = last_stream.fileobj.start + len(last_stream.fileobj)
+        fileobj: Union[BinaryIO, IOSequentialWriter] = (
+            self.fileobj if self._sequential_writer is None else self._sequential_writer
+        )
         return XZStream(
-            IOProxy(
-                self.fileobj,
-                stream_pos,
-                stream_pos,
-            ),
+            IOProxy(fileobj, stream_pos, stream_pos),
             self.check,
             self.preset,
             self.filters,
             self.block_read_strategy,
+            self.block_cache,
+            self.memlimit,
+            self.seek_window,
+            self.block_size,
+            self._compress_executor,
+            self._max_pending_blocks,
         )
 
+    def write(self, data: bytes) -> int:
+        """Write data, passed as a bytes object.
+
+        Returns the number of bytes written, which is always the length
+        of the input data in bytes.
+        """
+        self._check_not_closed()
+        if (
+            len(data) >= self.write_buffer_size
+            or self._pos != self._length
+            or not self.writable()
+        ):
+            self._flush_write_buffer()
+            return super().write(data)
+        # batch small writes at the end of the file, so that they go
+        # through the streams and blocks (and the compressor) only once
+        self._write_start()
+        self._write_buffer += data
+        self._pos = self._length = self._length + len(data)
+        if len(self._write_buffer) >= self.write_buffer_size:
+            self._flush_write_buffer()
+        return len(data)
+
+    def _flush_write_buffer(self) -> None:
+        """Write the small writes batched so far, see write."""
+        if not self._write_buffer:
+            return
+        data, self._write_buffer = self._write_buffer, bytearray()
+        pos = self._pos
+        self._pos = self._length = self._length - len(data)
+        super().write(data)
+        self._pos = pos
+
+    def _write_after(self) -> None:
+        self._flush_write_buffer()
+        super()._write_after()
+
+    def _truncate(self, size: int) -> None:
+        if self._sequential_writer is not None:
+            # data already written cannot be changed
+            raise UnsupportedOperation("truncate")
+        self._flush_write_buffer()
+        blocks = set(self._created_blocks())
+        super()._truncate(size)
+        # release the blocks removed by truncating, like when closing
+        for block in blocks.difference(self._created_blocks()):
+            block.clear()
+            if self.block_cache is not None:
+                self.block_cache.remove(block)
+
+    def _write(self, data: bytes) -> int:
+        if self.stream_size is not None:
+            # write at most up to the end of the stream, creating one if full
+            written_size = 0
+            last_stream = self._last_stream
+            if last_stream is not None:
+                written_size = len(last_stream)
+                if written_size >= self.stream_size:
+                    self._change_fileobj()
+                    written_size = 0
+            data = data[: self.stream_size - written_size]
+        return super()._write(data)
+
     def change_stream(self) -> None:
         """
         Create a new stream.
 
         If the current stream is empty, replace it instead."""
+        self._flush_write_buffer()
         if self._fileobjs:
             self._change_fileobj()
 
@@ -206,6 +788,7 @@ class XZFile(IOCombiner[XZStream]):
         Create a new block.
 
         If the current block is empty, replace it instead."""
+        self._flush_write_buffer()
         last_stream = self._last_stream
         if last_stream:
             last_stream.change_block()
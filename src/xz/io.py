@@ -3,13 +3,22 @@ from io import (
     SEEK_CUR,
     SEEK_END,
     SEEK_SET,
+    BufferedReader,
+    FileIO,
     IOBase,
     UnsupportedOperation,
 )
-from typing import BinaryIO, Generic, Optional, TypeVar, Union, cast
+from mmap import mmap
+import os
+from threading import Lock, RLock
+from typing import TYPE_CHECKING, BinaryIO, Generic, Optional, TypeVar, Union, cast
+from weakref import WeakKeyDictionary
 
 from xz.utils import FloorDict
 
+if TYPE_CHECKING:
+    from _typeshed import WriteableBuffer
+
 #
 # Typing note
 #
@@ -107,8 +116,42 @@ class IOAbstract(IOBase):
             parts.append(data)
             size -= len(data)
             self._pos += len(data)
+        if len(parts) == 1:
+            return parts[0]  # avoid a copy
         return b"".join(parts)
 
+    def readinto(self, buffer: "WriteableBuffer") -> int:
+        """Read bytes into a pre-allocated, writable bytes-like object.
+
+        Return the number of bytes read, which can be less than the size
+        of the buffer only at EOF.
+        """
+        return self._readinto_loop(buffer, once=False)
+
+    def readinto1(self, buffer: "WriteableBuffer") -> int:
+        """Read bytes into a pre-allocated, writable bytes-like object.
+
+        Contrary to readinto, stop as soon as some bytes were read.
+        Return the number of bytes read, or 0 at EOF.
+        """
+        return self._readinto_loop(buffer, once=True)
+
+    def _readinto_loop(self, buffer: "WriteableBuffer", *, once: bool) -> int:
+        self._check_not_closed()
+        if not self.readable():
+            raise UnsupportedOperation("read")
+        with memoryview(buffer) as view, view.cast("B") as view_bytes:
+            size = min(len(view_bytes), max(self._length - self._pos, 0))
+            done = 0
+            while done < size:
+                # do not stop if nothing was read
+                read_size = self._readinto(view_bytes[done:size])
+                done += read_size
+                self._pos += read_size
+                if once and done:
+                    break
+            return done
+
     def _write_start(self) -> None:
         if not self._modified:
             self._write_before()
@@ -197,6 +240,17 @@ class IOAbstract(IOBase):
         """
         raise UnsupportedOperation("read")
 
+    def _readinto(self, buffer: memoryview) -> int:
+        """Read up to len(buffer) bytes into buffer, and return the number
+        of bytes read.
+
+        Same as _read (which is used by the default implementation)
+        regarding EOF and the possibility to read less bytes than requested.
+        """
+        data = self._read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
     def _write_before(self) -> None:
         """This method is called before the first write operation."""
 
@@ -239,26 +293,96 @@ class IOStatic(IOAbstract):
         return self.data[self._pos : self._pos + size]
 
 
-class IOProxy(IOAbstract):
+class IOSequentialWriter(IOAbstract):
+    """Write-only view of a non-seekable fileobj (e.g. a pipe or a socket).
+
+    Seeking is possible, but data can only be written at the end: seeking
+    to the end and writing there, or truncating at the end, does not need
+    to seek nor truncate fileobj.
+    """
+
     def __init__(
         self,
         fileobj: Union[BinaryIO, IOBase],  # see typing note on top of this file
+    ) -> None:
+        super().__init__(0)
+        self.fileobj = fileobj
+
+    def readable(self) -> bool:
+        return False
+
+    def _write(self, data: bytes) -> int:
+        return self.fileobj.write(data)
+
+    def _truncate(self, size: int) -> None:  # noqa: ARG002
+        raise UnsupportedOperation("truncate")
+
+
+_fileobj_locks: "WeakKeyDictionary[object, RLock]" = WeakKeyDictionary()
+_fileobj_locks_lock = Lock()
+_fallback_lock = RLock()
+
+
+def get_fileobj_lock(fileobj: object) -> RLock:
+    """Return the lock used to access fileobj from several threads.
+
+    The same lock is returned for a given fileobj, as long as it exists.
+    """
+    with _fileobj_locks_lock:
+        try:
+            return _fileobj_locks.setdefault(fileobj, RLock())
+        except TypeError:  # fileobj cannot be weakly referenced
+            return _fallback_lock
+
+
+class IOProxy(IOAbstract):
+    def __init__(
+        self,
+        fileobj: Union[BinaryIO, IOBase, mmap],  # see typing note on top of this file
         start: int,
         end: int,
     ) -> None:
         super().__init__(end - start)
         self.fileobj = fileobj
         self.start = start
+        # unbuffered files are accessed at a given position directly,
+        # without depending on (nor changing) the position of the file;
+        # so are files buffered for reading only, as their buffer cannot
+        # hold data not written to the file yet
+        raw = fileobj.raw if isinstance(fileobj, BufferedReader) else fileobj
+        self._fd = (
+            raw.fileno() if isinstance(raw, FileIO) and hasattr(os, "pread") else None
+        )
+        # otherwise fileobj is accessed by seeking then reading or writing,
+        # which must not be interleaved between threads (see XZFile.pread)
+        self._lock = (
+            None
+            if self._fd is not None or isinstance(fileobj, mmap)
+            else get_fileobj_lock(fileobj)
+        )
 
     def _read(self, size: int) -> bytes:
-        self.fileobj.seek(self.start + self._pos, SEEK_SET)
-        return self.fileobj.read(size)  # size already restricted by caller
+        if isinstance(self.fileobj, mmap):
+            # without system call; slicing returns bytes rather than a view,
+            # so that no export prevents the memory map from being closed
+            pos = self.start + self._pos
+            return self.fileobj[pos : pos + size]
+        if self._fd is not None:
+            return os.pread(self._fd, size, self.start + self._pos)
+        with cast("RLock", self._lock):
+            self.fileobj.seek(self.start + self._pos, SEEK_SET)
+            return self.fileobj.read(size)  # size already restricted by caller
 
     def _write(self, data: bytes) -> int:
-        self.fileobj.seek(self.start + self._pos, SEEK_SET)
-        return self.fileobj.write(data)
+        if self._fd is not None:
+            return os.pwrite(self._fd, data, self.start + self._pos)
+        with cast("RLock", self._lock):
+            self.fileobj.seek(self.start + self._pos, SEEK_SET)
+            return self.fileobj.write(data)
 
     def _truncate(self, size: int) -> None:
+        if isinstance(self.fileobj, mmap):
+            raise UnsupportedOperation("truncate")
         self.fileobj.truncate(self.start + size)
 
 
@@ -280,6 +404,9 @@ class IOCombiner(IOAbstract, Generic[T]):
     def _read(self, size: int) -> bytes:
         return self._get_fileobj().read(size)
 
+    def _readinto(self, buffer: memoryview) -> int:
+        return self._get_fileobj().readinto(buffer)
+
     def _write_after(self) -> None:
         if self._fileobjs:
             last_fileobj = self._fileobjs.last_item
@@ -1,7 +1,9 @@
-from io import TextIOWrapper
+from io import DEFAULT_BUFFER_SIZE, TextIOWrapper
 from typing import BinaryIO, Optional, Union, cast, overload
 
+from xz.cache import BlockCache
 from xz.file import XZFile
+from xz.sidecar import _IndexFilenameType
 from xz.typing import (
     _BlockReadStrategyType,
     _LZMAFilenameType,
@@ -22,7 +24,19 @@ class _XZFileText(TextIOWrapper):
         check: int = -1,
         preset: _LZMAPresetType = None,
         filters: _LZMAFiltersType = None,
+        block_size: Optional[int] = None,
+        stream_size: Optional[int] = None,
+        write_buffer_size: int = DEFAULT_BUFFER_SIZE,
         block_read_strategy: Optional[_BlockReadStrategyType] = None,
+        block_cache: Optional[BlockCache] = None,
+        memlimit: Optional[int] = None,
+        seek_window: int = 0,
+        threads: int = 1,
+        processes: int = 1,
+        read_ahead: int = 0,
+        mmap: bool = False,
+        index_file: Optional[_IndexFilenameType] = None,
+        lazy: bool = False,
         encoding: Optional[str] = None,
         errors: Optional[str] = None,
         newline: Optional[str] = None,
@@ -33,7 +47,19 @@ class _XZFileText(TextIOWrapper):
             check=check,
             preset=preset,
             filters=filters,
+            block_size=block_size,
+            stream_size=stream_size,
+            write_buffer_size=write_buffer_size,
             block_read_strategy=block_read_strategy,
+            block_cache=block_cache,
+            memlimit=memlimit,
+            seek_window=seek_window,
+            threads=threads,
+            processes=processes,
+            read_ahead=read_ahead,
+            mmap=mmap,
+            index_file=index_file,
+            lazy=lazy,
         )
         super().__init__(
             cast("BinaryIO", self.xz_file),
@@ -45,14 +71,29 @@ class _XZFileText(TextIOWrapper):
     check = AttrProxy[int]("xz_file")
     preset = AttrProxy[_LZMAPresetType]("xz_file")
     filters = AttrProxy[_LZMAFiltersType]("xz_file")
+    block_size = AttrProxy[Optional[int]]("xz_file")
+    stream_size = AttrProxy[Optional[int]]("xz_file")
+    write_buffer_size = AttrProxy[int]("xz_file")
     stream_boundaries = AttrProxy[list[int]]("xz_file")
     block_boundaries = AttrProxy[list[int]]("xz_file")
     block_read_strategy = AttrProxy[_BlockReadStrategyType]("xz_file")
+    block_cache = AttrProxy[Optional[BlockCache]]("xz_file")
+    memlimit = AttrProxy[Optional[int]]("xz_file")
+    seek_window = AttrProxy[int]("xz_file")
+    threads = AttrProxy[int]("xz_file")
+    processes = AttrProxy[int]("xz_file")
+    read_ahead = AttrProxy[int]("xz_file")
+    index_file = AttrProxy[Optional[_IndexFilenameType]]("xz_file")
 
     @property
     def mode(self) -> str:
         return f"{self.xz_file.mode}t"
 
+    def save_index(self, index_file: _IndexFilenameType) -> None:
+        self.xz_file.save_index(index_file)
+
+    save_index.__doc__ = XZFile.save_index.__doc__
+
     def change_stream(self) -> None:
         self.flush()
         self.xz_file.change_stream()
@@ -75,7 +116,19 @@ def xz_open(
     check: int = -1,
     preset: _LZMAPresetType = None,
     filters: _LZMAFiltersType = None,
+    block_size: Optional[int] = None,
+    stream_size: Optional[int] = None,
+    write_buffer_size: int = DEFAULT_BUFFER_SIZE,
     block_read_strategy: Optional[_BlockReadStrategyType] = None,
+    block_cache: Optional[BlockCache] = None,
+    memlimit: Optional[int] = None,
+    seek_window: int = 0,
+    threads: int = 1,
+    processes: int = 1,
+    read_ahead: int = 0,
+    mmap: bool = False,
+    index_file: Optional[_IndexFilenameType] = None,
+    lazy: bool = False,
     # text-mode kwargs
     encoding: Optional[str] = None,
     errors: Optional[str] = None,
@@ -92,7 +145,19 @@ def xz_open(
     check: int = -1,
     preset: _LZMAPresetType = None,
     filters: _LZMAFiltersType = None,
+    block_size: Optional[int] = None,
+    stream_size: Optional[int] = None,
+    write_buffer_size: int = DEFAULT_BUFFER_SIZE,
     block_read_strategy: Optional[_BlockReadStrategyType] = None,
+    block_cache: Optional[BlockCache] = None,
+    memlimit: Optional[int] = None,
+    seek_window: int = 0,
+    threads: int = 1,
+    processes: int = 1,
+    read_ahead: int = 0,
+    mmap: bool = False,
+    index_file: Optional[_IndexFilenameType] = None,
+    lazy: bool = False,
     # text-mode kwargs
     encoding: Optional[str] = None,
     errors: Optional[str] = None,
@@ -109,7 +174,19 @@ def xz_open(
     check: int = -1,
     preset: _LZMAPresetType = None,
     filters: _LZMAFiltersType = None,
+    block_size: Optional[int] = None,
+    stream_size: Optional[int] = None,
+    write_buffer_size: int = DEFAULT_BUFFER_SIZE,
     block_read_strategy: Optional[_BlockReadStrategyType] = None,
+    block_cache: Optional[BlockCache] = None,
+    memlimit: Optional[int] = None,
+    seek_window: int = 0,
+    threads: int = 1,
+    processes: int = 1,
+    read_ahead: int = 0,
+    mmap: bool = False,
+    index_file: Optional[_IndexFilenameType] = None,
+    lazy: bool = False,
     # text-mode kwargs
     encoding: Optional[str] = None,
     errors: Optional[str] = None,
@@ -125,7 +202,19 @@ def xz_open(
     check: int = -1,
     preset: _LZMAPresetType = None,
     filters: _LZMAFiltersType = None,
+    block_size: Optional[int] = None,
+    stream_size: Optional[int] = None,
+    write_buffer_size: int = DEFAULT_BUFFER_SIZE,
     block_read_strategy: Optional[_BlockReadStrategyType] = None,
+    block_cache: Optional[BlockCache] = None,
+    memlimit: Optional[int] = None,
+    seek_window: int = 0,
+    threads: int = 1,
+    processes: int = 1,
+    read_ahead: int = 0,
+    mmap: bool = False,
+    index_file: Optional[_IndexFilenameType] = None,
+    lazy: bool = False,
     # text-mode kwargs
     encoding: Optional[str] = None,
     errors: Optional[str] = None,
@@ -155,7 +244,19 @@ def xz_open(
             check=check,
             preset=preset,
             filters=filters,
+            block_size=block_size,
+            stream_size=stream_size,
+            write_buffer_size=write_buffer_size,
             block_read_strategy=block_read_strategy,
+            block_cache=block_cache,
+            memlimit=memlimit,
+            seek_window=seek_window,
+            threads=threads,
+            processes=processes,
+            read_ahead=read_ahead,
+            mmap=mmap,
+            index_file=index_file,
+            lazy=lazy,
             encoding=encoding,
             errors=errors,
             newline=newline,
@@ -174,5 +275,17 @@ def xz_open(
         check=check,
         preset=preset,
         filters=filters,
+        block_size=block_size,
+        stream_size=stream_size,
+        write_buffer_size=write_buffer_size,
         block_read_strategy=block_read_strategy,
+        block_cache=block_cache,
+        memlimit=memlimit,
+        seek_window=seek_window,
+        threads=threads,
+        processes=processes,
+        read_ahead=read_ahead,
+        mmap=mmap,
+        index_file=index_file,
+        lazy=lazy,
     )
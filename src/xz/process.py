@@ -0,0 +1,93 @@
+from collections.abc import Callable
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+import multiprocessing
+from multiprocessing.shared_memory import SharedMemory
+from typing import TypeVar, cast
+
+T = TypeVar("T", bound=tuple[object, ...])
+
+
+def _call_shared(
+    func: Callable[..., tuple[object, ...]],
+    name: str,
+    size: int,
+    args: tuple[object, ...],
+) -> tuple[object, ...]:
+    """Call func in a worker process, see SharedMemoryProcessPoolExecutor."""
+    shm = SharedMemory(name)
+    try:
+        with shm.buf[:size] as data:
+            result = func(data, *args)
+        output, extra = cast("bytes", result[0]), result[1:]
+        if len(output) <= shm.size:
+            # the input is not needed anymore: reuse its memory
+            shm.buf[: len(output)] = output
+            return (len(output), *extra)
+        return (output, *extra)
+    finally:
+        shm.close()
+
+
+class SharedMemoryProcessPoolExecutor(Executor):
+    """Run functions taking and returning large data in worker processes.
+
+    The functions are called as func(data, *args) and must return a tuple
+    whose first item is a bytes object. Instead of being pickled, the
+    data and the returned bytes are passed through shared memory, which
+    avoids copies between processes.
+
+    Worker processes are started with the "spawn" method, so that this
+    can be used along threads. As they import the main module, the code
+    starting them from a script must be guarded by
+    if __name__ == "__main__": otherwise the workers fail to start, and
+    the pool is broken.
+    """
+
+    def __init__(self, max_workers: int) -> None:
+        self.max_workers = max_workers
+        self._pool = ProcessPoolExecutor(
+            max_workers, mp_context=multiprocessing.get_context("spawn")
+        )
+
+    def submit(  # type: ignore[override]
+        self,
+        fn: Callable[..., T],
+        data: bytes,
+        /,
+        *args: object,
+    ) -> Future[T]:
+        # leave room for the output of incompressible data (headers, padding)
+        shm = SharedMemory(create=True, size=len(data) + len(data) // 1024 + 1024)
+        try:
+            shm.buf[: len(data)] = data
+            pool_future = self._pool.submit(_call_shared, fn, shm.name, len(data), args)
+        except BaseException:
+            # e.g. the pool is broken: the shared memory is not used by anyone
+            shm.close()
+            shm.unlink()
+            raise
+        future: Future[tuple[object, ...]] = Future()
+
+        def set_result(pool_future: Future[tuple[object, ...]]) -> None:
+            try:
+                if pool_future.cancelled():  # e.g. by shutdown
+                    future.cancel()
+                elif future.set_running_or_notify_cancel():  # unless cancelled
+                    try:
+                        output, *extra = pool_future.result()
+                        if isinstance(output, int):
+                            output = bytes(shm.buf[:output])
+                        future.set_result((output, *extra))
+                    except Exception as ex:  # noqa: BLE001
+                        future.set_exception(ex)
+            finally:
+                shm.close()
+                shm.unlink()
+
+        pool_future.add_done_callback(set_result)
+        # no-op unless future was cancelled before its result was set
+        future.add_done_callback(lambda _: pool_future.cancel())
+        return cast("Future[T]", future)
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:  # noqa: FBT001, FBT002
+        self._pool.shutdown(wait, cancel_futures=cancel_futures)
@@ -0,0 +1,185 @@
+# ruff: noqa: PLR2004
+
+from collections.abc import Generator, Iterator
+from io import IOBase
+from lzma import FORMAT_XZ, LZMADecompressor, LZMAError
+from struct import unpack
+from typing import BinaryIO, Optional, Union, cast
+
+from xz.common import (
+    XZError,
+    create_xz_header,
+    create_xz_index_footer,
+    get_check_size,
+    parse_xz_block_header,
+    parse_xz_header,
+    round_up,
+)
+
+
+class SequentialRead:
+    """Decompress a XZ file from a fileobj that can only be read forward.
+
+    Contrary to XZStream.parse, which starts from the footers at the end
+    of the file, streams and blocks are parsed from their headers as they
+    are reached. Their boundaries (in uncompressed data) are thus only
+    known progressively.
+
+    The end of a block is found by walking the headers of the chunks of
+    its LZMA2 data (the last filter of a block is always LZMA2), so that
+    each block is decompressed as if it were on its own, see BlockRead.
+    """
+
+    def __init__(
+        self,
+        fileobj: Union[BinaryIO, IOBase],  # see typing note in xz.io
+        memlimit: Optional[int] = None,
+    ) -> None:
+        self.fileobj = fileobj
+        self.memlimit = memlimit
+        self.stream_boundaries: list[int] = []
+        self.block_boundaries: list[int] = []
+        self.pos = 0  # uncompressed bytes decompressed so far
+        self._output = memoryview(b"")  # decompressed, not read yet
+        self._outputs = self._iter_outputs()
+        # parse the first stream header, so that invalid files fail early
+        next(self._outputs)
+
+    def _read(self, size: int) -> bytes:
+        """Read size bytes from fileobj, or less at EOF."""
+        parts = []
+        while size > 0:
+            data = self.fileobj.read(size)
+            if not data:
+                break
+            parts.append(data)
+            size -= len(data)
+        return b"".join(parts)
+
+    def _fill(self) -> bool:
+        while not self._output:
+            data = next(self._outputs, None)
+            if data is None:
+                return False
+            self._output = memoryview(data)
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        """Read at most size bytes, or less if the end of a block is reached.
+
+        Return an empty bytes object at EOF only.
+        """
+        if not size or not self._fill():
+            return b""
+        if size < 0:
+            size = len(self._output)
+        data = bytes(self._output[:size])
+        self._output = self._output[size:]
+        return data
+
+    def readinto(self, buffer: memoryview) -> int:
+        """Read into buffer, possibly less than its size (see read)."""
+        if not buffer or not self._fill():
+            return 0
+        size = min(len(buffer), len(self._output))
+        buffer[:size] = self._output[:size]
+        self._output = self._output[size:]
+        return size
+
+    def _iter_outputs(self) -> Iterator[bytes]:
+        header = self._read(12)
+        if not header:
+            raise XZError("file: no streams")
+        while True:
+            check = parse_xz_header(header)
+            self.stream_boundaries.append(self.pos)
+            yield b""
+
+            records = []
+            while True:
+                block_header_start = self._read(1)
+                if not block_header_start:
+                    raise XZError("stream: data eof")
+                if block_header_start == b"\x00":
+                    break  # index indicator
+                records.append((yield from self._iter_block(check, block_header_start)))
+
+            # the index is known from the blocks: no need to parse it
+            index_footer = create_xz_index_footer(check, records)
+            if b"\x00" + self._read(len(index_footer) - 1) != index_footer:
+                raise XZError("stream: index does not match blocks")
+
+            # stream padding or next stream
+            header = self._read(4)
+            while header == b"\x00\x00\x00\x00":
+                header = self._read(4)
+            if not header:
+                return
+            header += self._read(8)
+
+    def _iter_block(
+        self, check: int, block_header_start: bytes
+    ) -> Generator[bytes, None, tuple[int, int]]:
+        header = block_header_start + self._read(block_header_start[0] * 4 + 3)
+        parse_xz_block_header(header)
+        self.block_boundaries.append(self.pos)
+
+        decompressor = LZMADecompressor(format=FORMAT_XZ, memlimit=self.memlimit)
+        yield self._decompress(decompressor, create_xz_header(check) + header)
+
+        compressed_size = uncompressed_size = 0
+        chunk = b""
+        while chunk != b"\x00":  # end of LZMA2 data
+            chunk, chunk_uncompressed_size = self._read_lzma2_chunk()
+            compressed_size += len(chunk)
+            uncompressed_size += chunk_uncompressed_size
+            yield self._decompress(decompressor, chunk)
+
+        unpadded_size = len(header) + compressed_size + get_check_size(check)
+        padding_check = self._read(
+            round_up(unpadded_size) - unpadded_size + get_check_size(check)
+        )
+        # the decompressor checks the padding, the check, and the sizes
+        # (it then reaches its end, or raises an error)
+        yield self._decompress(
+            decompressor,
+            padding_check
+            + create_xz_index_footer(check, [(unpadded_size, uncompressed_size)]),
+        )
+        return (unpadded_size, uncompressed_size)
+
+    def _read_lzma2_chunk(self) -> tuple[bytes, int]:
+        """Return the raw data of the next LZMA2 chunk, and its uncompressed size."""
+        control = self._read(1)
+        if not control:
+            raise XZError("block: data eof")
+        if control == b"\x00":
+            return (control, 0)
+        if control[0] in {1, 2}:  # uncompressed chunk
+            header_size = 3
+        elif control[0] & 0x80:  # LZMA chunk, with properties from 0xC0
+            header_size = 6 if control[0] >= 0xC0 else 5
+        else:
+            raise XZError("block: invalid LZMA2 chunk")
+        header = control + self._read(header_size - 1)
+        if len(header) != header_size:
+            raise XZError("block: data eof")
+        if header_size == 3:
+            size = cast("int", unpack(">H", header[1:3])[0]) + 1
+            uncompressed_size = size
+        else:
+            uncompressed_low, size = cast("tuple[int, int]", unpack(">HH", header[1:5]))
+            uncompressed_size = ((control[0] & 0x1F) << 16) + uncompressed_low + 1
+            size += 1
+        data = self._read(size)
+        if len(data) != size:
+            raise XZError("block: data eof")
+        return (header + data, uncompressed_size)
+
+    def _decompress(self, decompressor: LZMADecompressor, data: bytes) -> bytes:
+        try:
+            data_output = decompressor.decompress(data)
+        except LZMAError as ex:
+            raise XZError(f"block: error while decompressing: {ex}") from ex
+        self.pos += len(data_output)
+        return data_output
@@ -0,0 +1,87 @@
+from io import SEEK_END, UnsupportedOperation
+import json
+import os
+from pathlib import Path
+from tempfile import mkstemp
+from typing import BinaryIO, Optional, Union
+
+INDEX_VERSION = 1
+
+# start, end, check, index records
+_StreamLayoutType = tuple[int, int, int, list[tuple[int, int]]]
+_IndexFilenameType = Union[str, "os.PathLike[str]"]
+
+
+def get_signature(fileobj: BinaryIO) -> dict[str, object]:
+    """Return what identifies the content of fileobj, to detect changes.
+
+    This is its size, its modification time (if it is an actual file),
+    and its last 12 bytes (i.e. the footer of its last stream).
+    """
+    size = fileobj.seek(0, SEEK_END)
+    fileobj.seek(max(size - 12, 0))
+    footer = fileobj.read()
+    try:
+        mtime_ns: Optional[int] = os.fstat(fileobj.fileno()).st_mtime_ns
+    except (AttributeError, OSError, UnsupportedOperation):
+        mtime_ns = None
+    return {"size": size, "mtime_ns": mtime_ns, "footer": footer.hex()}
+
+
+def save_index(
+    filename: _IndexFilenameType,
+    signature: dict[str, object],
+    streams: list[_StreamLayoutType],
+) -> None:
+    """Save the layout of the streams of a file in an index file.
+
+    The index file is replaced atomically, so that it can be refreshed
+    while other processes may be loading it.
+    """
+    data = json.dumps(
+        {"version": INDEX_VERSION, **signature, "streams": streams},
+        separators=(",", ":"),
+    )
+    path = Path(filename)
+    # unique temporary file, so that concurrent saves do not conflict
+    fd, tmp_name = mkstemp(prefix=f"{path.name}.", suffix=".tmp", dir=path.parent)
+    tmp_path = Path(tmp_name)
+    try:
+        with os.fdopen(fd, "w", encoding="ascii") as tmp_file:
+            tmp_file.write(data)
+        tmp_path.replace(path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+def load_index(
+    filename: _IndexFilenameType,
+    signature: dict[str, object],
+) -> Optional[list[_StreamLayoutType]]:
+    """Load the layout of the streams of a file from an index file.
+
+    Return None if the index file is missing, invalid, or does not match
+    the signature of the file (i.e. it has been modified since).
+    """
+    try:
+        data = json.loads(Path(filename).read_text(encoding="ascii"))
+        if data.pop("version") != INDEX_VERSION:
+            return None
+        streams = data.pop("streams")
+        if data != signature:
+            return None
+        return [
+            (
+                int(start),
+                int(end),
+                int(check),
+                [
+                    (int(unpadded), int(uncompressed))
+                    for unpadded, uncompressed in records
+                ],
+            )
+            for start, end, check, records in streams
+        ]
+    except (OSError, ValueError, TypeError, KeyError, AttributeError):
+        return None
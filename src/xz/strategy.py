@@ -1,9 +1,11 @@
-import time
-from typing import TYPE_CHECKING
+from collections import OrderedDict
+from threading import RLock
+from typing import TYPE_CHECKING, Optional
 
 if TYPE_CHECKING:
     # avoid circular dependency
     from xz.block import XZBlock
+    from xz.typing import _BlockReadStrategyType
 
 
 class KeepBlockReadStrategy:
@@ -19,23 +21,124 @@ class KeepBlockReadStrategy:
 
 class RollingBlockReadStrategy:
     def __init__(self, max_block_read_nb: int = 8) -> None:
-        self.block_reads: dict[XZBlock, float] = {}
+        # ordered from least recently used to most recently used
+        self.block_reads: OrderedDict[XZBlock, None] = OrderedDict()
         self.max_block_read_nb = max_block_read_nb
+        # this is the default strategy, so it can be used by several
+        # threads at once (see XZFile.pread); reentrant, as clearing
+        # a block calls on_delete
+        self.lock = RLock()
+
+    def on_create(self, block: "XZBlock") -> None:
+        with self.lock:
+            self.block_reads[block] = None
+            self.block_reads.move_to_end(block)
+            if len(self.block_reads) > self.max_block_read_nb:
+                to_clear = next(iter(self.block_reads))
+                to_clear.clear()  # will call on_delete
+
+    def on_delete(self, block: "XZBlock") -> None:
+        with self.lock:
+            # the block may have been cleared concurrently by another thread
+            self.block_reads.pop(block, None)
+
+    def on_read(self, block: "XZBlock") -> None:
+        with self.lock:
+            if block in self.block_reads:
+                self.block_reads.move_to_end(block)
 
-    def _freshly_used(self, block: "XZBlock") -> None:
-        self.block_reads[block] = time.monotonic()
+
+class MemoryBlockReadStrategy:
+    def __init__(self, max_memory: int = 256 * 1024 * 1024) -> None:
+        # ordered from least recently used to most recently used
+        # values are the estimated memory used by each block reader
+        self.block_reads: OrderedDict[XZBlock, int] = OrderedDict()
+        self.max_memory = max_memory
+        self.memory = 0
 
     def on_create(self, block: "XZBlock") -> None:
-        self._freshly_used(block)
+        memory = block.read_memory_usage
+        self.block_reads[block] = memory
+        self.memory += memory
+        # the block being created is always kept, even if it is too big
+        while self.memory > self.max_memory and len(self.block_reads) > 1:
+            to_clear = next(iter(self.block_reads))
+            to_clear.clear()  # will call on_delete
+
+    def on_delete(self, block: "XZBlock") -> None:
+        self.memory -= self.block_reads.pop(block)
+
+    def on_read(self, block: "XZBlock") -> None:
+        self.block_reads.move_to_end(block)
+
+
+class CostBlockReadStrategy:
+    """Keep block readers that would be the most costly to create again.
+
+    This implements the GreedyDual algorithm, where the cost of a block
+    reader is its position in the block: all the data before it would
+    need to be decompressed again to get back there. Its priority is
+    that cost plus an inflation value, which is raised on each eviction
+    so that block readers not used recently eventually get evicted.
+    """
+
+    def __init__(self, max_block_read_nb: int = 8) -> None:
+        # ordered from least recently used to most recently used
+        # values are the inflation value when each block reader was last used
+        self.block_reads: dict[XZBlock, int] = {}
+        self.max_block_read_nb = max_block_read_nb
+        self.inflation = 0
+
+    def _priority(self, block: "XZBlock") -> int:
+        operation = block.operation
+        cost = operation.pos if operation is not None else 0
+        return self.block_reads[block] + cost
+
+    def on_create(self, block: "XZBlock") -> None:
+        self.block_reads[block] = self.inflation
         if len(self.block_reads) > self.max_block_read_nb:
             to_clear = min(
-                self.block_reads.items(),
-                key=lambda item: item[1],
-            )[0]
+                (item for item in self.block_reads if item is not block),
+                key=self._priority,
+            )
+            self.inflation = self._priority(to_clear)
             to_clear.clear()  # will call on_delete
 
     def on_delete(self, block: "XZBlock") -> None:
         del self.block_reads[block]
 
     def on_read(self, block: "XZBlock") -> None:
-        self._freshly_used(block)
+        self.block_reads.pop(block, None)
+        self.block_reads[block] = self.inflation
+
+
+class SharedBlockReadStrategy:
+    """Make a strategy safe to share between files used from several threads.
+
+    All calls to the wrapped strategy are serialized, so that one budget
+    (e.g. a number of block readers or an amount of memory) is enforced
+    across all the files using this instance.
+    """
+
+    def __init__(self, strategy: Optional["_BlockReadStrategyType"] = None) -> None:
+        self.strategy = strategy or RollingBlockReadStrategy()
+        # reentrant, as clearing a block from the wrapped strategy calls on_delete
+        self.lock = RLock()
+        self._blocks: set[XZBlock] = set()
+
+    def on_create(self, block: "XZBlock") -> None:
+        with self.lock:
+            self._blocks.add(block)
+            self.strategy.on_create(block)
+
+    def on_delete(self, block: "XZBlock") -> None:
+        with self.lock:
+            # the block may have been cleared concurrently by another thread
+            if block in self._blocks:
+                self._blocks.remove(block)
+                self.strategy.on_delete(block)
+
+    def on_read(self, block: "XZBlock") -> None:
+        with self.lock:
+            if block in self._blocks:
+                self.strategy.on_read(block)
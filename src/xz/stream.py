@@ -1,18 +1,183 @@
+from array import array
+from bisect import bisect_left
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Executor, Future
 from io import SEEK_CUR
-from typing import BinaryIO, Optional
+from itertools import accumulate, chain
+from threading import Lock
+from typing import BinaryIO, Optional, Union, cast
+from weakref import WeakValueDictionary
 
-from xz.block import XZBlock
+from xz.block import XZBlock, compress_block
+from xz.cache import BlockCache
 from xz.common import (
     XZError,
     create_xz_header,
     create_xz_index_footer,
     parse_xz_footer,
     parse_xz_header,
-    parse_xz_index,
+    parse_xz_index_packed,
     round_up,
 )
 from xz.io import IOCombiner, IOProxy
 from xz.typing import _BlockReadStrategyType, _LZMAFiltersType, _LZMAPresetType
+from xz.utils import FloorDict
+
+
+class _BlockIndex(FloorDict[XZBlock]):
+    """FloorDict of the blocks of a stream, using little memory per block.
+
+    Blocks added with add_records are stored in arrays (position, offset
+    in the stream, unpadded size), and their XZBlock objects are only
+    created when accessed; they are kept as long as they have a block
+    reader, or are used elsewhere (e.g. by the read-ahead of XZFile).
+
+    Blocks set with obj[key] = block (i.e. the ones being written)
+    are kept as is until sealed; their fileobj must be an IOProxy of
+    the stream.
+    """
+
+    def __init__(self, create_block: Callable[[int, int, int], XZBlock]) -> None:
+        super().__init__()
+        self._create_block = create_block  # (offset, unpadded, uncompressed)
+        self._keys = array("Q")
+        self._offsets = array("Q")
+        self._unpadded_sizes = array("Q")
+        self._end = 0  # end position of the last block
+        self._created: WeakValueDictionary[int, XZBlock] = WeakValueDictionary()
+        # blocks having a block reader, whatever the block read strategy
+        self._reading: set[XZBlock] = set()
+        # so that threads get the same block object, see XZFile.pread
+        self._created_lock = Lock()
+
+    def __repr__(self) -> str:
+        return f"_BlockIndex<{len(self._keys)} blocks>"
+
+    def add_records(self, key: int, offset: int, records: "array[int]") -> None:
+        """Add blocks after the existing ones, without creating their objects.
+
+        The records are packed (see parse_xz_index_packed), and key/offset
+        are the position/offset of the first block.
+        """
+        unpadded_sizes = records[::2]
+        uncompressed_sizes = records[1::2]
+        if not unpadded_sizes:
+            return
+        self._keys.extend(accumulate(uncompressed_sizes[:-1], initial=key))
+        self._offsets.extend(
+            accumulate(map(round_up, unpadded_sizes[:-1]), initial=offset)
+        )
+        self._unpadded_sizes.extend(unpadded_sizes)
+        self._end = self._keys[-1] + uncompressed_sizes[-1]
+
+    def _uncompressed_size(self, index: int) -> int:
+        if index + 1 < len(self._keys):
+            return self._keys[index + 1] - self._keys[index]
+        return self._end - self._keys[index]
+
+    def _value(self, index: int) -> XZBlock:
+        key = self._keys[index]
+        block = self._dict.get(key)
+        if block is not None:
+            return block
+        with self._created_lock:
+            block = self._created.get(key)
+            if block is None:
+                block = self._create_block(
+                    self._offsets[index],
+                    self._unpadded_sizes[index],
+                    self._uncompressed_size(index),
+                )
+                block.reading_blocks = self._reading
+                self._created[key] = block
+            return block
+
+    def seal(self) -> None:
+        """Keep the blocks which are no longer being written as records only.
+
+        Their objects are then kept as long as they have a block reader
+        or are used elsewhere, like the ones created when accessed.
+        """
+        for key, block in list(self._dict.items()):
+            if block.writable():
+                continue
+            index = self._key_index(key)
+            self._unpadded_sizes[index] = block.unpadded_size
+            if index + 1 == len(self._keys):
+                self._end = key + block.uncompressed_size
+            del self._dict[key]
+            block.reading_blocks = self._reading
+            self._created[key] = block
+
+    def created_blocks(self) -> list[XZBlock]:
+        """Return the XZBlock objects currently existing, without creating others."""
+        return [*self._dict.values(), *self._created.values()]
+
+    def iter_records(self) -> Iterator[tuple[int, int]]:
+        """Iterate over (unpadded size, uncompressed size), without creating blocks."""
+        for index, key in enumerate(self._keys):
+            block = self._dict.get(key)
+            if block is None:
+                yield (self._unpadded_sizes[index], self._uncompressed_size(index))
+            else:
+                yield (block.unpadded_size, block.uncompressed_size)
+
+    def get_with_index(self, key: int) -> tuple[int, XZBlock]:
+        if not isinstance(key, int):
+            raise TypeError("Invalid key")
+        index = self._key_index(key)
+        return (self._keys[index], self._value(index))
+
+    def items_from(self, key: int) -> Iterator[tuple[int, XZBlock]]:
+        if not isinstance(key, int):
+            raise TypeError("Invalid key")
+        first = self._key_index(key)
+        return (
+            (self._keys[index], self._value(index))
+            for index in range(first, len(self._keys))
+        )
+
+    def __setitem__(self, key: int, value: XZBlock) -> None:
+        if not isinstance(key, int):
+            raise TypeError("Invalid key")
+        index = bisect_left(self._keys, key)
+        if index == len(self._keys) or self._keys[index] != key:
+            self._keys.insert(index, key)
+            self._offsets.insert(index, 0)
+            self._unpadded_sizes.insert(index, 0)  # unused, as value is kept
+        self._offsets[index] = cast("IOProxy", value.fileobj).start
+        self._created.pop(key, None)
+        self._dict[key] = value
+
+    def __delitem__(self, key: int) -> None:
+        index = self._key_index(key)
+        if self._keys[index] != key:
+            raise KeyError(key)
+        if index + 1 == len(self._keys):
+            self._end = key  # previous block (if any) ends here
+        del self._keys[index]
+        del self._offsets[index]
+        del self._unpadded_sizes[index]
+        self._dict.pop(key, None)
+        self._created.pop(key, None)
+
+    def end_offset(self, default: int) -> int:
+        """Offset in the stream of the end of the last block (or default if none)."""
+        if not self._keys:
+            return default
+        index = len(self._keys) - 1
+        block = self._dict.get(self._keys[index])
+        unpadded_size = (
+            self._unpadded_sizes[index] if block is None else block.unpadded_size
+        )
+        return self._offsets[index] + round_up(unpadded_size)
+
+    @property
+    def last_item(self) -> XZBlock:
+        if not self._keys:
+            raise KeyError("dictionary is empty")
+        return self._value(len(self._keys) - 1)
 
 
 class XZStream(IOCombiner[XZBlock]):
@@ -23,13 +188,46 @@ class XZStream(IOCombiner[XZBlock]):
         preset: _LZMAPresetType = None,
         filters: _LZMAFiltersType = None,
         block_read_strategy: Optional[_BlockReadStrategyType] = None,
+        block_cache: Optional[BlockCache] = None,
+        memlimit: Optional[int] = None,
+        seek_window: int = 0,
+        block_size: Optional[int] = None,
+        executor: Optional[Executor] = None,
+        max_pending_blocks: int = 1,
     ) -> None:
+        # index records of the blocks not created yet, see _fileobjs
+        self._lazy_records: Optional[array[int]] = None
+        self._lazy_lock = Lock()
+        # blocks compressed by the executor but not written yet, see _write
+        self._block_buffer = bytearray()
+        self._block_futures: deque[tuple[int, Future[tuple[bytes, int, int]]]] = deque()
         super().__init__()
         self.fileobj = fileobj
         self._check = check
         self.preset = preset
         self.filters = filters
         self.block_read_strategy = block_read_strategy
+        self.block_cache = block_cache
+        self.memlimit = memlimit
+        self.seek_window = seek_window
+        self.block_size = block_size
+        self.executor = executor
+        self.max_pending_blocks = max_pending_blocks
+
+    @property
+    def _fileobjs(self) -> _BlockIndex:
+        if self._lazy_records is not None:
+            with self._lazy_lock:  # several threads may read, see XZFile.pread
+                if self._lazy_records is not None:
+                    self._create_lazy_blocks()
+        if self._block_buffer or self._block_futures:
+            self._flush_blocks()
+        return self._blocks
+
+    @_fileobjs.setter
+    def _fileobjs(self, _: FloorDict[XZBlock]) -> None:
+        # IOCombiner starts with an empty FloorDict, use a compact one instead
+        self._blocks = _BlockIndex(self._create_indexed_block)
 
     @property
     def check(self) -> int:
@@ -37,99 +235,274 @@ class XZStream(IOCombiner[XZBlock]):
 
     @property
     def block_boundaries(self) -> list[int]:
+        if self._block_buffer:
+            # do not end the block being buffered, see _write_parallel
+            return [
+                *self._blocks,
+                *(key for key, _ in self._block_futures),
+                self._length - len(self._block_buffer),
+            ]
         return list(self._fileobjs)
 
+    def created_blocks(self) -> list[XZBlock]:
+        """Return the XZBlock objects of the stream that were created.
+
+        Contrary to iter_blocks, this does not create the other ones.
+        """
+        return self._blocks.created_blocks()
+
+    def iter_blocks(self, pos: int = 0) -> Iterator[tuple[int, XZBlock]]:
+        """Iterate over (position, block), starting from the block at pos."""
+        if not self._fileobjs:
+            return iter(())
+        return self._fileobjs.items_from(pos)
+
     @property
     def _fileobj_blocks_end_pos(self) -> int:
-        return 12 + sum(
-            round_up(block.unpadded_size) for block in self._fileobjs.values()
-        )
+        # the blocks follow the 12 bytes of the header
+        return self._fileobjs.end_offset(12)
 
     @classmethod
     def parse(
         cls,
         fileobj: BinaryIO,
         block_read_strategy: Optional[_BlockReadStrategyType] = None,
+        block_cache: Optional[BlockCache] = None,
+        memlimit: Optional[int] = None,
+        seek_window: int = 0,
+        *,
+        lazy: bool = False,
     ) -> "XZStream":
         """Parse one XZ stream from a fileobj.
 
         fileobj position should be right at the end of the stream when calling
         and will be moved right at the start of the stream
+
+        If lazy is true, only the footer and the index are read: the header
+        is checked and the blocks are created when the stream is first used.
         """
         # footer
-        footer_end_pos = fileobj.seek(-12, SEEK_CUR) + 12
+        # positions are taken with tell, as seek of mmap objects returns None
+        fileobj.seek(-12, SEEK_CUR)
+        footer_end_pos = fileobj.tell() + 12
         footer = fileobj.read(12)
         check, backward_size = parse_xz_footer(footer)
 
         # index
-        block_start = fileobj.seek(-12 - backward_size, SEEK_CUR)
+        fileobj.seek(-12 - backward_size, SEEK_CUR)
         index = fileobj.read(backward_size)
-        records = parse_xz_index(index)
-        blocks_len = sum(round_up(unpadded_size) for unpadded_size, _ in records)
-        block_start -= blocks_len
-        blocks = []
-        for unpadded_size, uncompressed_size in records:
-            block_end = block_start + round_up(unpadded_size)
-            blocks.append(
-                XZBlock(
-                    IOProxy(fileobj, block_start, block_end),
-                    check,
-                    unpadded_size,
-                    uncompressed_size,
-                    block_read_strategy=block_read_strategy,
-                )
-            )
-            block_start = block_end
+        records = parse_xz_index_packed(index)
+        blocks_len = sum(map(round_up, records[::2]))
 
         # header
         fileobj.seek(-12 - blocks_len - backward_size, SEEK_CUR)
-        header = fileobj.read(12)
-        header_check = parse_xz_header(header)
-        if header_check != check:
+        if not lazy:
+            cls._check_header(fileobj.read(12), check)
+            fileobj.seek(-12, SEEK_CUR)
+        header_start_pos = fileobj.tell()
+
+        return cls.from_records(
+            fileobj,
+            header_start_pos,
+            footer_end_pos,
+            check,
+            records,
+            block_read_strategy,
+            block_cache,
+            memlimit,
+            seek_window,
+            lazy=lazy,
+        )
+
+    @staticmethod
+    def _check_header(header: bytes, check: int) -> None:
+        if parse_xz_header(header) != check:
             raise XZError("stream: inconsistent check value")
 
-        header_start_pos = fileobj.seek(-12, SEEK_CUR)
+    @classmethod
+    def from_records(
+        cls,
+        fileobj: BinaryIO,
+        start: int,
+        end: int,
+        check: int,
+        records: Union[Iterable[tuple[int, int]], "array[int]"],
+        block_read_strategy: Optional[_BlockReadStrategyType] = None,
+        block_cache: Optional[BlockCache] = None,
+        memlimit: Optional[int] = None,
+        seek_window: int = 0,
+        *,
+        lazy: bool = False,
+    ) -> "XZStream":
+        """Create one XZ stream of a fileobj from an already parsed layout.
 
-        stream_fileobj = IOProxy(fileobj, header_start_pos, footer_end_pos)
-        stream = cls(stream_fileobj, check, block_read_strategy=block_read_strategy)
-        for block in blocks:
-            stream._append(block)
+        The stream is located between start and end in fileobj,
+        and records are its index records (unpadded size, uncompressed size),
+        possibly packed in an array (see parse_xz_index_packed).
+
+        If lazy is true, the header is checked and the blocks are created
+        when the stream is first used.
+        """
+        stream = cls(
+            IOProxy(fileobj, start, end),
+            check,
+            block_read_strategy=block_read_strategy,
+            block_cache=block_cache,
+            memlimit=memlimit,
+            seek_window=seek_window,
+        )
+        if not isinstance(records, array):
+            records = array("Q", chain.from_iterable(records))
+        if lazy:
+            stream._lazy_records = records
+            stream._length = sum(records[1::2])
+        else:
+            stream._create_blocks(records)
         return stream
 
+    def _create_blocks(self, records: "array[int]") -> None:
+        # blocks objects are only created when used, see _BlockIndex
+        self._blocks.add_records(self._length, 12, records)
+        self._length += sum(records[1::2])
+
+    def _create_indexed_block(
+        self, offset: int, unpadded_size: int, uncompressed_size: int
+    ) -> XZBlock:
+        # proxy the underlying fileobj directly, rather than the stream one
+        start = self.fileobj.start + offset
+        return XZBlock(
+            IOProxy(self.fileobj.fileobj, start, start + round_up(unpadded_size)),
+            self.check,
+            unpadded_size,
+            uncompressed_size,
+            block_read_strategy=self.block_read_strategy,
+            block_cache=self.block_cache,
+            memlimit=self.memlimit,
+            seek_window=self.seek_window,
+        )
+
+    def _create_lazy_blocks(self) -> None:
+        self.fileobj.seek(0)
+        self._check_header(self.fileobj.read(12), self.check)
+        # the length is already known
+        self._blocks.add_records(0, 12, cast("array[int]", self._lazy_records))
+        self._lazy_records = None  # only once the blocks are there
+
+    @property
+    def records(self) -> list[tuple[int, int]]:
+        """Index records of the blocks: (unpadded size, uncompressed size)."""
+        return list(self._fileobjs.iter_records())
+
     def _create_fileobj(self) -> XZBlock:
-        self.fileobj.truncate(self._fileobj_blocks_end_pos)
+        blocks_end_pos = self._fileobj_blocks_end_pos
+        self.fileobj.truncate(blocks_end_pos)
         return XZBlock(
-            IOProxy(
-                self.fileobj,
-                self._fileobj_blocks_end_pos,
-                self._fileobj_blocks_end_pos,
-            ),
+            IOProxy(self.fileobj, blocks_end_pos, blocks_end_pos),
             self.check,
             0,
             0,
             self.preset,
             self.filters,
             self.block_read_strategy,
+            self.block_cache,
+            self.memlimit,
+            self.seek_window,
         )
 
+    def _write(self, data: bytes) -> int:
+        if self.executor is not None and self.block_size is not None:
+            return self._write_parallel(data, self.block_size)
+        if self.block_size is not None:
+            # write at most up to the end of the block, creating one if full
+            written_size = 0
+            if self._fileobjs:
+                last_block = self._fileobjs.last_item
+                if last_block.writable():
+                    written_size = len(last_block)
+                    if written_size >= self.block_size:
+                        self._change_fileobj()
+                        written_size = 0
+            data = data[: self.block_size - written_size]
+        return super()._write(data)
+
+    def _write_parallel(self, data: bytes, block_size: int) -> int:
+        # blocks are cut exactly as when compressing them one after the
+        # other, so that the output does not depend on the executor
+        if self._lazy_records is not None:
+            self._create_lazy_blocks()
+        if not self._block_buffer and not self._block_futures and self._blocks:
+            # the last block may have been written without the executor
+            # (e.g. before block_size was set), and must be ended first
+            last_block = self._blocks.last_item
+            if last_block.writable():
+                if not last_block:
+                    del self._blocks[self._blocks.last_key]
+                elif len(last_block) < block_size:
+                    # fill it, as when writing without the executor
+                    return super()._write(data[: block_size - len(last_block)])
+                else:
+                    last_block._write_end()  # noqa: SLF001
+                    self._blocks.seal()
+        if len(self._block_buffer) >= block_size:
+            self._submit_block()
+        data = data[: block_size - len(self._block_buffer)]
+        self._block_buffer += data
+        return len(data)
+
+    def _submit_block(self) -> None:
+        """Compress the buffered data as a new block with the executor."""
+        data, self._block_buffer = self._block_buffer, bytearray()
+        self._block_futures.append(
+            (
+                self._length - len(data),
+                cast("Executor", self.executor).submit(
+                    compress_block, data, self.check, self.preset, self.filters
+                ),
+            )
+        )
+        # write blocks as soon as possible, in order
+        # and limit the memory used by the ones waiting to be written
+        while self._block_futures and (
+            self._block_futures[0][1].done()
+            or len(self._block_futures) > self.max_pending_blocks
+        ):
+            self._write_compressed_block()
+
+    def _write_compressed_block(self) -> None:
+        key, future = self._block_futures.popleft()
+        data, unpadded_size, uncompressed_size = future.result()
+        offset = self._blocks.end_offset(12)
+        self.fileobj.truncate(offset)
+        self.fileobj.seek(offset)
+        self.fileobj.write(data)
+        self._blocks.add_records(
+            key, offset, array("Q", (unpadded_size, uncompressed_size))
+        )
+
+    def _flush_blocks(self) -> None:
+        """Write all the data given to the executor as blocks."""
+        if self._block_buffer:
+            self._submit_block()
+        while self._block_futures:
+            self._write_compressed_block()
+
     def _write_before(self) -> None:
         if not self:
             self.fileobj.seek(0)
             self.fileobj.truncate()
             self.fileobj.write(create_xz_header(self.check))
 
+    def _change_fileobj(self) -> None:
+        super()._change_fileobj()
+        self._blocks.seal()  # the previous block was ended
+
     def _write_after(self) -> None:
         super()._write_after()
+        self._blocks.seal()
         self.fileobj.seek(self._fileobj_blocks_end_pos)
         self.fileobj.truncate()
         self.fileobj.write(
-            create_xz_index_footer(
-                self.check,
-                [
-                    (block.unpadded_size, block.uncompressed_size)
-                    for block in self._fileobjs.values()
-                ],
-            )
+            create_xz_index_footer(self.check, list(self._fileobjs.iter_records()))
         )
 
     def change_block(self) -> None:
@@ -137,5 +510,7 @@ class XZStream(IOCombiner[XZBlock]):
         End the current block, and create a new one.
 
         If the current block is empty, replace it instead."""
-        if self._fileobjs:
+        if self._block_buffer:
+            self._submit_block()
+        elif self._fileobjs:
             self._change_fileobj()
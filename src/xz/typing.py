@@ -23,6 +23,9 @@ _XZModesBinaryType = Literal[
 _XZModesTextType = Literal["rt", "rt+", "wt", "wt+", "xt", "xt+"]
 
 
+# strategies which can be used by several threads at once (see XZFile.pread)
+# may also have a lock attribute, as a context manager (e.g. threading.RLock),
+# which is then held while a block reader is created and given to on_create
 class _BlockReadStrategyType(Protocol):  # noqa: PYI046
     def on_create(self, block: "XZBlock") -> None: ...  # pragma: no cover
 
@@ -1,5 +1,5 @@
 from bisect import bisect_right, insort_right
-from collections.abc import Iterator, MutableMapping
+from collections.abc import Iterator, MutableMapping, MutableSequence
 from typing import Generic, TypeVar, cast
 
 T = TypeVar("T")
@@ -15,7 +15,7 @@ class FloorDict(MutableMapping[int, T]):
 
     def __init__(self) -> None:
         self._dict: dict[int, T] = {}
-        self._keys: list[int] = []  # sorted
+        self._keys: MutableSequence[int] = []  # sorted
 
     def __repr__(self) -> str:
         return f"FloorDict<{self._dict!r}>"
@@ -45,6 +45,16 @@ class FloorDict(MutableMapping[int, T]):
     def __getitem__(self, key: int) -> T:
         return self.get_with_index(key)[1]
 
+    def items_from(self, key: int) -> Iterator[tuple[int, T]]:
+        """Iterate over the items, starting from the one returned by obj[key]."""
+        if not isinstance(key, int):
+            raise TypeError("Invalid key")
+        first = self._key_index(key)
+        return (
+            (self._keys[index], self._dict[self._keys[index]])
+            for index in range(first, len(self._keys))
+        )
+
     def __setitem__(self, key: int, value: T) -> None:
         if not isinstance(key, int):
             raise TypeError("Invalid key")
@@ -1,6 +1,8 @@
+from collections.abc import Callable
+from io import BytesIO
 import json
 from pathlib import Path
-from typing import TYPE_CHECKING, Any, cast
+from typing import TYPE_CHECKING, Any, BinaryIO, cast
 
 import pytest
 
@@ -22,3 +24,13 @@ def integration_case(request: "_Request") -> _IntegrationCase:
     with json_path.open() as json_file:
         metadata = cast("dict[str, Any]", json.load(json_file))
     return (json_path.with_suffix(".xz"), metadata)
+
+
+class _NonSeekableBytesIO(BytesIO):
+    def seekable(self) -> bool:
+        return False
+
+
+@pytest.fixture(scope="session")
+def non_seekable_fileobj() -> Callable[[bytes], BinaryIO]:
+    return _NonSeekableBytesIO
@@ -1,5 +1,6 @@
+from collections.abc import Callable
 from pathlib import Path
-from typing import Any
+from typing import Any, BinaryIO
 
 from xz import XZFile
 
@@ -35,6 +36,27 @@ def test_read_all(integration_case: _IntegrationCase, data_pattern: bytes) -> No
         assert xzfile.read() == data_pattern
 
 
+def test_read_sequential(
+    integration_case: _IntegrationCase,
+    data_pattern: bytes,
+    non_seekable_fileobj: Callable[[bytes], BinaryIO],
+) -> None:
+    xz_path, metadata = integration_case
+    with XZFile(non_seekable_fileobj(xz_path.read_bytes())) as xzfile:
+        assert not xzfile.seekable()
+        assert xzfile.read() == data_pattern
+        pos = 0
+        stream_boundaries = []
+        block_boundaries = []
+        for metadata_stream in metadata["streams"]:
+            stream_boundaries.append(pos)
+            for metadata_block in metadata_stream["blocks"]:
+                block_boundaries.append(pos)
+                pos += metadata_block["length"]
+        assert xzfile.stream_boundaries == stream_boundaries
+        assert xzfile.block_boundaries == block_boundaries
+
+
 def test_read_reversed(integration_case: _IntegrationCase, data_pattern: bytes) -> None:
     xz_path, _ = integration_case
     with XZFile(xz_path) as xzfile:
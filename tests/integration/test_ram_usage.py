@@ -1,5 +1,5 @@
 from collections.abc import Callable, Iterator
-from io import DEFAULT_BUFFER_SIZE
+from io import DEFAULT_BUFFER_SIZE, BytesIO
 from lzma import compress
 from pathlib import Path
 from random import randbytes, seed
@@ -88,6 +88,50 @@ def test_partial_read_each_block(
                 )
 
 
+BIG_BLOCK_SIZE = 100 * BLOCK_SIZE
+
+
+@pytest.fixture
+def fileobj_big_block() -> BinaryIO:
+    # single block with lots of compressible data
+    return BytesIO(compress(b"\x00" * BIG_BLOCK_SIZE))
+
+
+def test_seek_forward_in_big_block(
+    fileobj_big_block: BinaryIO, ram_usage: Callable[[], int]
+) -> None:
+    with XZFile(fileobj_big_block) as xz_file:
+        xz_file.read(1)
+        one_read_memory = ram_usage()
+
+        # seek near the end of the block
+        xz_file.seek(BIG_BLOCK_SIZE - 2)
+        assert xz_file.read(1) == b"\x00"
+        assert (
+            # should not depend on the size of the seek, take 2 as error margin
+            ram_usage() < one_read_memory * 2
+        ), "Consumes too much RAM"
+
+
+def test_read_sequential_big_block(
+    fileobj_big_block: BinaryIO,
+    ram_usage: Callable[[], int],
+    non_seekable_fileobj: Callable[[bytes], BinaryIO],
+) -> None:
+    fileobj = non_seekable_fileobj(fileobj_big_block.read())
+    with XZFile(fileobj) as xz_file:
+        xz_file.read(DEFAULT_BUFFER_SIZE)
+        one_read_memory = ram_usage()
+
+        # the block is not loaded at once
+        while xz_file.read(DEFAULT_BUFFER_SIZE):
+            assert (
+                # should not use much more memory, take 2 as error margin
+                ram_usage() < one_read_memory * 2
+            ), f"Consumes too much RAM (at {xz_file.tell() / BIG_BLOCK_SIZE:.0%})"
+        assert xz_file.tell() == BIG_BLOCK_SIZE
+
+
 def test_write(tmp_path: Path, ram_usage: Callable[[], int]) -> None:
     nb_blocks = 10
 
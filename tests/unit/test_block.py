@@ -1,14 +1,24 @@
 from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from io import SEEK_SET, BytesIO, UnsupportedOperation
-from typing import cast
+from lzma import LZMADecompressor
+from random import Random
+from threading import RLock
+from typing import Optional, Union, cast
 from unittest.mock import Mock, call
 
 import pytest
 
 import xz.block as block_module
-from xz.block import BlockRead, XZBlock
+from xz.block import BlockRead, BlockWrite, XZBlock, compress_block, decompress_block
+from xz.cache import BlockCache
 from xz.common import XZError, create_xz_header, create_xz_index_footer
 from xz.io import IOAbstract, IOStatic
+from xz.strategy import (
+    KeepBlockReadStrategy,
+    RollingBlockReadStrategy,
+    SharedBlockReadStrategy,
+)
 
 BLOCK_BYTES = bytes.fromhex(
     "0200210116000000742fe5a3e0006300415d00209842100431d01ab285328305"
@@ -40,6 +50,11 @@ def patch_buffer_size(monkeypatch: pytest.MonkeyPatch) -> None:
     monkeypatch.setattr(BlockRead, "read_size", 17)
 
 
+@pytest.fixture
+def no_write_buffer(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(BlockWrite, "buffer_size", 0)
+
+
 @pytest.fixture
 def compressor(monkeypatch: pytest.MonkeyPatch) -> Mock:
     mock = Mock()
@@ -84,6 +99,71 @@ def test_read_all(
     assert not fileobj.method_calls
 
 
+def test_pread(
+    fileobj: Mock, data_pattern_locate: Callable[[bytes], tuple[int, int]]
+) -> None:
+    block = XZBlock(fileobj, 1, 89, 100)
+    block.seek(10)
+    assert data_pattern_locate(block.pread(30, 20)) == (30, 20)
+    assert data_pattern_locate(block.pread(5, 1000)) == (5, 95)
+    assert block.pread(100, 10) == b""
+    assert block.pread(20, 0) == b""
+    assert block.tell() == 10  # position not used nor changed
+    assert data_pattern_locate(block.read(5)) == (10, 5)
+
+
+def test_pread_threads(
+    fileobj: Mock, data_pattern_locate: Callable[[bytes], tuple[int, int]]
+) -> None:
+    block = XZBlock(fileobj, 1, 89, 100)
+
+    # threads reading the same block wait for each other
+    with ThreadPoolExecutor(4) as executor:
+        results = list(
+            executor.map(lambda pos: block.pread(pos, 7), list(range(93)) * 3)
+        )
+    assert [data_pattern_locate(data) for data in results] == [
+        (pos, 7) for pos in range(93)
+    ] * 3
+
+
+class LockedStrategy(KeepBlockReadStrategy):
+    def __init__(self) -> None:
+        self.lock = RLock()
+
+
+@pytest.mark.parametrize(
+    "strategy",
+    [
+        pytest.param(RollingBlockReadStrategy(), id="rolling"),
+        pytest.param(SharedBlockReadStrategy(), id="shared"),
+        pytest.param(LockedStrategy(), id="custom"),
+    ],
+)
+def test_read_strategy_lock(
+    fileobj: Mock,
+    data_pattern_locate: Callable[[bytes], tuple[int, int]],
+    monkeypatch: pytest.MonkeyPatch,
+    strategy: Union[RollingBlockReadStrategy, SharedBlockReadStrategy, LockedStrategy],
+) -> None:
+    on_create = strategy.on_create
+    created: list[XZBlock] = []
+
+    def on_create_check(block: XZBlock) -> None:
+        # the reader is set, and other threads cannot evict it until registered
+        assert isinstance(block.operation, BlockRead)
+        with ThreadPoolExecutor(1) as executor:
+            assert not executor.submit(strategy.lock.acquire, blocking=False).result()
+        created.append(block)
+        on_create(block)
+
+    monkeypatch.setattr(strategy, "on_create", on_create_check)
+
+    block = XZBlock(fileobj, 1, 89, 100, block_read_strategy=strategy)
+    assert data_pattern_locate(block.read(10)) == (0, 10)
+    assert created == [block]
+
+
 def test_read_seek_forward(
     fileobj: Mock, data_pattern_locate: Callable[[bytes], tuple[int, int]]
 ) -> None:
@@ -135,6 +215,142 @@ def test_read_seek_forward(
     fileobj.method_calls.clear()
 
 
+def test_read_block_cache(
+    fileobj: Mock, data_pattern_locate: Callable[[bytes], tuple[int, int]]
+) -> None:
+    block_cache = BlockCache()
+    block = XZBlock(fileobj, 1, 89, 100, block_cache=block_cache)
+
+    block.seek(20)
+    assert data_pattern_locate(block.read(30)) == (20, 30)
+    assert block_cache.size == 30
+    assert block_cache.hits == 0
+    assert block_cache.misses
+    block_cache.misses = 0
+    fileobj.method_calls.clear()
+
+    # served from cache, fileobj is not used
+    block.seek(25)
+    assert data_pattern_locate(block.read(10)) == (25, 10)
+    assert data_pattern_locate(block.read(15)) == (35, 15)
+    assert block_cache.hits
+    assert block_cache.misses == 0
+    assert not fileobj.method_calls
+
+    # not in cache anymore
+    assert data_pattern_locate(block.read(10)) == (50, 10)
+    assert block_cache.misses
+    assert fileobj.method_calls
+
+
+@pytest.mark.parametrize("method", ["read", "readinto", "pread"])
+def test_read_block_cache_count(
+    monkeypatch: pytest.MonkeyPatch,
+    fileobj: Mock,
+    data_pattern_locate: Callable[[bytes], tuple[int, int]],
+    method: str,
+) -> None:
+    # data is decompressed and cached by many small chunks
+    monkeypatch.setattr(BlockRead, "max_output_size", 7)
+    monkeypatch.setattr(BlockRead, "skip_size", 3)
+    block_cache = BlockCache()
+    block = XZBlock(fileobj, 1, 89, 100, block_cache=block_cache)
+
+    def read(pos: int, size: int) -> bytes:
+        if method == "pread":
+            return block.pread(pos, size)
+        block.seek(pos)
+        if method == "readinto":
+            buffer = bytearray(size)
+            assert block.readinto(buffer) == size
+            return bytes(buffer)
+        return block.read(size)
+
+    # hits and misses are counted once per read
+    assert data_pattern_locate(read(50, 30)) == (50, 30)
+    assert (block_cache.hits, block_cache.misses) == (0, 1)
+    assert data_pattern_locate(read(50, 30)) == (50, 30)
+    assert (block_cache.hits, block_cache.misses) == (1, 1)
+    assert data_pattern_locate(read(60, 30)) == (60, 30)  # partly cached
+    assert (block_cache.hits, block_cache.misses) == (2, 2)
+    assert data_pattern_locate(read(10, 5)) == (10, 5)
+    assert (block_cache.hits, block_cache.misses) == (2, 3)
+
+
+def test_read_seek_forward_skip_size(
+    monkeypatch: pytest.MonkeyPatch,
+    fileobj: Mock,
+    data_pattern_locate: Callable[[bytes], tuple[int, int]],
+) -> None:
+    monkeypatch.setattr(BlockRead, "skip_size", 7)
+    max_lengths = []
+
+    class Decompressor:
+        def __init__(self, format: int, memlimit: Optional[int]) -> None:  # noqa: A002
+            self.decompressor = LZMADecompressor(format=format, memlimit=memlimit)
+
+        def __getattr__(self, name: str) -> object:
+            return getattr(self.decompressor, name)
+
+        def decompress(self, data: bytes, max_length: int) -> bytes:
+            max_lengths.append(max_length)
+            return self.decompressor.decompress(data, max_length)
+
+    monkeypatch.setattr(block_module, "LZMADecompressor", Decompressor)
+
+    block = XZBlock(fileobj, 1, 89, 100)
+    block.seek(60)
+    assert data_pattern_locate(block.read(4)) == (60, 4)
+    assert block.tell() == 64
+
+    # never decompress more than skip_size (plus read size) at once
+    assert len(max_lengths) > 60 // 7
+    assert all(max_length <= 7 + 4 for max_length in max_lengths)
+
+    # same file accesses as without skip_size
+    assert fileobj.method_calls == [
+        call.seek(0, SEEK_SET),
+        call.read(5),  # xz padding is 12 bytes
+        call.seek(5, SEEK_SET),
+        call.read(17),
+        call.seek(22, SEEK_SET),
+        call.read(17),
+        call.seek(39, SEEK_SET),
+        call.read(17),
+        call.seek(56, SEEK_SET),
+        call.read(17),
+    ]
+
+
+def test_read_max_output_size(
+    monkeypatch: pytest.MonkeyPatch,
+    fileobj: Mock,
+    data_pattern_locate: Callable[[bytes], tuple[int, int]],
+) -> None:
+    monkeypatch.setattr(BlockRead, "max_output_size", 7)
+    max_lengths = []
+
+    class Decompressor:
+        def __init__(self, format: int, memlimit: Optional[int]) -> None:  # noqa: A002
+            self.decompressor = LZMADecompressor(format=format, memlimit=memlimit)
+
+        def __getattr__(self, name: str) -> object:
+            return getattr(self.decompressor, name)
+
+        def decompress(self, data: bytes, max_length: int) -> bytes:
+            max_lengths.append(max_length)
+            return self.decompressor.decompress(data, max_length)
+
+    monkeypatch.setattr(block_module, "LZMADecompressor", Decompressor)
+
+    block = XZBlock(fileobj, 1, 89, 100)
+    assert data_pattern_locate(block.read()) == (0, 100)
+
+    # never decompress more than max_output_size at once
+    assert len(max_lengths) > 100 // 7
+    assert all(max_length <= 7 for max_length in max_lengths)
+
+
 def test_read_seek_backward(
     fileobj: Mock, data_pattern_locate: Callable[[bytes], tuple[int, int]]
 ) -> None:
@@ -181,6 +397,104 @@ def test_read_seek_backward(
     fileobj.method_calls.clear()
 
 
+def test_read_seek_backward_window(
+    fileobj: Mock, data_pattern_locate: Callable[[bytes], tuple[int, int]]
+) -> None:
+    block = XZBlock(fileobj, 1, 89, 100, seek_window=1024 * 1024)
+    assert block.tell() == 0
+
+    block.seek(60)
+    assert block.tell() == 60
+    assert not fileobj.method_calls  # no file access
+
+    block.seek(40)
+    assert block.tell() == 40
+    assert not fileobj.method_calls  # no file access
+    assert data_pattern_locate(block.read(4)) == (40, 4)
+    assert block.tell() == 44
+    assert fileobj.method_calls == [
+        call.seek(0, SEEK_SET),
+        call.read(5),  # xz padding is 12 bytes
+        call.seek(5, SEEK_SET),
+        call.read(17),
+        call.seek(22, SEEK_SET),
+        call.read(17),
+        call.seek(39, SEEK_SET),
+        call.read(17),
+    ]
+    fileobj.method_calls.clear()
+    assert not fileobj.method_calls  # no file access
+
+    # inside window of recent output
+    block.seek(20)
+    assert block.tell() == 20
+    assert data_pattern_locate(block.read(4)) == (20, 4)
+    assert block.tell() == 24
+    assert not fileobj.method_calls  # no file access
+
+    # partially inside window of recent output
+    assert data_pattern_locate(block.read(30)) == (24, 30)
+    assert block.tell() == 54
+    assert fileobj.method_calls == [
+        call.seek(56, SEEK_SET),
+        call.read(17),
+    ]
+    fileobj.method_calls.clear()
+
+
+def test_read_seek_backward_outside_window(
+    fileobj: Mock,
+    data_pattern_locate: Callable[[bytes], tuple[int, int]],
+) -> None:
+    block = XZBlock(fileobj, 1, 89, 100, seek_window=10)
+
+    block.seek(40)
+    assert data_pattern_locate(block.read(4)) == (40, 4)
+    window = bytes(block.operation.window)  # type: ignore[union-attr]
+    assert data_pattern_locate(window) == (34, 10)
+    fileobj.method_calls.clear()
+
+    block.seek(34)
+    assert data_pattern_locate(block.read(4)) == (34, 4)
+    assert not fileobj.method_calls  # no file access
+
+    block.seek(20)
+    assert block.tell() == 20
+    assert not fileobj.method_calls  # no file access
+    assert data_pattern_locate(block.read(4)) == (20, 4)
+    assert block.tell() == 24
+    assert fileobj.method_calls == [
+        call.seek(0, SEEK_SET),
+        call.read(5),  # xz padding is 12 bytes
+        call.seek(5, SEEK_SET),
+        call.read(17),
+        call.seek(22, SEEK_SET),
+        call.read(17),
+        call.seek(39, SEEK_SET),
+        call.read(17),
+    ]
+    fileobj.method_calls.clear()
+
+
+def test_read_seek_backward_no_window(
+    fileobj: Mock,
+    data_pattern_locate: Callable[[bytes], tuple[int, int]],
+) -> None:
+    block = XZBlock(fileobj, 1, 89, 100)  # no window by default
+
+    block.seek(40)
+    assert data_pattern_locate(block.read(4)) == (40, 4)
+    assert not block.operation.window  # type: ignore[union-attr]
+    fileobj.method_calls.clear()
+
+    block.seek(42)
+    assert data_pattern_locate(block.read(4)) == (42, 4)
+    assert fileobj.method_calls[:2] == [
+        call.seek(0, SEEK_SET),
+        call.read(5),
+    ]
+
+
 def test_read_wrong_uncompressed_size_too_small(
     fileobj: Mock, data_pattern_locate: Callable[[bytes], tuple[int, int]]
 ) -> None:
@@ -285,6 +599,145 @@ def test_read_decompressor_eof(
     assert str(exc_info.value) == "block: decompressor eof"
 
 
+def test_read_compressed(
+    fileobj: Mock, data_pattern_locate: Callable[[bytes], tuple[int, int]]
+) -> None:
+    block = XZBlock(fileobj, 1, 89, 100)
+    assert block.read_compressed() == BLOCK_BYTES
+
+    # does not interfere with block reads
+    assert data_pattern_locate(block.read(10)) == (0, 10)
+    assert block.read_compressed() == BLOCK_BYTES
+    assert data_pattern_locate(block.read(10)) == (10, 10)
+
+
+def test_dict_size(fileobj: Mock) -> None:
+    block = XZBlock(fileobj, 1, 89, 100)
+    assert block.dict_size == 8 * 1024 * 1024
+    assert block.read_memory_usage == 8 * 1024 * 1024 + BlockRead.skip_size
+    assert fileobj.method_calls == [
+        call.seek(0, SEEK_SET),
+        call.read(1),
+        call.read(11),
+    ]
+    fileobj.method_calls.clear()
+
+    # cached
+    assert block.dict_size == 8 * 1024 * 1024
+    assert not fileobj.method_calls
+
+    # memory used by the window of recent output
+    block.seek_window = 1000
+    assert block.read_memory_usage == 8 * 1024 * 1024 + 1000 + BlockRead.skip_size
+
+
+def test_dict_size_empty(fileobj_empty: Mock) -> None:
+    block = XZBlock(fileobj_empty, 1, 0, 0)
+    with pytest.raises(XZError) as exc_info:
+        _ = block.dict_size
+    assert str(exc_info.value) == "block header length"
+
+
+def test_read_memlimit(fileobj: Mock) -> None:
+    block = XZBlock(fileobj, 1, 89, 100, memlimit=1024)
+    assert block.memlimit == 1024
+    with pytest.raises(XZError) as exc_info:
+        block.read()
+    assert str(exc_info.value).startswith(
+        "block: error while decompressing: Memory usage limit"
+    )
+
+
+#
+# decompress_block
+#
+
+
+def test_decompress_block(
+    data_pattern_locate: Callable[[bytes], tuple[int, int]],
+) -> None:
+    assert data_pattern_locate(decompress_block(BLOCK_BYTES, 1, 89, 100)) == (0, 100)
+
+
+@pytest.mark.parametrize(
+    ["unpadded_size", "uncompressed_size"],
+    [(89, 99), (89, 101), (88, 100)],
+    ids=("uncompressed-too-small", "uncompressed-too-big", "wrong-unpadded"),
+)
+def test_decompress_block_wrong_sizes(
+    unpadded_size: int, uncompressed_size: int
+) -> None:
+    with pytest.raises(XZError) as exc_info:
+        decompress_block(BLOCK_BYTES, 1, unpadded_size, uncompressed_size)
+    assert str(exc_info.value).startswith("block: error while decompressing: ")
+
+
+def test_decompress_block_memlimit() -> None:
+    with pytest.raises(XZError) as exc_info:
+        decompress_block(BLOCK_BYTES, 1, 89, 100, 1024)
+    assert str(exc_info.value).startswith(
+        "block: error while decompressing: Memory usage limit"
+    )
+
+
+def test_decompress_block_wrong_check() -> None:
+    with pytest.raises(XZError) as exc_info:
+        decompress_block(BLOCK_BYTES[:-4] + b"\xff" * 4, 1, 89, 100)
+    assert str(exc_info.value) == "block: error while decompressing: Corrupt input data"
+
+
+def test_decompress_block_truncated() -> None:
+    with pytest.raises(XZError) as exc_info:
+        decompress_block(BLOCK_BYTES[:56], 1, 89, 100)
+    assert str(exc_info.value) == "block: data eof"
+
+
+#
+# compress_block
+#
+
+
+@pytest.mark.parametrize("size", [14, 3_000_014])
+def test_compress_block(fileobj_empty: Mock, size: int) -> None:
+    data = (b"Hello, world!\n" * (size // 14 + 1))[:size]
+
+    with XZBlock(fileobj_empty, 1, 0, 0) as block:
+        for pos in range(0, size, 100_000):
+            block.write(data[pos : pos + 100_000])
+
+    assert compress_block(data, 1) == (
+        fileobj_empty.getvalue(),
+        block.unpadded_size,
+        block.uncompressed_size,
+    )
+
+
+def test_compress_block_sizes() -> None:
+    data, unpadded_size, uncompressed_size = compress_block(b"Hello, world!\n", 1)
+    assert data == BLOCK_BYTES[:12] + b"\x01\x00\rHello, world!\n\x00\x00\x00\x18\xa7U{"
+    assert unpadded_size == 34
+    assert uncompressed_size == 14
+    assert decompress_block(data, 1, unpadded_size, uncompressed_size) == (
+        b"Hello, world!\n"
+    )
+
+
+def test_compress_block_compressor_error_0(compressor: Mock) -> None:
+    compressor.compress.return_value = create_xz_header(0)
+    compressor.flush.return_value = create_xz_index_footer(1, [(34, 14)])
+    with pytest.raises(XZError) as exc_info:
+        compress_block(b"Hello, world!\n", 1)
+    assert str(exc_info.value) == "block: compressor header"
+
+
+def test_compress_block_compressor_error_1(compressor: Mock) -> None:
+    compressor.compress.return_value = create_xz_header(1)
+    compressor.flush.return_value = create_xz_index_footer(0, [(13, 37), (4, 2)])
+    with pytest.raises(XZError) as exc_info:
+        compress_block(b"Hello, world!\n", 1)
+    assert str(exc_info.value) == "block: compressor footer check"
+
+
 #
 # writable
 #
@@ -305,6 +758,7 @@ def test_writable_empty(fileobj_empty: Mock) -> None:
 #
 
 
+@pytest.mark.usefixtures("no_write_buffer")
 def test_write_once(fileobj_empty: Mock) -> None:
     with XZBlock(fileobj_empty, 1, 0, 0) as block:
         block.write(b"Hello, world!\n")
@@ -324,6 +778,7 @@ def test_write_once(fileobj_empty: Mock) -> None:
     ]
 
 
+@pytest.mark.usefixtures("no_write_buffer")
 def test_write_multiple(fileobj_empty: Mock) -> None:
     with XZBlock(fileobj_empty, 1, 0, 0) as block:
         block.write(b"Hello,")
@@ -348,6 +803,44 @@ def test_write_multiple(fileobj_empty: Mock) -> None:
     assert fileobj_empty.method_calls  # flushing compressor
 
 
+def test_write_buffered(fileobj_empty: Mock) -> None:
+    with XZBlock(fileobj_empty, 1, 0, 0) as block:
+        block.write(b"Hello,")
+        block.write(b" world!\n")
+        assert block.tell() == 14
+        assert not fileobj_empty.method_calls  # buffered
+
+    assert block.unpadded_size == 34
+    assert block.uncompressed_size == 14
+
+    assert fileobj_empty.method_calls == [
+        call.seek(0),
+        call.write(
+            b"\x02\x00!\x01\x16\x00\x00\x00t/\xe5\xa3"
+            b"\x01\x00\rHello, world!\n\x00\x00\x00\x18\xa7U{"
+        ),
+    ]
+
+
+def test_write_buffer_size(
+    fileobj_empty: Mock, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(BlockWrite, "buffer_size", 20)
+    with XZBlock(fileobj_empty, 1, 0, 0) as block:
+        block.write(b"Hello, world!\n")
+        assert not fileobj_empty.method_calls  # header is buffered
+        # incompressible data
+        block.write(Random(0).randbytes(200_000))  # noqa: S311
+        assert fileobj_empty.method_calls  # compressed data is big enough
+        assert all(
+            len(method_call.args[0]) >= 20
+            for method_call in fileobj_empty.method_calls
+            if method_call[0] == "write"
+        )
+
+    assert block.uncompressed_size == 200_014
+
+
 @pytest.mark.parametrize("pos", [0, 42, 100, 200])
 def test_write_existing(fileobj: Mock, pos: int) -> None:
     block = XZBlock(fileobj, 1, 89, 100)
@@ -357,6 +850,18 @@ def test_write_existing(fileobj: Mock, pos: int) -> None:
         block.write(b"a")
 
 
+def test_write_block_cache(fileobj_empty: Mock) -> None:
+    block_cache = BlockCache()
+    block = XZBlock(fileobj_empty, 1, 0, 0, block_cache=block_cache)
+    block_cache.put(block, 0, b"stale")
+
+    # cached data is removed when the block is (re)written
+    block.write(b"Hello")
+    assert block_cache.size == 0
+    block.seek(0)
+    assert block.read() == b"Hello"
+
+
 def test_write_compressor_error_0(fileobj_empty: Mock, compressor: Mock) -> None:
     compressor.compress.return_value = create_xz_header(0)
     with XZBlock(fileobj_empty, 1, 0, 0) as block, pytest.raises(XZError) as exc_info:
@@ -405,6 +910,7 @@ def test_truncate_empty_zero(fileobj_empty: Mock) -> None:
     assert not fileobj_empty.method_calls
 
 
+@pytest.mark.usefixtures("no_write_buffer")
 def test_truncate_empty_fill(fileobj_empty: Mock) -> None:
     with XZBlock(fileobj_empty, 1, 0, 0) as block:
         block.truncate(42)
@@ -0,0 +1,163 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import cast
+
+import pytest
+
+from xz.block import XZBlock
+from xz.cache import BlockCache
+
+
+def create_block(name: str) -> XZBlock:
+    return cast("XZBlock", name)  # only used as dict keys
+
+
+def test_get_put() -> None:
+    block_a = create_block("a")
+    block_b = create_block("b")
+    cache = BlockCache(100)
+    assert cache.max_size == 100
+
+    assert cache.get(block_a, 0) is None
+    assert (cache.hits, cache.misses) == (0, 1)
+
+    cache.put(block_a, 10, b"abcdef")
+    cache.put(block_a, 20, b"ghij")
+    assert cache.size == 10
+
+    assert cache.get(block_a, 9) is None  # before first range
+    assert cache.get(block_a, 16) is None  # between ranges
+    assert cache.get(block_a, 24) is None  # after last range
+    assert cache.get(block_b, 10) is None  # other block
+    assert (cache.hits, cache.misses) == (0, 5)
+
+    assert cache.get(block_a, 10) == b"abcdef"
+    assert cache.get(block_a, 13) == b"def"
+    assert cache.get(block_a, 23) == b"j"
+    assert (cache.hits, cache.misses) == (3, 5)
+
+    # replace existing range
+    cache.put(block_a, 10, b"kl")
+    assert cache.size == 6
+    assert cache.get(block_a, 11) == b"l"
+    assert cache.get(block_a, 12) is None
+
+
+def test_get_count() -> None:
+    block_a = create_block("a")
+    cache = BlockCache(100)
+    cache.put(block_a, 0, b"abc")
+
+    assert cache.get(block_a, 0, count_hit=False) == b"abc"
+    assert cache.get(block_a, 3, count_miss=False) is None
+    assert (cache.hits, cache.misses) == (0, 0)
+
+    assert cache.get(block_a, 0, count_miss=False) == b"abc"
+    assert cache.get(block_a, 3, count_hit=False) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_put_empty() -> None:
+    cache = BlockCache(100)
+    cache.put(create_block("a"), 0, b"")
+    assert cache.size == 0
+    assert cache.get(create_block("a"), 0) is None
+
+
+def test_put_too_big() -> None:
+    cache = BlockCache(5)
+    cache.put(create_block("a"), 0, b"abcde")
+    cache.put(create_block("b"), 0, b"abcdef")
+    assert cache.size == 5
+    assert cache.get(create_block("a"), 0) == b"abcde"
+    assert cache.get(create_block("b"), 0) is None
+
+
+def test_eviction_lru() -> None:
+    block_a = create_block("a")
+    block_b = create_block("b")
+    cache = BlockCache(10)
+
+    cache.put(block_a, 0, b"abc")
+    cache.put(block_b, 0, b"def")
+    cache.put(block_a, 3, b"ghi")
+    assert cache.size == 9
+
+    # use first range so that it is not the least recently used anymore
+    assert cache.get(block_a, 0) == b"abc"
+
+    cache.put(block_b, 3, b"jkl")
+    assert cache.size == 9
+    assert cache.get(block_b, 0) is None  # evicted
+    assert cache.get(block_a, 0) == b"abc"
+    assert cache.get(block_a, 3) == b"ghi"
+    assert cache.get(block_b, 3) == b"jkl"
+
+    # evict several ranges at once
+    cache.put(block_b, 6, b"mnopqrst")
+    assert cache.size == 8
+    assert cache.get(block_a, 0) is None
+    assert cache.get(block_a, 3) is None
+    assert cache.get(block_b, 3) is None
+    assert cache.get(block_b, 6) == b"mnopqrst"
+
+
+def test_max_size_zero() -> None:
+    cache = BlockCache(0)
+    cache.put(create_block("a"), 0, b"abc")
+    assert cache.size == 0
+    assert cache.get(create_block("a"), 0) is None
+
+
+def test_max_size_invalid() -> None:
+    with pytest.raises(ValueError, match=r"^max_size must be positive or zero$"):
+        BlockCache(-1)
+
+
+def test_clear() -> None:
+    cache = BlockCache(100)
+    cache.put(create_block("a"), 0, b"abc")
+    assert cache.get(create_block("a"), 1) == b"bc"
+    assert cache.get(create_block("a"), 3) is None
+    cache.clear()
+    assert cache.size == 0
+    assert cache.get(create_block("a"), 1) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_remove() -> None:
+    block_a = create_block("a")
+    block_b = create_block("b")
+    cache = BlockCache(100)
+    cache.put(block_a, 0, b"abc")
+    cache.put(block_a, 3, b"def")
+    cache.put(block_b, 0, b"ghi")
+
+    cache.remove(block_a)
+    assert cache.size == 3
+    assert cache.get(block_a, 0) is None
+    assert cache.get(block_a, 3) is None
+    assert cache.get(block_b, 0) == b"ghi"
+
+    cache.remove(block_a)  # nothing cached anymore
+    assert cache.size == 3
+
+    # removed ranges are not evicted again
+    cache.put(block_a, 0, b"x" * 97)
+    assert cache.size == 100
+    assert cache.get(block_b, 0) == b"ghi"
+
+
+def test_threads() -> None:
+    cache = BlockCache(100)
+    blocks = [create_block(name) for name in "abcdefgh"]
+
+    def use(index: int) -> None:
+        block = blocks[index % len(blocks)]
+        cache.put(block, index, b"x" * 30)
+        cache.get(block, index)
+
+    with ThreadPoolExecutor(8) as executor:
+        list(executor.map(use, range(2000)))
+
+    assert cache.size == 90
+    assert cache.hits + cache.misses == 2000
@@ -1,4 +1,6 @@
+from array import array
 from lzma import CHECK_CRC32, CHECK_CRC64, CHECK_NONE, CHECK_SHA256, is_check_supported
+import random
 
 import pytest
 
@@ -8,11 +10,16 @@ from xz.common import (
     create_xz_header,
     create_xz_index_footer,
     decode_mbi,
+    decode_mbis,
     encode_mbi,
+    encode_mbis,
+    get_check_size,
     pad,
+    parse_xz_block_header,
     parse_xz_footer,
     parse_xz_header,
     parse_xz_index,
+    parse_xz_index_packed,
     round_up,
 )
 
@@ -59,6 +66,44 @@ def test_decode_mbi_invalid(data: str) -> None:
     assert str(exc_info.value) == "invalid mbi"
 
 
+def test_encode_mbis() -> None:
+    rand = random.Random(42)  # noqa: S311
+    values = [rand.randrange(1 << rand.randrange(1, 65)) for _ in range(10000)]
+    values += [0, 1, 127, 128, (1 << 63) - 1, 1 << 63, (1 << 64) - 1]
+    assert encode_mbis(array("Q")) == b""
+    assert encode_mbis(array("Q", values)) == b"".join(
+        encode_mbi(value) for value in values
+    )
+
+
+def test_decode_mbis() -> None:
+    values = [0, 1, 127, 128, 999, 99999999, (1 << 63) - 1]
+    data = b"".join(encode_mbi(value) for value in values)
+    assert decode_mbis(data, 0) == (array("Q"), 0)
+    assert decode_mbis(data, 2) == (array("Q", values[:2]), 2)
+    assert decode_mbis(data, len(values)) == (array("Q", values), len(data))
+    assert decode_mbis(data + b"\x00\x00", len(values)) == (
+        array("Q", values),
+        len(data),
+    )
+    # data ending before count
+    assert decode_mbis(data, 100) == (array("Q", values), len(data))
+    assert decode_mbis(data + b"\x81\x82", 100) == (array("Q", values), len(data))
+    assert decode_mbis(b"", 100) == (array("Q"), 0)
+
+
+def test_decode_mbis_many() -> None:
+    rand = random.Random(42)  # noqa: S311
+    values = [rand.randrange(1 << rand.randrange(1, 64)) for _ in range(10000)]
+    data = b"".join(encode_mbi(value) for value in values)
+    assert decode_mbis(data, len(values)) == (array("Q", values), len(data))
+
+
+def test_decode_mbis_too_long() -> None:
+    with pytest.raises(XZError, match=r"^invalid mbi$"):
+        decode_mbis(bytes.fromhex("01" + "ff" * 9 + "01"), 2)
+
+
 @pytest.mark.parametrize(
     ["value", "expected"],
     [(0, 0), (1, 4), (2, 4), (3, 4), (4, 4), (5, 8), (6, 8), (7, 8), (8, 8)],
@@ -88,6 +133,28 @@ def test_pad(value: int, padding: str) -> None:
     assert not len(data) % 4
 
 
+@pytest.mark.parametrize(
+    ["check", "size"],
+    [
+        (CHECK_NONE, 0),
+        (CHECK_CRC32, 4),
+        (2, 4),
+        (CHECK_CRC64, 8),
+        (7, 16),
+        (CHECK_SHA256, 32),
+        (15, 64),
+    ],
+)
+def test_get_check_size(check: int, size: int) -> None:
+    assert get_check_size(check) == size
+
+
+@pytest.mark.parametrize("check", [-1, 16])
+def test_get_check_size_invalid(check: int) -> None:
+    with pytest.raises(XZError, match=r"^check id$"):
+        get_check_size(check)
+
+
 XZ_HEADER_CASES = (
     pytest.param(CHECK_NONE, "fd377a585a000000ff12d941", id="check_none"),
     pytest.param(CHECK_CRC32, "fd377a585a0000016922de36", id="check_crc32"),
@@ -150,6 +217,18 @@ XZ_INDEX_CASES = (
 @pytest.mark.parametrize(["records", "data"], XZ_INDEX_CASES)
 def test_create_xz_index(records: list[tuple[int, int]], data: str) -> None:
     assert create_xz_index_footer(1, records)[:-12] == bytes.fromhex(data)
+    packed = array("Q", [value for record in records for value in record])
+    assert create_xz_index_footer(1, packed)[:-12] == bytes.fromhex(data)
+
+
+def test_create_xz_index_many() -> None:
+    rand = random.Random(42)  # noqa: S311
+    records = [
+        (rand.randrange(1, 1 << 30), rand.randrange(1 << 40)) for _ in range(100000)
+    ]
+    index_footer = create_xz_index_footer(1, records)
+    assert parse_xz_index(index_footer[:-12]) == records
+    assert parse_xz_footer(index_footer[-12:]) == (1, len(index_footer) - 12)
 
 
 def test_create_xz_index_invalid() -> None:
@@ -161,6 +240,9 @@ def test_create_xz_index_invalid() -> None:
 @pytest.mark.parametrize(["records", "data"], XZ_INDEX_CASES)
 def test_parse_xz_index(records: list[tuple[int, int]], data: str) -> None:
     assert parse_xz_index(bytes.fromhex(data)) == records
+    assert parse_xz_index_packed(bytes.fromhex(data)) == array(
+        "Q", [value for record in records for value in record]
+    )
 
 
 @pytest.mark.parametrize(
@@ -174,6 +256,8 @@ def test_parse_xz_index(records: list[tuple[int, int]], data: str) -> None:
         ("000188047163b1d4", "index size"),
         ("000104002f70ea44", "index record uncompressed size"),
         ("000180180400420096a658c0", "index padding"),
+        ("0001808040aebdf6", "invalid mbi"),
+        ("0001ffffffffffffffffff7f0400000089ca5577", "invalid mbi"),
     ],
 )
 def test_parse_xz_index_invalid(data: str, message: str) -> None:
@@ -224,5 +308,42 @@ def test_parse_xz_footer_invalid(data: str, message: str) -> None:
     assert str(exc_info.value) == message
 
 
+@pytest.mark.parametrize(
+    ["data", "dict_size"],
+    [
+        pytest.param("020021010c0000008f98419c", 256 * 1024, id="preset-0"),
+        pytest.param("0200210116000000742fe5a3", 8 * 1024 * 1024, id="preset-6"),
+        pytest.param("020021011c00000010cf58cc", 64 * 1024 * 1024, id="preset-9"),
+        pytest.param("0200210100000000372797d6", 4096, id="min"),
+        pytest.param("0200210128000000e6a011b3", 0xFFFFFFFF, id="max"),
+        pytest.param(
+            "03c180016403010021011600af8ad336", 8 * 1024 * 1024, id="sizes-delta"
+        ),
+    ],
+)
+def test_parse_xz_block_header(data: str, dict_size: int) -> None:
+    assert parse_xz_block_header(bytes.fromhex(data)) == dict_size
+
+
+@pytest.mark.parametrize(
+    ["data", "message"],
+    [
+        ("0100210c", "block header length"),
+        ("030021010c0000008f98419c", "block header length"),
+        ("020021010c0000008f98419d", "block header crc32"),
+        ("020421010c0000009cbc0e68", "block header flags"),
+        ("020021010c000100cea95a85", "block header padding"),
+        ("02000301000000000a83f39c", "block header filters"),
+        ("020021090c0000004ed331ac", "block header filters"),
+        ("020021012900000083c7ad0b", "block header filters"),
+        ("020021020c0000005fe2e1db", "block header filters"),
+    ],
+)
+def test_parse_xz_block_header_invalid(data: str, message: str) -> None:
+    with pytest.raises(XZError) as exc_info:
+        parse_xz_block_header(bytes.fromhex(data))
+    assert str(exc_info.value) == message
+
+
 def test_default_check_supported() -> None:
     assert is_check_supported(DEFAULT_CHECK)
@@ -1,15 +1,28 @@
+from array import array
 from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+import gc
 from io import SEEK_END, SEEK_SET, BytesIO, UnsupportedOperation
+from lzma import CHECK_CRC64, CHECK_NONE, FILTER_LZMA2
 import os
 from pathlib import Path
+import random
+from threading import Barrier, Lock, get_ident
 from typing import Optional, Union, cast
 from unittest.mock import Mock, call
 
 import pytest
 
+from xz.block import BlockRead, XZBlock
+from xz.cache import BlockCache
 from xz.common import XZError
 from xz.file import XZFile
-from xz.strategy import RollingBlockReadStrategy
+from xz.strategy import (
+    CostBlockReadStrategy,
+    MemoryBlockReadStrategy,
+    RollingBlockReadStrategy,
+    SharedBlockReadStrategy,
+)
 
 FILE_BYTES = bytes.fromhex(
     # stream 1: two blocks (lengths: 100, 90)
@@ -89,13 +102,17 @@ def test_required_abilities(mode: str, ability: str, init_has_ability: bool) ->
     fileobj = Mock(wraps=BytesIO(FILE_BYTES))
     getattr(fileobj, ability).return_value = init_has_ability
 
-    expected_ability = (
-        ability == "seekable"
-        or "+" in mode
-        or ((ability == "readable") == ("r" in mode))
-    )
+    if ability == "seekable":
+        # not required in r, w and x modes, where data is read or written
+        # sequentially
+        required_ability = "+" in mode
+        expected_ability = required_ability or init_has_ability
+    else:
+        required_ability = expected_ability = "+" in mode or (
+            (ability == "readable") == ("r" in mode)
+        )
 
-    if not init_has_ability and expected_ability:
+    if not init_has_ability and required_ability:
         with pytest.raises(ValueError, match=rf"^filename is not {ability}$"):
             XZFile(fileobj, mode=mode)
     else:
@@ -177,6 +194,278 @@ def test_read(
         assert xzfile.read() == b""
 
 
+@pytest.mark.parametrize("threads", [1, 2])
+def test_read_mmap(
+    threads: int,
+    tmp_path: Path,
+    data_pattern_locate: Callable[[bytes], tuple[int, int]],
+) -> None:
+    file_path = tmp_path / "archive.xz"
+    file_path.write_bytes(FILE_BYTES)
+
+    with XZFile(file_path, mmap=True, threads=threads) as xzfile:
+        assert xzfile.stream_boundaries == [0, 190]
+        assert xzfile.block_boundaries == [0, 100, 190, 250, 310, 370]
+        assert xzfile._mmap is not None
+        xzfile.fileobj.close()  # file object is not used anymore
+        assert data_pattern_locate(xzfile.read()) == (0, 400)
+        xzfile.seek(42)
+        assert data_pattern_locate(xzfile.read(300)) == (42, 300)
+    assert xzfile._mmap.closed
+
+
+@pytest.mark.parametrize("threads", [1, 2])
+def test_read_mmap_corrupted(threads: int, tmp_path: Path) -> None:
+    file_path = tmp_path / "archive.xz"
+    file_path.write_bytes(FILE_BYTES_MANY_SMALL_BLOCKS.replace(b"789", b"987", 1))
+
+    with (
+        pytest.raises(XZError) as exc_info,
+        XZFile(file_path, mmap=True, threads=threads) as xzfile,
+    ):
+        xzfile.read()
+    assert str(exc_info.value) == "block: error while decompressing: Corrupt input data"
+    assert xzfile._mmap is not None
+    assert xzfile._mmap.closed
+    assert xzfile.fileobj.closed
+
+
+def test_read_mmap_close_error(tmp_path: Path) -> None:
+    file_path = tmp_path / "archive.xz"
+    file_path.write_bytes(FILE_BYTES)
+
+    xzfile = XZFile(file_path, mmap=True)
+    mmap = xzfile._mmap
+    assert mmap is not None
+    xzfile._mmap = Mock(close=Mock(side_effect=BufferError("exported pointers")))
+    with pytest.raises(BufferError):
+        xzfile.close()
+    assert xzfile.fileobj.closed  # closed anyway
+    mmap.close()
+
+
+def test_read_mmap_empty(tmp_path: Path) -> None:
+    file_path = tmp_path / "archive.xz"
+    file_path.write_bytes(b"")
+
+    with pytest.raises(XZError, match=r"^file: no streams$"):
+        XZFile(file_path, mmap=True)
+
+
+@pytest.mark.parametrize("mode", ["r+", "w", "w+"])
+def test_mmap_invalid_mode(mode: str, tmp_path: Path) -> None:
+    file_path = tmp_path / "archive.xz"
+    file_path.write_bytes(FILE_BYTES)
+
+    with pytest.raises(ValueError, match=r"^mmap is only supported in read mode$"):
+        XZFile(file_path, mode, mmap=True)
+
+
+def test_mmap_invalid_fileobj() -> None:
+    with pytest.raises(ValueError, match=r"^filename has no file descriptor to mmap$"):
+        XZFile(BytesIO(FILE_BYTES), mmap=True)
+
+
+@pytest.mark.parametrize("use_mmap", [False, True])
+def test_index_file(
+    use_mmap: bool,
+    tmp_path: Path,
+    data_pattern_locate: Callable[[bytes], tuple[int, int]],
+) -> None:
+    file_path = tmp_path / "archive.xz"
+    file_path.write_bytes(FILE_BYTES)
+    index_path = tmp_path / "archive.xz.idx"
+
+    # missing index file: parse streams
+    with XZFile(file_path, index_file=index_path, mmap=use_mmap) as xzfile:
+        assert xzfile.index_file == index_path
+        assert not index_path.exists()
+        xzfile.save_index(index_path)
+
+    # use index file: only footer is read
+    fileobj = Mock(wraps=file_path.open("rb"))
+    with XZFile(fileobj, index_file=index_path) as xzfile:
+        assert fileobj.method_calls == [
+            call.seekable(),
+            call.readable(),
+            call.seek(0, SEEK_END),
+            call.seek(FILE_BYTES.__len__() - 12),
+            call.read(),
+            call.fileno(),
+        ]
+        assert xzfile.stream_boundaries == [0, 190]
+        assert xzfile.block_boundaries == [0, 100, 190, 250, 310, 370]
+        assert data_pattern_locate(xzfile.read()) == (0, 400)
+        xzfile.seek(180)
+        assert data_pattern_locate(xzfile.read(20)) == (180, 20)
+    fileobj.close()
+
+    with XZFile(file_path, index_file=index_path, mmap=use_mmap) as xzfile:
+        assert data_pattern_locate(xzfile.read()) == (0, 400)
+
+
+def test_index_file_outdated(tmp_path: Path) -> None:
+    file_path = tmp_path / "archive.xz"
+    file_path.write_bytes(FILE_BYTES)
+    index_path = tmp_path / "archive.xz.idx"
+    with XZFile(file_path) as xzfile:
+        xzfile.save_index(index_path)
+
+    # last stream removed
+    file_path.write_bytes(FILE_BYTES[:216])
+    with XZFile(file_path, index_file=index_path) as xzfile:
+        assert xzfile.stream_boundaries == [0]
+        assert len(xzfile) == 190
+        xzfile.save_index(index_path)  # refresh
+
+    with XZFile(file_path, index_file=index_path) as xzfile:
+        assert xzfile.stream_boundaries == [0]
+        assert len(xzfile) == 190
+
+
+def test_save_index_fileobj(tmp_path: Path) -> None:
+    index_path = tmp_path / "archive.xz.idx"
+    with XZFile(BytesIO(FILE_BYTES)) as xzfile:
+        xzfile.save_index(index_path)
+    with XZFile(BytesIO(FILE_BYTES), index_file=index_path) as xzfile:
+        assert xzfile.block_boundaries == [0, 100, 190, 250, 310, 370]
+
+
+@pytest.mark.filterwarnings(EMPTY_XZ_FILE_WARNING_FILTER)
+@pytest.mark.parametrize("mode", ["r+", "w"])
+def test_save_index_not_read_mode(mode: str, tmp_path: Path) -> None:
+    with (
+        XZFile(BytesIO(FILE_BYTES), mode) as xzfile,
+        pytest.raises(UnsupportedOperation, match=r"^save_index$"),
+    ):
+        xzfile.save_index(tmp_path / "archive.xz.idx")
+
+
+def test_read_lazy(data_pattern_locate: Callable[[bytes], tuple[int, int]]) -> None:
+    with XZFile(BytesIO(FILE_BYTES), lazy=True) as xzfile:
+        streams = list(xzfile._fileobjs.values())
+        assert xzfile.stream_boundaries == [0, 190]
+        assert len(xzfile) == 400
+        assert [stream._lazy_records is None for stream in streams] == [False, False]
+
+        # only the stream being read has its blocks created
+        xzfile.seek(380)
+        assert data_pattern_locate(xzfile.read()) == (380, 20)
+        assert [stream._lazy_records is None for stream in streams] == [False, True]
+
+        assert xzfile.block_boundaries == [0, 100, 190, 250, 310, 370]
+        assert [stream._lazy_records is None for stream in streams] == [True, True]
+        xzfile.seek(0)
+        assert data_pattern_locate(xzfile.read()) == (0, 400)
+
+
+def test_read_lazy_invalid_header() -> None:
+    # change check value of the header of stream 1
+    file_bytes = bytearray(FILE_BYTES)
+    file_bytes[6:12] = bytes.fromhex("0004e6d6b446")
+
+    with XZFile(BytesIO(file_bytes), lazy=True) as xzfile:
+        xzfile.seek(200)
+        assert len(xzfile.read()) == 200
+        xzfile.seek(0)
+        with pytest.raises(XZError, match=r"^stream: inconsistent check value$"):
+            xzfile.read()
+
+    with pytest.raises(XZError, match=r"^stream: inconsistent check value$"):
+        XZFile(BytesIO(file_bytes))
+
+
+def test_index_file_lazy(
+    tmp_path: Path, data_pattern_locate: Callable[[bytes], tuple[int, int]]
+) -> None:
+    index_path = tmp_path / "archive.xz.idx"
+    with XZFile(BytesIO(FILE_BYTES)) as xzfile:
+        xzfile.save_index(index_path)
+
+    with XZFile(BytesIO(FILE_BYTES), index_file=index_path, lazy=True) as xzfile:
+        assert all(
+            stream._lazy_records is not None for stream in xzfile._fileobjs.values()
+        )
+        assert data_pattern_locate(xzfile.read()) == (0, 400)
+
+
+@pytest.mark.filterwarnings(EMPTY_XZ_FILE_WARNING_FILTER)
+def test_write_lazy() -> None:
+    fileobj = BytesIO(FILE_BYTES)
+    with XZFile(fileobj, "r+", lazy=True) as xzfile:
+        xzfile.seek(400)
+        xzfile.write(b"extra")
+        assert xzfile.block_boundaries == [0, 100, 190, 250, 310, 370, 400]
+
+    with XZFile(fileobj) as xzfile:
+        assert xzfile.stream_boundaries == [0, 190]
+        xzfile.seek(398)
+        assert xzfile.read() == b"2Aextra"
+
+
+def test_write_new_stream_after_stream_padding(
+    data_pattern_locate: Callable[[bytes], tuple[int, int]],
+) -> None:
+    fileobj = BytesIO(FILE_BYTES)
+    with XZFile(fileobj, "r+") as xzfile:
+        xzfile.seek(400)
+        xzfile.change_stream()
+        xzfile.write(b"extra")
+
+    assert fileobj.getvalue().startswith(FILE_BYTES[:596])  # existing streams kept
+    with XZFile(fileobj) as xzfile:
+        assert xzfile.stream_boundaries == [0, 190, 400]
+        assert data_pattern_locate(xzfile.read(400)) == (0, 400)
+        assert xzfile.read() == b"extra"
+
+
+@pytest.mark.parametrize("read_ahead", [0, 100])
+@pytest.mark.parametrize("threads", [1, 2])
+def test_readinto(
+    threads: int,
+    read_ahead: int,
+    data_pattern_locate: Callable[[bytes], tuple[int, int]],
+) -> None:
+    fileobj = BytesIO(FILE_BYTES)
+
+    with XZFile(fileobj, threads=threads, read_ahead=read_ahead) as xzfile:
+        # read all
+        buffer = bytearray(420)
+        assert xzfile.readinto(buffer) == 400
+        assert data_pattern_locate(buffer[:400]) == (0, 400)
+        assert buffer[400:] == bytes(20)
+        assert xzfile.readinto(buffer) == 0
+
+        # read accross blocks and streams, in a memoryview
+        xzfile.seek(42)
+        buffer = bytearray(420)
+        assert xzfile.readinto(memoryview(buffer)[10:310]) == 300
+        assert data_pattern_locate(buffer[10:310]) == (42, 300)
+        assert xzfile.tell() == 342
+
+        # read in a non-bytes buffer
+        xzfile.seek(100)
+        array_buffer = array("I", [0] * 40)
+        assert xzfile.readinto(array_buffer) == 160
+        assert data_pattern_locate(array_buffer.tobytes()) == (100, 160)
+
+        # readinto1 does not go accross streams
+        xzfile.seek(180)
+        assert xzfile.readinto1(buffer) == 10
+        assert data_pattern_locate(buffer[:10]) == (180, 10)
+
+
+def test_read_not_readable() -> None:
+    with XZFile(BytesIO(), "w") as xzfile:
+        xzfile.write(b"abc")
+        with pytest.raises(UnsupportedOperation) as exc_info:
+            xzfile.read()
+        assert str(exc_info.value) == "read"
+        with pytest.raises(UnsupportedOperation) as exc_info:
+            xzfile.readinto(bytearray(1))
+        assert str(exc_info.value) == "read"
+
+
 @pytest.mark.filterwarnings(EMPTY_XZ_FILE_WARNING_FILTER)
 @pytest.mark.parametrize("from_file", [False, True])
 @pytest.mark.parametrize("mode", SUPPORTED_MODES)
@@ -267,6 +556,119 @@ def test_read_strategy_calls() -> None:
         ]
 
 
+def test_read_strategy_no_references(monkeypatch: pytest.MonkeyPatch) -> None:
+    fileobj = BytesIO(FILE_BYTES)
+    block_reads = []
+
+    class CountingBlockRead(BlockRead):
+        def reset(self) -> None:
+            block_reads.append(self)
+            super().reset()
+
+    class NoReferencesStrategy:
+        def on_create(self, block: XZBlock) -> None:
+            pass
+
+        def on_delete(self, block: XZBlock) -> None:
+            pass
+
+        def on_read(self, block: XZBlock) -> None:
+            pass
+
+    monkeypatch.setattr("xz.block.BlockRead", CountingBlockRead)
+
+    with XZFile(fileobj, block_read_strategy=NoReferencesStrategy()) as xz_file:
+        while xz_file.read(1):
+            pass
+        # blocks having a reader were not freed between reads
+        assert len(block_reads) == 6
+        assert not any(
+            block.operation
+            for stream in xz_file._fileobjs.values()
+            for block in stream.created_blocks()
+        )
+
+
+def test_read_memory_strategy() -> None:
+    fileobj = BytesIO(FILE_BYTES_MANY_SMALL_BLOCKS)
+    # blocks use a 8 MiB dictionary: room for two block readers
+    strategy = MemoryBlockReadStrategy(20 * 1024 * 1024)
+
+    with XZFile(fileobj, block_read_strategy=strategy) as xz_file:
+        blocks = [
+            block
+            for stream in xz_file._fileobjs.values()
+            for block in stream._fileobjs.values()
+        ]
+
+        for i in range(10):
+            xz_file.seek(i * 10 + 2)
+            assert xz_file.read(1) == b"2"
+            assert list(strategy.block_reads) == blocks[max(i - 1, 0) : i + 1]
+        assert strategy.memory == 2 * blocks[0].read_memory_usage
+
+
+def test_read_cost_strategy() -> None:
+    fileobj = BytesIO(FILE_BYTES_MANY_SMALL_BLOCKS)
+    strategy = CostBlockReadStrategy(2)
+
+    with XZFile(fileobj, block_read_strategy=strategy) as xz_file:
+        blocks = [
+            block
+            for stream in xz_file._fileobjs.values()
+            for block in stream._fileobjs.values()
+        ]
+
+        # block reader deep in the first block is kept
+        xz_file.seek(7)
+        assert xz_file.read(1) == b"7"
+        for i in range(1, 9):
+            xz_file.seek(i * 10)
+            assert xz_file.read(1) == b"0"
+            assert list(strategy.block_reads) == [blocks[0], blocks[i]]
+
+        # but not forever
+        xz_file.seek(90)
+        assert xz_file.read(1) == b"0"
+        assert list(strategy.block_reads) == [blocks[8], blocks[9]]
+
+
+def test_read_shared_strategy(
+    data_pattern_locate: Callable[[bytes], tuple[int, int]],
+) -> None:
+    strategy = SharedBlockReadStrategy(RollingBlockReadStrategy(3))
+
+    def work(seed: int) -> None:
+        rng = random.Random(seed)  # noqa: S311
+        with XZFile(BytesIO(FILE_BYTES), block_read_strategy=strategy) as xz_file:
+            for _ in range(200):
+                pos = rng.randrange(390)
+                xz_file.seek(pos)
+                assert data_pattern_locate(xz_file.read(10)) == (pos, 10)
+
+    with ThreadPoolExecutor(4) as executor:
+        for future in [executor.submit(work, seed) for seed in range(8)]:
+            future.result()
+
+    assert len(strategy.strategy.block_reads) <= 3  # type: ignore[attr-defined]
+
+
+def test_read_shared_strategy_close() -> None:
+    strategy = SharedBlockReadStrategy(RollingBlockReadStrategy(3))
+
+    with XZFile(BytesIO(FILE_BYTES), block_read_strategy=strategy) as xz_a:
+        with XZFile(BytesIO(FILE_BYTES), block_read_strategy=strategy) as xz_b:
+            assert len(xz_a.read(5)) == 5
+            assert len(xz_b.read(5)) == 5
+            xz_b.seek(200)
+            assert len(xz_b.read(5)) == 5
+            assert len(strategy._blocks) == 3
+        # block readers of a closed file no longer use the shared budget
+        assert strategy._blocks == {xz_a._fileobjs[0]._fileobjs[0]}
+    assert not strategy._blocks
+    assert not strategy.strategy.block_reads  # type: ignore[attr-defined]
+
+
 @pytest.mark.parametrize("max_block_read_nb", [None, 1, 2, 7, 100])
 def test_read_default_strategy(max_block_read_nb: Optional[int]) -> None:
     fileobj = Mock(wraps=BytesIO(FILE_BYTES_MANY_SMALL_BLOCKS))
@@ -324,6 +726,471 @@ def test_read_default_strategy(max_block_read_nb: Optional[int]) -> None:
                 assert not fileobj.method_calls
 
 
+@pytest.mark.parametrize("threads", [0, 1, 2, 4])
+def test_read_threads(
+    threads: int, data_pattern_locate: Callable[[bytes], tuple[int, int]]
+) -> None:
+    fileobj = BytesIO(FILE_BYTES)
+
+    with XZFile(fileobj, threads=threads) as xz_file:
+        assert xz_file.threads == (threads or os.cpu_count())
+
+        # read all
+        assert data_pattern_locate(xz_file.read()) == (0, 400)
+
+        # from middle of a block, accross streams
+        xz_file.seek(42)
+        assert data_pattern_locate(xz_file.read(300)) == (42, 300)
+
+        # from block boundary, until middle of a block
+        xz_file.seek(190)
+        assert data_pattern_locate(xz_file.read(150)) == (190, 150)
+
+        # from block boundary, until block boundary
+        xz_file.seek(100)
+        assert data_pattern_locate(xz_file.read(210)) == (100, 210)
+
+        # exactly one block
+        xz_file.seek(250)
+        assert data_pattern_locate(xz_file.read(60)) == (250, 60)
+
+
+def test_read_threads_strategy_calls() -> None:
+    fileobj = BytesIO(FILE_BYTES_MANY_SMALL_BLOCKS)
+
+    strategy = Mock()
+
+    with XZFile(fileobj, block_read_strategy=strategy, threads=2) as xz_file:
+        blocks = [
+            block
+            for stream in xz_file._fileobjs.values()
+            for block in stream._fileobjs.values()
+        ]
+
+        # blocks entirely covered are decompressed by workers
+        xz_file.seek(5)
+        assert xz_file.read(40) == b"5678901234567890123456789012345678901234"
+        assert strategy.method_calls == [
+            call.on_create(blocks[0]),
+            call.on_read(blocks[0]),
+            call.on_delete(blocks[0]),
+            call.on_create(blocks[4]),
+            call.on_read(blocks[4]),
+        ]
+        strategy.method_calls.clear()
+
+        # single block: no workers
+        xz_file.seek(60)
+        assert xz_file.read(10) == b"0123456789"
+        assert strategy.method_calls == [
+            call.on_create(blocks[6]),
+            call.on_read(blocks[6]),
+            call.on_delete(blocks[6]),
+        ]
+
+
+def test_read_threads_bounded(monkeypatch: pytest.MonkeyPatch) -> None:
+    # blocks submitted to workers, whose data is not copied yet
+    in_flight: list[int] = [0]
+    max_in_flight: list[int] = [0]
+    pop_decompress_future = XZFile._pop_decompress_future
+
+    def pop_decompress_future_count(self: XZFile, block: XZBlock) -> Mock:
+        future = pop_decompress_future(self, block)
+        in_flight[0] += 1
+        max_in_flight[0] = max(max_in_flight[0], in_flight[0])
+
+        def result() -> bytes:
+            in_flight[0] -= 1
+            return future.result()
+
+        return Mock(result=result)
+
+    monkeypatch.setattr(XZFile, "_pop_decompress_future", pop_decompress_future_count)
+
+    with XZFile(BytesIO(FILE_BYTES_MANY_SMALL_BLOCKS), threads=2) as xz_file:
+        assert xz_file.read() == b"0123456789" * 10
+
+    assert in_flight == [0]
+    assert max_in_flight == [4]  # twice the number of threads, not 10 blocks
+
+
+def test_read_threads_corrupted() -> None:
+    fileobj = BytesIO(FILE_BYTES_MANY_SMALL_BLOCKS.replace(b"789", b"987", 1))
+
+    with XZFile(fileobj, threads=2) as xz_file, pytest.raises(XZError) as exc_info:
+        xz_file.read()
+    assert str(exc_info.value) == "block: error while decompressing: Corrupt input data"
+
+
+@pytest.mark.parametrize(["threads", "read_ahead"], [(1, 0), (2, 0), (1, 10)])
+def test_read_corrupted_output_freed(threads: int, read_ahead: int) -> None:
+    fileobj = BytesIO(FILE_BYTES_MANY_SMALL_BLOCKS.replace(b"789", b"987", 1))
+
+    with XZFile(fileobj, threads=threads, read_ahead=read_ahead) as xz_file:
+        with pytest.raises(XZError):
+            xz_file.read()
+        # the partial output is freed without errors
+        gc.collect()
+
+
+@pytest.mark.parametrize("threads", [1, 2])
+def test_read_memlimit(threads: int) -> None:
+    fileobj = BytesIO(FILE_BYTES)
+
+    with XZFile(fileobj, memlimit=1024, threads=threads) as xz_file:
+        assert xz_file.memlimit == 1024
+        with pytest.raises(XZError) as exc_info:
+            xz_file.read()
+    assert str(exc_info.value).startswith(
+        "block: error while decompressing: Memory usage limit"
+    )
+
+    with XZFile(fileobj, memlimit=16 * 1024 * 1024, threads=threads) as xz_file:
+        assert len(xz_file.read()) == 400
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_read_seek_window(lazy: bool, data_pattern: bytes) -> None:
+    fileobj = BytesIO(FILE_BYTES)
+
+    with XZFile(fileobj, lazy=lazy) as xz_file:
+        assert xz_file.seek_window == 0
+        xz_file.seek(50)
+        assert xz_file.read(10) == data_pattern[50:60]
+        block = xz_file._fileobjs[0]._fileobjs[0]
+        assert not cast("BlockRead", block.operation).window
+
+    with XZFile(fileobj, seek_window=30, lazy=lazy) as xz_file:
+        assert xz_file.seek_window == 30
+        xz_file.seek(50)
+        assert xz_file.read(10) == data_pattern[50:60]
+        block = xz_file._fileobjs[0]._fileobjs[0]
+        assert cast("BlockRead", block.operation).window == data_pattern[30:60]
+
+
+def test_read_seek_window_invalid() -> None:
+    with pytest.raises(ValueError, match=r"^seek_window must be positive or zero$"):
+        XZFile(BytesIO(FILE_BYTES), seek_window=-1)
+
+
+@pytest.mark.parametrize("threads", [1, 2])
+def test_read_ahead(threads: int) -> None:
+    fileobj = BytesIO(FILE_BYTES_MANY_SMALL_BLOCKS)
+
+    strategy = Mock()
+
+    with XZFile(
+        fileobj, block_read_strategy=strategy, threads=threads, read_ahead=25
+    ) as xz_file:
+        assert xz_file.read_ahead == 25
+        blocks = [
+            block
+            for stream in xz_file._fileobjs.values()
+            for block in stream._fileobjs.values()
+        ]
+
+        # first block is read normally, next two are decompressed in background
+        assert xz_file.read(5) == b"01234"
+        assert strategy.method_calls == [
+            call.on_create(blocks[0]),
+            call.on_read(blocks[0]),
+        ]
+        strategy.method_calls.clear()
+        assert list(xz_file._read_ahead_futures) == blocks[1:3]
+
+        # reads are capped at the end of the block, so that next blocks
+        # are read from what was decompressed in background
+        assert xz_file.read(8) == b"56789012"
+        assert strategy.method_calls == [
+            call.on_read(blocks[0]),
+            call.on_delete(blocks[0]),
+        ]
+        strategy.method_calls.clear()
+        assert list(xz_file._read_ahead_futures) == blocks[1:4]
+
+        # read next blocks sequentially
+        assert xz_file.read(10) == b"3456789012"
+        assert list(xz_file._read_ahead_futures) == blocks[2:5]
+        assert xz_file.read(30) == b"345678901234567890123456789012"
+        assert list(xz_file._read_ahead_futures) == blocks[5:8]
+
+        # decompressed blocks are never going through block readers
+        assert not strategy.method_calls
+
+        # seek backward: no longer needed blocks are dropped
+        xz_file.seek(2)
+        assert xz_file.read(2) == b"23"
+        assert list(xz_file._read_ahead_futures) == blocks[1:3]
+
+        # seek forward
+        xz_file.seek(80)
+        assert xz_file.read(10) == b"0123456789"
+        assert list(xz_file._read_ahead_futures) == blocks[9:]
+        assert xz_file.read() == b"0123456789"
+        assert not xz_file._read_ahead_futures
+
+        strategy.method_calls.clear()
+
+        # read all
+        xz_file.seek(0)
+        assert xz_file.read() == b"0123456789" * 10
+        if threads == 1:
+            # first block reader was still alive from previous read
+            assert strategy.method_calls == [
+                call.on_read(blocks[0]),
+                call.on_delete(blocks[0]),
+            ]
+        else:
+            # all blocks decompressed by workers
+            assert not strategy.method_calls
+
+
+def test_read_ahead_big_blocks(
+    data_pattern_locate: Callable[[bytes], tuple[int, int]],
+) -> None:
+    fileobj = BytesIO(FILE_BYTES)
+
+    with XZFile(fileobj, read_ahead=80) as xz_file:
+        blocks = [
+            block
+            for stream in xz_file._fileobjs.values()
+            for block in stream._fileobjs.values()
+        ]
+
+        # next block is decompressed even if too big for the read_ahead limit
+        assert data_pattern_locate(xz_file.read(5)) == (0, 5)
+        assert list(xz_file._read_ahead_futures) == blocks[1:2]
+
+        # next blocks in next stream (current block was decompressed ahead)
+        xz_file.seek(180)
+        assert data_pattern_locate(xz_file.read(5)) == (180, 5)
+        assert list(xz_file._read_ahead_futures) == blocks[1:3]
+
+        assert data_pattern_locate(xz_file.read()) == (185, 215)
+
+
+def test_read_ahead_unchanged() -> None:
+    fileobj = BytesIO(FILE_BYTES_MANY_SMALL_BLOCKS)
+
+    with XZFile(fileobj, read_ahead=25) as xz_file:
+        assert xz_file.read(5) == b"01234"
+        futures = xz_file._read_ahead_futures
+
+        # same blocks to decompress ahead: nothing is rebuilt
+        assert xz_file.read(2) == b"56"
+        assert xz_file._read_ahead_futures is futures
+
+        assert xz_file.read(5) == b"78901"
+        assert xz_file._read_ahead_futures is not futures
+
+
+def test_read_ahead_corrupted() -> None:
+    fileobj = BytesIO(FILE_BYTES_MANY_SMALL_BLOCKS.replace(b"789", b"987", 2))
+
+    with XZFile(fileobj, read_ahead=10) as xz_file:
+        assert xz_file.read(5) == b"01234"
+        with pytest.raises(XZError) as exc_info:
+            xz_file.read(10)
+        assert (
+            str(exc_info.value)
+            == "block: error while decompressing: Corrupt input data"
+        )
+        assert xz_file.tell() == 5
+
+
+def test_read_block_cache(
+    data_pattern_locate: Callable[[bytes], tuple[int, int]],
+) -> None:
+    fileobj = BytesIO(FILE_BYTES)
+    block_cache = BlockCache(150)
+
+    with XZFile(fileobj, block_cache=block_cache) as xz_file:
+        assert xz_file.block_cache is block_cache
+
+        xz_file.seek(20)
+        assert data_pattern_locate(xz_file.read(200)) == (20, 200)
+        assert block_cache.size <= 150
+        assert block_cache.misses
+
+        # beginning was evicted, but end is still there
+        block_cache.hits = block_cache.misses = 0
+        xz_file.seek(210)
+        assert data_pattern_locate(xz_file.read(10)) == (210, 10)
+        assert (block_cache.hits, block_cache.misses) == (1, 0)
+        xz_file.seek(20)
+        assert data_pattern_locate(xz_file.read(10)) == (20, 10)
+        assert (block_cache.hits, block_cache.misses) == (1, 1)
+
+
+def test_read_block_cache_close() -> None:
+    block_cache = BlockCache(1000)
+
+    with XZFile(BytesIO(FILE_BYTES_MANY_SMALL_BLOCKS), block_cache=block_cache) as xz_a:
+        with XZFile(BytesIO(FILE_BYTES), block_cache=block_cache) as xz_b:
+            assert xz_a.read(25) == b"0123456789012345678901234"
+            assert len(xz_b.read(150)) == 150
+            assert block_cache.size == 175
+        # data of closed file is removed, so that its blocks are released
+        assert block_cache.size == 25
+        xz_a.seek(0)
+        assert xz_a.read(25) == b"0123456789012345678901234"
+        assert block_cache.misses == 3 + 2  # only from the first reads
+    assert block_cache.size == 0
+
+
+def test_read_block_cache_truncate(data_pattern: bytes) -> None:
+    block_cache = BlockCache()
+
+    with XZFile(BytesIO(), "w+", block_cache=block_cache) as xz_file:
+        xz_file.write(data_pattern[:30])
+        xz_file.change_block()
+        xz_file.write(data_pattern[30:60])
+        xz_file.seek(0)
+        assert xz_file.read() == data_pattern[:60]
+        assert block_cache.size == 60
+
+        # data of the removed block is released
+        xz_file.truncate(30)
+        assert block_cache.size == 30
+
+        xz_file.seek(30)
+        xz_file.write(data_pattern[100:130])
+        xz_file.seek(0)
+        assert xz_file.read() == data_pattern[:30] + data_pattern[100:130]
+
+
+def test_write_buffer_size_invalid() -> None:
+    with pytest.raises(
+        ValueError, match=r"^write_buffer_size must be positive or zero$"
+    ):
+        XZFile(BytesIO(), "w", write_buffer_size=-1)
+
+
+def test_read_ahead_invalid() -> None:
+    with pytest.raises(ValueError, match=r"^read_ahead must be positive or zero$"):
+        XZFile(BytesIO(FILE_BYTES), read_ahead=-1)
+
+
+def test_read_threads_invalid() -> None:
+    with pytest.raises(ValueError, match=r"^threads must be positive or zero$"):
+        XZFile(BytesIO(FILE_BYTES), threads=-1)
+
+
+#
+# pread
+#
+
+
+def test_pread(data_pattern: bytes) -> None:
+    with XZFile(BytesIO(FILE_BYTES)) as xz_file:
+        xz_file.seek(42)
+        assert xz_file.pread(0) == data_pattern[:400]
+        assert xz_file.pread(42, 300) == data_pattern[42:342]  # across streams
+        assert xz_file.pread(190, 150) == data_pattern[190:340]
+        assert xz_file.pread(250, 60) == data_pattern[250:310]  # exactly one block
+        assert xz_file.pread(395, 10) == data_pattern[395:400]
+        assert xz_file.pread(10, 0) == b""
+        assert xz_file.pread(400, 10) == b""
+        assert xz_file.pread(500) == b""
+        assert xz_file.tell() == 42  # position not used nor changed
+        assert xz_file.read(5) == data_pattern[42:47]
+
+        with pytest.raises(ValueError, match=r"^offset must be positive or zero$"):
+            xz_file.pread(-1, 10)
+
+    with pytest.raises(ValueError, match=r"^I/O operation on closed file$"):
+        xz_file.pread(0, 10)
+
+
+def test_pread_unsupported(data_pattern: bytes) -> None:
+    with XZFile(BytesIO(), "w") as xz_file:
+        xz_file.write(data_pattern[:10])
+        with pytest.raises(UnsupportedOperation, match=r"^read$"):
+            xz_file.pread(0, 10)
+
+    with (
+        XZFile(create_non_seekable_fileobj(FILE_BYTES)) as xz_file,
+        pytest.raises(UnsupportedOperation, match=r"^pread$"),
+    ):
+        xz_file.pread(0, 10)
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        pytest.param({}, id="default"),
+        pytest.param({"lazy": True}, id="lazy"),
+        pytest.param({"block_cache": BlockCache(200)}, id="block_cache"),
+        pytest.param(
+            {
+                "block_read_strategy": SharedBlockReadStrategy(
+                    MemoryBlockReadStrategy(1)
+                )
+            },
+            id="strategy",
+        ),
+    ],
+)
+def test_pread_threads(options: dict[str, object], data_pattern: bytes) -> None:
+    ranges = [(offset, size) for offset in range(0, 400, 7) for size in (1, 13, 90)]
+    random.Random(0).shuffle(ranges)  # noqa: S311
+
+    with XZFile(BytesIO(FILE_BYTES), **options) as xz_file:  # type: ignore[arg-type]
+        with ThreadPoolExecutor(8) as executor:
+            results = list(executor.map(lambda args: xz_file.pread(*args), ranges * 3))
+        assert xz_file.tell() == 0
+
+    assert (
+        results
+        == [data_pattern[offset : min(offset + size, 400)] for offset, size in ranges]
+        * 3
+    )
+
+
+def test_pread_threads_blocks(
+    monkeypatch: pytest.MonkeyPatch, data_pattern: bytes
+) -> None:
+    barrier = Barrier(2, timeout=10)
+    lock = Lock()
+    # threads decompressing each block reader (decompress is recursive)
+    decompressing: list[tuple[BlockRead, int]] = []
+    max_decompressing_same: list[int] = [0]
+    decompress = BlockRead.decompress
+
+    def decompress_wait(self: BlockRead, pos: int, size: int) -> bytes:
+        with lock:
+            decompressing.append((self, get_ident()))
+            max_decompressing_same[0] = max(
+                max_decompressing_same[0],
+                len({ident for reader, ident in decompressing if reader is self}),
+            )
+        try:
+            if pos == 0 and self.length in {100, 90}:
+                # both blocks must be decompressed at the same time
+                barrier.wait()
+            return decompress(self, pos, size)
+        finally:
+            with lock:
+                decompressing.remove((self, get_ident()))
+
+    monkeypatch.setattr(BlockRead, "decompress", decompress_wait)
+
+    with XZFile(BytesIO(FILE_BYTES)) as xz_file, ThreadPoolExecutor(2) as executor:
+        # threads reading different blocks decompress them in parallel
+        assert list(executor.map(xz_file.pread, [0, 100], [100, 90])) == [
+            data_pattern[:100],
+            data_pattern[100:190],
+        ]
+        # threads reading the same block wait for each other
+        assert (
+            list(executor.map(xz_file.pread, [200, 210] * 20, [50, 30] * 20))
+            == [data_pattern[200:250], data_pattern[210:240]] * 20
+        )
+
+    assert max_decompressing_same == [1]
+
+
 #
 # write
 #
@@ -400,6 +1267,453 @@ def test_write() -> None:
     )
 
 
+def test_write_block_size(data_pattern: bytes) -> None:
+    filename = BytesIO()
+
+    with XZFile(filename, "w", block_size=100) as xzfile:
+        assert xzfile.block_size == 100
+        xzfile.write(data_pattern[:30])
+        xzfile.write(data_pattern[30:130])
+        assert xzfile.block_boundaries == [0, 100]
+        xzfile.write(data_pattern[130:450])  # across several blocks
+        assert xzfile.block_boundaries == [0, 100, 200, 300, 400]
+        xzfile.write(data_pattern[450:500])
+        assert xzfile.block_boundaries == [0, 100, 200, 300, 400]  # no empty block
+        xzfile.change_block()
+        xzfile.write(data_pattern[500:520])
+        assert xzfile.block_boundaries == [0, 100, 200, 300, 400, 500]
+        xzfile.change_stream()
+        xzfile.write(data_pattern[520:700])
+        assert xzfile.stream_boundaries == [0, 520]
+        assert xzfile.block_boundaries == [0, 100, 200, 300, 400, 500, 520, 620]
+
+    with XZFile(filename) as xzfile:
+        assert xzfile.block_boundaries == [0, 100, 200, 300, 400, 500, 520, 620]
+        assert xzfile.read() == data_pattern[:700]
+
+
+def test_write_block_size_change(data_pattern: bytes) -> None:
+    filename = BytesIO()
+
+    with XZFile(filename, "w") as xzfile:
+        assert xzfile.block_size is None
+        xzfile.write(data_pattern[:150])
+        xzfile.block_size = 100  # current block is already full
+        xzfile.write(data_pattern[150:300])
+        assert xzfile.block_boundaries == [0, 150, 250]
+        xzfile.block_size = None
+        xzfile.write(data_pattern[300:600])
+        assert xzfile.block_boundaries == [0, 150, 250]
+
+    with XZFile(filename, "r+", block_size=100) as xzfile:
+        xzfile.seek(600)
+        xzfile.write(data_pattern[600:750])
+        assert xzfile.block_boundaries == [0, 150, 250, 600, 700]
+
+
+def test_write_stream_size(data_pattern: bytes) -> None:
+    filename = BytesIO()
+
+    with XZFile(filename, "w", stream_size=300, block_size=100) as xzfile:
+        assert xzfile.stream_size == 300
+        xzfile.write(data_pattern[:250])
+        assert xzfile.stream_boundaries == [0]
+        xzfile.write(data_pattern[250:800])  # across several streams
+        assert xzfile.stream_boundaries == [0, 300, 600]
+        assert xzfile.block_boundaries == [0, 100, 200, 300, 400, 500, 600, 700]
+        xzfile.write(data_pattern[800:900])
+        assert xzfile.stream_boundaries == [0, 300, 600]  # no empty stream
+
+    with XZFile(filename) as xzfile:
+        assert xzfile.stream_boundaries == [0, 300, 600]
+        assert xzfile.read() == data_pattern[:900]
+
+    # existing streams are full
+    with XZFile(filename, "r+", stream_size=300) as xzfile:
+        xzfile.seek(900)
+        xzfile.write(data_pattern[900:1000])
+        assert xzfile.stream_boundaries == [0, 300, 600, 900]
+
+
+def test_write_threads(data_pattern: bytes) -> None:
+    outputs = []
+    for threads in (1, 2, 4):
+        filename = BytesIO()
+        with XZFile(
+            filename, "w", block_size=100, stream_size=450, threads=threads
+        ) as xzfile:
+            xzfile.write(data_pattern[:130])
+            xzfile.write(data_pattern[130:250])
+            xzfile.change_block()
+            xzfile.write(data_pattern[250:1000])
+            assert xzfile.stream_boundaries == [0, 450, 900]
+            assert xzfile.block_boundaries == [
+                *(0, 100, 200, 250, 350),
+                *(450, 550, 650, 750, 850),
+                *(900,),
+            ]
+        outputs.append(filename.getvalue())
+
+        with XZFile(filename) as xzfile:
+            assert xzfile.read() == data_pattern[:1000]
+
+    assert outputs[0] == outputs[1] == outputs[2]
+
+
+def test_write_threads_block_size_set(data_pattern: bytes) -> None:
+    # blocks written before block_size is set are continued the same way
+    outputs = []
+    for threads in (1, 4):
+        filename = BytesIO()
+
+        with XZFile(filename, "w", threads=threads) as xzfile:
+            xzfile.write(data_pattern[:50])
+            xzfile.block_size = 100  # current block is not full yet
+            xzfile.write(data_pattern[50:300])
+            assert xzfile.block_boundaries == [0, 100, 200]
+            xzfile.change_stream()
+            xzfile.block_size = None
+            xzfile.write(data_pattern[300:350])
+            xzfile.block_size = 100
+            xzfile.write(data_pattern[350:370])
+            xzfile.change_block()  # ends the block written without threads
+            xzfile.write(data_pattern[370:500])
+            assert xzfile.block_boundaries == [0, 100, 200, 300, 370, 470]
+        outputs.append(filename.getvalue())
+
+        with XZFile(filename) as xzfile:
+            assert xzfile.read() == data_pattern[:500]
+
+    assert outputs[0] == outputs[1]
+
+
+def test_write_threads_block_size_set_big() -> None:
+    data = random.Random(0).randbytes(200_000)  # noqa: S311
+    filename = BytesIO()
+
+    with XZFile(filename, "w", threads=4) as xzfile:
+        xzfile.write(data[:100_000])
+        xzfile.block_size = 10_000  # current block is already full
+        xzfile.write(data[100_000:])
+
+    with XZFile(filename) as xzfile:
+        assert xzfile.block_boundaries == [0, *range(100_000, 200_000, 10_000)]
+        assert xzfile.read() == data
+
+
+@pytest.mark.parametrize("processes", [0, 2])
+def test_write_processes(processes: int, data_pattern: bytes) -> None:
+    expected = BytesIO()
+    with XZFile(expected, "w", block_size=100, stream_size=600) as xzfile:
+        xzfile.write(data_pattern[:1000])
+
+    filename = BytesIO()
+    with XZFile(
+        filename, "w", block_size=100, stream_size=600, processes=processes
+    ) as xzfile:
+        assert xzfile.processes == (processes or os.cpu_count())
+        xzfile.write(data_pattern[:1000])
+        assert xzfile.stream_boundaries == [0, 600]
+    assert filename.getvalue() == expected.getvalue()
+
+    # continue writing in the last stream
+    with XZFile(filename, "r+", block_size=100, processes=2) as xzfile:
+        xzfile.seek(1000)
+        xzfile.write(data_pattern[1000:1150])
+        assert xzfile.block_boundaries == [*range(0, 1000, 100), 1000, 1100]
+
+    with XZFile(filename) as xzfile:
+        assert xzfile.read() == data_pattern[:1150]
+
+
+def test_write_processes_invalid() -> None:
+    with pytest.raises(ValueError, match=r"^processes must be positive or zero$"):
+        XZFile(BytesIO(), "w", processes=-1)
+
+
+def test_write_threads_read(data_pattern: bytes) -> None:
+    filename = BytesIO()
+
+    with XZFile(filename, "w+", block_size=100, threads=2) as xzfile:
+        xzfile.write(data_pattern[:150])
+        xzfile.seek(0)
+        assert xzfile.read() == data_pattern[:150]  # ends the current block
+        xzfile.write(data_pattern[150:300])
+        assert xzfile.block_boundaries == [0, 100, 150, 250]
+
+    with XZFile(filename, "r+", block_size=100, threads=2) as xzfile:
+        xzfile.seek(300)
+        xzfile.write(data_pattern[300:450])
+        assert xzfile.block_boundaries == [0, 100, 150, 250, 300, 400]
+
+    with XZFile(filename) as xzfile:
+        assert xzfile.block_boundaries == [0, 100, 150, 250, 300, 400]
+        assert xzfile.read() == data_pattern[:450]
+
+
+def create_non_seekable_fileobj(data: bytes = b"") -> Mock:
+    fileobj = Mock(wraps=BytesIO(data))
+    fileobj.seekable.return_value = False
+    fileobj.seek.side_effect = UnsupportedOperation("seek")
+    fileobj.tell.side_effect = UnsupportedOperation("tell")
+    fileobj.truncate.side_effect = UnsupportedOperation("truncate")
+    return fileobj
+
+
+@pytest.mark.parametrize("threads", [1, 2])
+def test_write_non_seekable(threads: int, data_pattern: bytes) -> None:
+    expected = BytesIO()
+    fileobj = create_non_seekable_fileobj()
+
+    for filename in (expected, fileobj):
+        with XZFile(
+            filename, "w", block_size=100, stream_size=250, threads=threads
+        ) as xzfile:
+            xzfile.write(data_pattern[:130])
+            xzfile.change_block()
+            xzfile.write(data_pattern[130:300])
+            xzfile.change_stream()
+            xzfile.write(data_pattern[300:310])
+            assert xzfile.tell() == 310
+            assert xzfile.block_boundaries == [0, 100, 130, 230, 250, 300]
+
+    assert {method_call[0] for method_call in fileobj.method_calls} == {
+        "seekable",
+        "writable",
+        "write",
+    }
+    assert fileobj.getvalue() == expected.getvalue()
+
+
+@pytest.mark.parametrize("block_size", [None, 5])
+def test_write_non_seekable_blocks_kept(
+    block_size: Optional[int], data_pattern: bytes
+) -> None:
+    with XZFile(
+        create_non_seekable_fileobj(),
+        "w",
+        preset=0,
+        block_size=block_size,
+        write_buffer_size=0,
+    ) as xzfile:
+        for _ in range(2000):
+            xzfile.change_block()
+            xzfile.write(data_pattern[:10])
+        stream = xzfile._fileobjs.last_item
+        assert len(stream.records) == (2000 if block_size is None else 4000)
+        # written blocks are only kept as index records, except the last one
+        assert stream._blocks.created_blocks() == [stream._blocks.last_item]
+        assert stream._blocks.last_item.writable()
+
+
+def test_write_non_seekable_pipe(data_pattern: bytes) -> None:
+    read_fd, write_fd = os.pipe()
+    with (
+        open(read_fd, "rb") as fin,  # noqa: PTH123
+        open(write_fd, "wb", buffering=0) as fout,  # noqa: PTH123
+    ):
+        assert not fout.seekable()
+        with XZFile(fout, "w", block_size=100) as xzfile:
+            xzfile.write(data_pattern[:250])
+        fout.close()
+        data = fin.read()
+
+    with XZFile(BytesIO(data)) as xzfile:
+        assert xzfile.block_boundaries == [0, 100, 200]
+        assert xzfile.read() == data_pattern[:250]
+
+
+def test_write_non_seekable_unsupported(data_pattern: bytes) -> None:
+    with XZFile(create_non_seekable_fileobj(), "w") as xzfile:
+        assert not xzfile.seekable()
+        xzfile.write(data_pattern[:100])
+        with pytest.raises(UnsupportedOperation, match=r"^seek$"):
+            xzfile.seek(0)
+        xzfile.change_block()
+        with pytest.raises(UnsupportedOperation, match=r"^truncate$"):
+            xzfile.truncate(0)
+        xzfile.truncate(100)  # nothing to do
+
+
+def test_read_non_seekable(data_pattern: bytes) -> None:
+    fileobj = create_non_seekable_fileobj(FILE_BYTES)
+    with XZFile(fileobj) as xzfile:
+        assert not xzfile.seekable()
+        assert xzfile.stream_boundaries == [0]
+        assert xzfile.block_boundaries == []
+
+        assert xzfile.read(10) == data_pattern[:10]
+        assert xzfile.tell() == len(xzfile) == 10
+        assert xzfile.block_boundaries == [0]
+
+        # boundaries are found progressively
+        assert xzfile.read(200) == data_pattern[10:210]
+        assert xzfile.stream_boundaries == [0, 190]
+        assert xzfile.block_boundaries == [0, 100, 190]
+
+        buffer = bytearray(50)
+        assert xzfile.readinto1(buffer) == 40  # end of block
+        assert buffer[:40] == data_pattern[210:250]
+        assert xzfile.readinto(buffer) == 50
+        assert buffer == data_pattern[250:300]
+
+        assert xzfile.read(0) == b""
+        assert xzfile.read() == data_pattern[300:400]
+        assert xzfile.tell() == len(xzfile) == 400
+        assert xzfile.block_boundaries == [0, 100, 190, 250, 310, 370]
+        assert xzfile.read() == b""
+        assert xzfile.readinto(buffer) == 0
+
+    assert {method_call[0] for method_call in fileobj.method_calls} == {
+        "seekable",
+        "readable",
+        "read",
+    }
+
+
+def test_read_non_seekable_pipe(data_pattern: bytes) -> None:
+    read_fd, write_fd = os.pipe()
+    with (
+        open(read_fd, "rb", buffering=0) as fin,  # noqa: PTH123
+        open(write_fd, "wb") as fout,  # noqa: PTH123
+    ):
+        fout.write(FILE_BYTES)
+        fout.close()
+        assert not fin.seekable()
+        with XZFile(fin) as xzfile:
+            assert xzfile.read() == data_pattern[:400]
+            assert xzfile.block_boundaries == [0, 100, 190, 250, 310, 370]
+
+
+def test_read_non_seekable_unsupported() -> None:
+    with XZFile(create_non_seekable_fileobj(FILE_BYTES)) as xzfile:
+        with pytest.raises(UnsupportedOperation, match=r"^seek$"):
+            xzfile.seek(0)
+        with pytest.raises(UnsupportedOperation, match=r"^save_index$"):
+            xzfile.save_index("unused.idx")
+
+
+def test_read_non_seekable_no_streams() -> None:
+    with pytest.raises(XZError, match=r"^file: no streams$"):
+        XZFile(create_non_seekable_fileobj())
+
+
+def test_write_buffer(data_pattern: bytes) -> None:
+    expected = BytesIO()
+    with XZFile(expected, "w", write_buffer_size=0) as xzfile:
+        for pos in range(0, 500, 10):
+            xzfile.write(data_pattern[pos : pos + 10])
+        xzfile.write(data_pattern[500:505])
+        xzfile.write(data_pattern[505:700])
+        xzfile.change_block()
+        xzfile.write(data_pattern[700:710])
+
+    filename = BytesIO()
+    with XZFile(filename, "w", write_buffer_size=100) as xzfile:
+        assert xzfile.write_buffer_size == 100
+        for pos in range(0, 90, 10):
+            xzfile.write(data_pattern[pos : pos + 10])
+        assert xzfile.tell() == len(xzfile) == 90
+        assert not filename.getvalue()  # buffered
+        xzfile.write(data_pattern[90:100])
+        assert filename.getvalue()  # buffer is full
+        for pos in range(100, 500, 10):
+            xzfile.write(data_pattern[pos : pos + 10])
+        xzfile.write(data_pattern[500:505])
+        assert xzfile.tell() == len(xzfile) == 505
+        xzfile.write(data_pattern[505:700])  # not buffered
+        assert xzfile.tell() == len(xzfile) == 700
+        xzfile.change_block()
+        xzfile.write(data_pattern[700:710])
+        assert xzfile.block_boundaries == [0, 700]
+
+    assert filename.getvalue() == expected.getvalue()
+
+
+def test_write_buffer_read_truncate(data_pattern: bytes) -> None:
+    filename = BytesIO()
+
+    with XZFile(filename, "w+", write_buffer_size=100) as xzfile:
+        xzfile.write(data_pattern[:10])
+        xzfile.write(data_pattern[10:20])
+        assert xzfile.block_boundaries == [0]
+        xzfile.write(data_pattern[20:30])
+        xzfile.seek(0)
+        assert xzfile.read() == data_pattern[:30]
+        xzfile.write(data_pattern[30:40])
+        xzfile.truncate(30)
+        assert xzfile.tell() == 40
+        xzfile.write(data_pattern[30:40])  # padding not buffered
+        assert xzfile.tell() == 50
+
+    with XZFile(filename) as xzfile:
+        assert xzfile.block_boundaries == [0, 30]
+        assert xzfile.read() == data_pattern[:30] + b"\x00" * 10 + data_pattern[30:40]
+
+
+@pytest.mark.parametrize(
+    "flush",
+    [
+        pytest.param(lambda xzfile: xzfile.read(), id="read"),
+        pytest.param(lambda xzfile: xzfile.readinto(bytearray(1)), id="readinto"),
+        pytest.param(lambda xzfile: xzfile.pread(0), id="pread"),
+        pytest.param(lambda xzfile: xzfile.truncate(5), id="truncate"),
+        pytest.param(lambda xzfile: xzfile.stream_boundaries, id="stream_boundaries"),
+        pytest.param(lambda xzfile: xzfile.block_boundaries, id="block_boundaries"),
+        pytest.param(lambda xzfile: xzfile.change_stream(), id="change_stream"),
+        pytest.param(lambda xzfile: xzfile.change_block(), id="change_block"),
+        *(
+            pytest.param(
+                lambda xzfile, name=name, value=value: setattr(xzfile, name, value),
+                id=name,
+            )
+            for name, value in (
+                ("check", CHECK_NONE),
+                ("preset", 0),
+                ("filters", [{"id": FILTER_LZMA2, "preset": 0}]),
+                ("block_size", 5),
+                ("stream_size", 5),
+                ("block_read_strategy", RollingBlockReadStrategy()),
+            )
+        ),
+    ],
+)
+def test_write_buffer_flush(flush: Callable[[XZFile], object]) -> None:
+    with XZFile(BytesIO(), "w+", write_buffer_size=100) as xzfile:
+        xzfile.write(b"abc")
+        assert not xzfile._fileobjs  # buffered
+        flush(xzfile)
+        assert xzfile._fileobjs
+
+
+def test_write_buffer_settings(data_pattern: bytes) -> None:
+    filename = BytesIO()
+
+    with XZFile(filename, "w", write_buffer_size=100) as xzfile:
+        xzfile.write(data_pattern[:10])
+        xzfile.check = CHECK_NONE  # applies to the next stream only
+        xzfile.change_stream()
+        xzfile.write(data_pattern[10:20])
+        xzfile.filters = [{"id": FILTER_LZMA2, "preset": 0}]
+        xzfile.block_size = 5  # applies to the data written after
+        xzfile.write(data_pattern[20:30])
+
+    with XZFile(filename) as xzfile:
+        assert [stream.check for stream in xzfile._fileobjs.values()] == [
+            CHECK_CRC64,
+            CHECK_NONE,
+        ]
+        assert xzfile.block_boundaries == [0, 10, 20, 25]
+        assert xzfile.read() == data_pattern[:30]
+
+
+@pytest.mark.parametrize("name", ["block_size", "stream_size"])
+@pytest.mark.parametrize("value", [0, -1])
+def test_write_size_invalid(name: str, value: int) -> None:
+    with pytest.raises(ValueError, match=rf"^{name} must be positive$"):
+        XZFile(BytesIO(), "w", **{name: value})  # type: ignore[arg-type]
+
+
 @pytest.mark.parametrize(
     ["mode", "start_empty"],
     [
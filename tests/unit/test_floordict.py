@@ -123,3 +123,26 @@ def test_values() -> None:
             value = min(i * 2, j - (j % 2))
             assert floordict[j] == str(value)
             assert floordict.get_with_index(j) == (value, str(value))
+
+
+def test_items_from() -> None:
+    floordict = FloorDict[str]()
+    with pytest.raises(KeyError):
+        floordict.items_from(0)
+
+    floordict[10] = "ten"
+    floordict[20] = "twenty"
+    floordict[30] = "thirty"
+
+    with pytest.raises(KeyError):
+        floordict.items_from(5)
+    with pytest.raises(TypeError):
+        floordict.items_from("wrong type")  # type: ignore[arg-type]
+
+    assert list(floordict.items_from(10)) == [
+        (10, "ten"),
+        (20, "twenty"),
+        (30, "thirty"),
+    ]
+    assert list(floordict.items_from(25)) == [(20, "twenty"), (30, "thirty")]
+    assert list(floordict.items_from(42)) == [(30, "thirty")]
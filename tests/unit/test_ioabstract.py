@@ -1,3 +1,4 @@
+from array import array
 from io import DEFAULT_BUFFER_SIZE, UnsupportedOperation
 from pathlib import Path
 from typing import BinaryIO
@@ -199,6 +200,83 @@ def test_tell_read_empty() -> None:
     assert obj.read() == b"aaaaaaaaaa"
 
 
+def test_readinto() -> None:
+    class Impl(IOAbstract):
+        def __init__(self) -> None:
+            super().__init__(10)
+            self.empty_reads = 0
+
+        def _read(self, size: int) -> bytes:
+            # for tests, does not rely on position
+            self.empty_reads = (self.empty_reads + 1) % 3
+            if self.empty_reads:
+                return b""
+            return b"xyz"[:size]
+
+    obj = Impl()
+
+    # read all
+    buffer = bytearray(16)
+    assert obj.readinto(buffer) == 10
+    assert buffer == b"xyzxyzxyzx" + bytes(6)
+    assert obj.tell() == 10
+    assert obj.readinto(buffer) == 0
+
+    # read partial, in a memoryview
+    obj.seek(2)
+    buffer = bytearray(16)
+    assert obj.readinto(memoryview(buffer)[4:9]) == 5
+    assert buffer == bytes(4) + b"xyzxy" + bytes(7)
+    assert obj.tell() == 7
+
+    # read in a non-bytes buffer
+    obj.seek(2)
+    array_buffer = array("H", [0] * 2)
+    assert obj.readinto(array_buffer) == 4
+    assert array_buffer.tobytes() == b"xyzx"
+    assert obj.tell() == 6
+
+    # readinto1 stops at first data
+    obj.seek(1)
+    buffer = bytearray(16)
+    assert obj.readinto1(buffer) == 3
+    assert buffer == b"xyz" + bytes(13)
+    assert obj.tell() == 4
+    obj.seek(9)
+    assert obj.readinto1(buffer) == 1
+    assert obj.tell() == 10
+    assert obj.readinto1(buffer) == 0
+
+    # read from after EOF
+    obj.seek(11)
+    assert obj.readinto(buffer) == 0
+    assert obj.readinto1(buffer) == 0
+
+    # read after close
+    obj.close()
+    with pytest.raises(ValueError, match=r"^I/O operation on closed file$"):
+        obj.readinto(buffer)
+    with pytest.raises(ValueError, match=r"^I/O operation on closed file$"):
+        obj.readinto1(buffer)
+
+
+def test_readinto_non_readable() -> None:
+    class Impl(IOAbstract):
+        def __init__(self) -> None:
+            super().__init__(10)
+
+        def readable(self) -> bool:
+            return False
+
+    obj = Impl()
+    with pytest.raises(UnsupportedOperation) as exc_info:
+        obj.readinto(bytearray(1))
+    assert str(exc_info.value) == "read"
+    with pytest.raises(UnsupportedOperation) as exc_info:
+        obj.readinto1(bytearray(1))
+    assert str(exc_info.value) == "read"
+
+
 #
 # write
 #
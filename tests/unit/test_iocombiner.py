@@ -97,6 +97,38 @@ def test_read() -> None:
     assert not cast("Mock", originals[1]).method_calls
 
 
+def test_readinto() -> None:
+    originals: list[IOAbstract] = [
+        IOProxy(BytesIO(b"abc"), 0, 3),
+        generate_mock(0),  # size 0, will be never used
+        IOProxy(BytesIO(b"defghij"), 0, 7),
+    ]
+    combiner = IOCombiner(*originals)
+
+    # read all
+    buffer = bytearray(12)
+    assert combiner.readinto(buffer) == 10
+    assert buffer == b"abcdefghij\x00\x00"
+
+    # read partial
+    combiner.seek(1)
+    buffer = bytearray(6)
+    assert combiner.readinto(buffer) == 6
+    assert buffer == b"bcdefg"
+    assert combiner.readinto(buffer) == 3
+    assert buffer == b"hijefg"
+    assert combiner.readinto(buffer) == 0
+
+    # readinto1 does not go accross fileobjs
+    combiner.seek(1)
+    buffer = bytearray(6)
+    assert combiner.readinto1(buffer) == 2
+    assert buffer == b"bc\x00\x00\x00\x00"
+
+    # never used at all
+    assert not cast("Mock", originals[1]).method_calls
+
+
 #
 # write
 #
@@ -1,8 +1,13 @@
-from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO, FileIO, UnsupportedOperation
+from mmap import ACCESS_READ, mmap
+import os
 from pathlib import Path
 from unittest.mock import Mock, call
 
-from xz.io import IOProxy
+import pytest
+
+from xz.io import IOProxy, get_fileobj_lock
 
 
 def test_fileno(tmp_path: Path) -> None:
@@ -58,6 +63,63 @@ def test_read() -> None:
     assert original.tell() == 14
 
 
+def test_read_mmap(tmp_path: Path) -> None:
+    file_path = tmp_path / "file"
+    file_path.write_bytes(b"xxxxabcdefghijyyyyy")
+
+    with (
+        file_path.open("rb") as fin,
+        mmap(fin.fileno(), 0, access=ACCESS_READ) as original,
+    ):
+        proxy = IOProxy(original, 4, 14)
+
+        data = proxy.read()
+        assert isinstance(data, bytes)  # no view preventing to close original
+        assert data == b"abcdefghij"
+        proxy.seek(6)
+        assert proxy.read(3) == b"ghi"
+        assert original.tell() == 0  # did not use original position
+
+        with pytest.raises(UnsupportedOperation):
+            proxy.truncate(5)
+
+
+@pytest.mark.skipif(not hasattr(os, "pread"), reason="no pread")
+@pytest.mark.parametrize("buffered", [False, True])
+def test_read_pread(tmp_path: Path, buffered: bool) -> None:
+    file_path = tmp_path / "file"
+    file_path.write_bytes(b"xxxxabcdefghijyyyyy")
+
+    with file_path.open("rb") if buffered else FileIO(file_path) as original:
+        proxy = IOProxy(original, 4, 14)
+        assert proxy._fd is not None
+        original.seek(2)
+        assert proxy.read() == b"abcdefghij"
+        proxy.seek(6)
+        assert proxy.read(3) == b"ghi"
+        assert original.tell() == 2  # did not use original position
+
+        # safe to use from several threads at once
+        def read_at(pos: int) -> bytes:
+            return IOProxy(original, pos, pos + 5).read()
+
+        with ThreadPoolExecutor(4) as executor:
+            assert list(executor.map(read_at, range(15))) == [
+                b"xxxxabcdefghijyyyyy"[pos : pos + 5] for pos in range(15)
+            ]
+
+
+def test_read_buffered_writable(tmp_path: Path) -> None:
+    file_path = tmp_path / "file"
+    file_path.write_bytes(b"xxxxabcdefghijyyyyy")
+
+    with file_path.open("r+b") as original:
+        proxy = IOProxy(original, 4, 14)
+        # its buffer may hold data not written yet: not accessed directly
+        assert proxy._fd is None
+        assert proxy.read() == b"abcdefghij"
+
+
 def test_write() -> None:
     original = BytesIO(b"xxxxabcdefghijyyyyy")
     with IOProxy(original, 4, 14) as proxy:
@@ -70,6 +132,20 @@ def test_write() -> None:
         assert original.getvalue() == b"xxxxabcdefghijuvwUVWXYZ"
 
 
+@pytest.mark.skipif(not hasattr(os, "pwrite"), reason="no pwrite")
+def test_write_pwrite(tmp_path: Path) -> None:
+    file_path = tmp_path / "file"
+    file_path.write_bytes(b"xxxxabcdefghijyyyyy")
+
+    with FileIO(file_path, "r+") as original, IOProxy(original, 4, 14) as proxy:
+        original.seek(2)
+        proxy.seek(10)
+        assert proxy.write(b"uvw") == 3
+        assert proxy.write(b"UVWXYZ") == 6
+        assert original.tell() == 2  # did not use original position
+    assert file_path.read_bytes() == b"xxxxabcdefghijuvwUVWXYZ"
+
+
 def test_truncate() -> None:
     original = Mock()
     with IOProxy(original, 4, 14) as proxy:
@@ -79,3 +155,28 @@ def test_truncate() -> None:
 
         assert proxy.truncate(20) == 20
         assert original.method_calls == [call.truncate(24)]
+
+
+def test_read_threads() -> None:
+    original = BytesIO(b"xxxxabcdefghijyyyyy")
+
+    # seek and read calls on the original are not interleaved
+    def read_at(pos: int) -> bytes:
+        return IOProxy(original, pos, pos + 5).read()
+
+    with ThreadPoolExecutor(4) as executor:
+        assert (
+            list(executor.map(read_at, list(range(15)) * 20))
+            == [b"xxxxabcdefghijyyyyy"[pos : pos + 5] for pos in range(15)] * 20
+        )
+
+
+def test_get_fileobj_lock() -> None:
+    fileobj = BytesIO()
+    lock = get_fileobj_lock(fileobj)
+    assert get_fileobj_lock(fileobj) is lock
+    assert get_fileobj_lock(BytesIO()) is not lock
+
+    # same lock for objects that cannot be weakly referenced
+    assert get_fileobj_lock(1) is get_fileobj_lock(2)
+    assert get_fileobj_lock(1) is not lock
@@ -0,0 +1,45 @@
+from io import BytesIO, UnsupportedOperation
+from unittest.mock import Mock, call
+
+import pytest
+
+from xz.io import IOSequentialWriter
+
+
+def create_fileobj() -> Mock:
+    fileobj = Mock(wraps=BytesIO())
+    fileobj.seek.side_effect = UnsupportedOperation("seek")
+    fileobj.truncate.side_effect = UnsupportedOperation("truncate")
+    return fileobj
+
+
+def test_read() -> None:
+    with IOSequentialWriter(create_fileobj()) as writer:
+        assert writer.readable() is False
+        with pytest.raises(UnsupportedOperation):
+            writer.read()
+
+
+def test_write() -> None:
+    fileobj = create_fileobj()
+    with IOSequentialWriter(fileobj) as writer:
+        writer.write(b"abc")
+        writer.seek(3)  # end of file
+        writer.truncate()  # end of file
+        writer.write(b"def")
+        assert len(writer) == 6
+
+        # only write at the end of file
+        writer.seek(2)
+        with pytest.raises(ValueError, match=r"^write is only supported from EOF$"):
+            writer.write(b"g")
+
+    assert fileobj.method_calls == [call.write(b"abc"), call.write(b"def")]
+    assert fileobj.getvalue() == b"abcdef"
+
+
+def test_truncate() -> None:
+    with IOSequentialWriter(create_fileobj()) as writer:
+        writer.write(b"abc")
+        with pytest.raises(UnsupportedOperation, match=r"^truncate$"):
+            writer.truncate(2)
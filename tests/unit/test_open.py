@@ -6,6 +6,7 @@ from unittest.mock import Mock
 
 import pytest
 
+from xz.cache import BlockCache
 from xz.open import xz_open
 from xz.strategy import RollingBlockReadStrategy
 
@@ -69,6 +70,17 @@ def test_mode_rt_file(tmp_path: Path) -> None:
         assert xzfile.read() == "♥\n"
 
 
+def test_mode_rt_non_seekable() -> None:
+    fileobj = Mock(wraps=BytesIO(STREAM_BYTES))
+    fileobj.seekable.return_value = False
+
+    with xz_open(fileobj, "rt") as xzfile:
+        assert xzfile.readline() == "♥ utf8 ♥\n"
+        assert xzfile.stream_boundaries == [0]
+        assert xzfile.block_boundaries == [0, 10]
+        assert not xzfile.seekable()
+
+
 @pytest.mark.parametrize(
     ["encoding", "expected"],
     [
@@ -505,3 +517,121 @@ def test_custom_strategy(mode: str) -> None:
 
     with xz_open(fileobj, mode, block_read_strategy=strategy) as xzfile:
         assert xzfile.block_read_strategy == strategy
+
+
+@pytest.mark.parametrize("mode", ["r", "rt"])
+def test_threads(mode: str) -> None:
+    fileobj = BytesIO(STREAM_BYTES)
+
+    with xz_open(fileobj, mode, threads=2) as xzfile:
+        assert xzfile.threads == 2
+        assert xzfile.read() in {b"\xe2\x99\xa5 utf8 \xe2\x99\xa5\n", "♥ utf8 ♥\n"}
+
+
+@pytest.mark.parametrize("mode", ["r", "rt"])
+def test_block_cache(mode: str) -> None:
+    fileobj = BytesIO(STREAM_BYTES)
+    block_cache = BlockCache()
+
+    with xz_open(fileobj, mode, block_cache=block_cache) as xzfile:
+        assert xzfile.block_cache is block_cache
+        assert xzfile.read() in {b"\xe2\x99\xa5 utf8 \xe2\x99\xa5\n", "♥ utf8 ♥\n"}
+        assert block_cache.size
+
+        other_block_cache = BlockCache()
+        xzfile.block_cache = other_block_cache
+        assert xzfile.block_cache is other_block_cache
+
+
+@pytest.mark.parametrize("mode", ["r", "rt"])
+def test_memlimit(mode: str) -> None:
+    fileobj = BytesIO(STREAM_BYTES)
+
+    with xz_open(fileobj, mode, memlimit=16 * 1024 * 1024) as xzfile:
+        assert xzfile.memlimit == 16 * 1024 * 1024
+        assert xzfile.read() in {b"\xe2\x99\xa5 utf8 \xe2\x99\xa5\n", "♥ utf8 ♥\n"}
+
+
+@pytest.mark.parametrize("mode", ["r", "rt"])
+def test_seek_window(mode: str) -> None:
+    fileobj = BytesIO(STREAM_BYTES)
+
+    with xz_open(fileobj, mode, seek_window=1024) as xzfile:
+        assert xzfile.seek_window == 1024
+        assert xzfile.read() in {b"\xe2\x99\xa5 utf8 \xe2\x99\xa5\n", "♥ utf8 ♥\n"}
+
+
+@pytest.mark.parametrize("mode", ["r", "rt"])
+def test_mmap(mode: str, tmp_path: Path) -> None:
+    file_path = tmp_path / "archive.xz"
+    file_path.write_bytes(STREAM_BYTES)
+
+    with xz_open(file_path, mode, mmap=True) as xzfile:
+        assert xzfile.read() in {b"\xe2\x99\xa5 utf8 \xe2\x99\xa5\n", "♥ utf8 ♥\n"}
+
+
+@pytest.mark.parametrize("mode", ["r", "rt"])
+def test_index_file(mode: str, tmp_path: Path) -> None:
+    index_path = tmp_path / "archive.xz.idx"
+
+    with xz_open(BytesIO(STREAM_BYTES), mode) as xzfile:
+        xzfile.save_index(index_path)
+
+    with xz_open(BytesIO(STREAM_BYTES), mode, index_file=index_path) as xzfile:
+        assert xzfile.index_file == index_path
+        assert xzfile.read() in {b"\xe2\x99\xa5 utf8 \xe2\x99\xa5\n", "♥ utf8 ♥\n"}
+
+
+@pytest.mark.parametrize("mode", ["w", "wt"])
+def test_block_size_stream_size(mode: str) -> None:
+    fileobj = BytesIO()
+
+    with xz_open(fileobj, mode, block_size=4, stream_size=8) as xzfile:
+        assert xzfile.block_size == 4
+        assert xzfile.stream_size == 8
+        xzfile.write(b"0123456789" if mode == "w" else "0123456789")  # type: ignore[arg-type]
+
+    with xz_open(fileobj) as xzfile:
+        assert xzfile.stream_boundaries == [0, 8]
+        assert xzfile.block_boundaries == [0, 4, 8]
+        assert xzfile.read() == b"0123456789"
+
+
+@pytest.mark.parametrize("mode", ["w", "wt"])
+def test_write_buffer_size(mode: str) -> None:
+    fileobj = BytesIO()
+
+    with xz_open(fileobj, mode, write_buffer_size=0) as xzfile:
+        assert xzfile.write_buffer_size == 0
+        xzfile.write(b"0123456789" if mode == "w" else "0123456789")  # type: ignore[arg-type]
+
+    with xz_open(fileobj) as xzfile:
+        assert xzfile.read() == b"0123456789"
+
+
+@pytest.mark.parametrize("mode", ["w", "wt"])
+def test_processes(mode: str) -> None:
+    fileobj = BytesIO()
+
+    with xz_open(fileobj, mode, block_size=4, processes=2) as xzfile:
+        assert xzfile.processes == 2
+        xzfile.write(b"0123456789" if mode == "w" else "0123456789")  # type: ignore[arg-type]
+
+    with xz_open(fileobj) as xzfile:
+        assert xzfile.block_boundaries == [0, 4, 8]
+        assert xzfile.read() == b"0123456789"
+
+
+@pytest.mark.parametrize("mode", ["r", "rt"])
+def test_lazy(mode: str) -> None:
+    with xz_open(BytesIO(STREAM_BYTES), mode, lazy=True) as xzfile:
+        assert xzfile.read() in {b"\xe2\x99\xa5 utf8 \xe2\x99\xa5\n", "♥ utf8 ♥\n"}
+
+
+@pytest.mark.parametrize("mode", ["r", "rt"])
+def test_read_ahead(mode: str) -> None:
+    fileobj = BytesIO(STREAM_BYTES)
+
+    with xz_open(fileobj, mode, read_ahead=100) as xzfile:
+        assert xzfile.read_ahead == 100
+        assert xzfile.read() in {b"\xe2\x99\xa5 utf8 \xe2\x99\xa5\n", "♥ utf8 ♥\n"}
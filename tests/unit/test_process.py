@@ -0,0 +1,142 @@
+from concurrent.futures import CancelledError, Future
+from concurrent.futures.process import BrokenProcessPool
+from lzma import CHECK_CRC64
+from multiprocessing.shared_memory import SharedMemory
+import os
+import time
+
+import pytest
+
+from xz.block import compress_block
+import xz.process as process_module
+from xz.process import SharedMemoryProcessPoolExecutor, _call_shared
+
+
+def repeat_data(data: memoryview, times: int) -> tuple[bytes, int]:
+    return (bytes(data) * times, len(data))
+
+
+def sleep_data(data: memoryview, seconds: float) -> tuple[bytes]:
+    time.sleep(seconds)
+    return (bytes(data),)
+
+
+def exit_process(data: memoryview) -> tuple[bytes]:  # noqa: ARG001
+    os._exit(1)
+
+
+@pytest.mark.parametrize(
+    ["times", "expected_output"],
+    [(1, 5), (3, b"Hello" * 3)],
+    ids=("shared", "too-big"),
+)
+def test_call_shared(times: int, expected_output: object) -> None:
+    shm = SharedMemory(create=True, size=10)
+    try:
+        shm.buf[:5] = b"Hello"
+        assert _call_shared(repeat_data, shm.name, 5, (times,)) == (
+            expected_output,
+            5,
+        )
+        assert bytes(shm.buf[:5]) == b"Hello"
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def test_executor(data_pattern: bytes) -> None:
+    with SharedMemoryProcessPoolExecutor(2) as executor:
+        assert executor.max_workers == 2
+        futures = [
+            executor.submit(compress_block, data_pattern[pos : pos + 1000], 1)
+            for pos in range(0, 4000, 1000)
+        ]
+        assert [future.result() for future in futures] == [
+            compress_block(data_pattern[pos : pos + 1000], 1)
+            for pos in range(0, 4000, 1000)
+        ]
+
+
+def test_executor_output_too_big() -> None:
+    with SharedMemoryProcessPoolExecutor(1) as executor:
+        assert executor.submit(repeat_data, b"Hello", 1000).result() == (
+            b"Hello" * 1000,
+            5,
+        )
+
+
+def test_executor_error() -> None:
+    with SharedMemoryProcessPoolExecutor(1) as executor:
+        future = executor.submit(
+            compress_block, b"Hello", CHECK_CRC64, None, [{"id": 42}]
+        )
+        with pytest.raises(ValueError, match=r"^Invalid filter ID: 42$"):
+            future.result()
+
+
+def test_executor_shutdown_cancel() -> None:
+    executor = SharedMemoryProcessPoolExecutor(1)
+    futures = [executor.submit(sleep_data, b"Hello", 0.1) for _ in range(8)]
+    assert futures[0].result() == (b"Hello",)
+    executor.shutdown(cancel_futures=True)
+
+    # all futures are done: the ones not started yet are cancelled
+    assert all(future.done() for future in futures)
+    assert futures[-1].cancelled()
+    with pytest.raises(CancelledError):
+        futures[-1].result()
+
+
+def test_executor_cancel() -> None:
+    with SharedMemoryProcessPoolExecutor(1) as executor:
+        futures = [executor.submit(sleep_data, b"Hello", 0.1) for _ in range(8)]
+        assert futures[-1].cancel()
+        assert [future.result() for future in futures[:-1]] == [(b"Hello",)] * 7
+        assert futures[-1].cancelled()
+
+        # cancelling a future whose result is set has no effect
+        assert not futures[0].cancel()
+        assert futures[0].result() == (b"Hello",)
+
+
+def test_executor_cancel_running(monkeypatch: pytest.MonkeyPatch) -> None:
+    with SharedMemoryProcessPoolExecutor(1) as executor:
+        pool_future: Future[tuple[object, ...]] = Future()
+        pool_future.set_running_or_notify_cancel()  # cannot be cancelled anymore
+        monkeypatch.setattr(executor._pool, "submit", lambda *_: pool_future)
+
+        future = executor.submit(repeat_data, b"Hello", 1)
+        assert future.cancel()
+        pool_future.set_result((b"Hello", 5))  # result is dropped
+        assert future.cancelled()
+
+
+def test_executor_broken() -> None:
+    with SharedMemoryProcessPoolExecutor(1) as executor:
+        future = executor.submit(exit_process, b"Hello")
+        with pytest.raises(BrokenProcessPool):
+            future.result()
+
+
+def test_executor_broken_unlink(monkeypatch: pytest.MonkeyPatch) -> None:
+    names = []
+
+    class RecordingSharedMemory(SharedMemory):
+        def __init__(self, *, create: bool, size: int) -> None:
+            super().__init__(create=create, size=size)
+            names.append(self.name)
+
+    monkeypatch.setattr(process_module, "SharedMemory", RecordingSharedMemory)
+
+    with SharedMemoryProcessPoolExecutor(1) as executor:
+        future = executor.submit(exit_process, b"Hello")
+        with pytest.raises(BrokenProcessPool):
+            future.result()
+        with pytest.raises(BrokenProcessPool):
+            executor.submit(repeat_data, b"Hello", 1)
+
+    # the shared memory is freed, even if it was not submitted
+    assert len(names) == 2
+    for name in names:
+        with pytest.raises(FileNotFoundError):
+            SharedMemory(name)
@@ -0,0 +1,141 @@
+from io import BytesIO
+from lzma import CHECK_CRC32, CHECK_NONE, compress
+from random import Random
+
+import pytest
+
+from xz.common import XZError, parse_xz_footer
+from xz.sequential import SequentialRead
+
+# one block each: header (12 bytes), block header (12 bytes), LZMA2 data
+DATA = b"Hello, world! " * 100
+STREAM = compress(DATA)  # LZMA chunk
+DATA_RANDOM = Random(0).randbytes(200)  # noqa: S311
+STREAM_RANDOM = compress(DATA_RANDOM)  # uncompressed chunk
+BLOCK_HEADER_END = 24
+INDEX_START = len(STREAM) - 12 - parse_xz_footer(STREAM[-12:])[1]
+
+
+def create_reader(data: bytes) -> SequentialRead:
+    return SequentialRead(BytesIO(data))
+
+
+def read_all(reader: SequentialRead) -> bytes:
+    parts = []
+    while data := reader.read():
+        parts.append(data)
+    return b"".join(parts)
+
+
+def test_read() -> None:
+    reader = create_reader(STREAM + b"\x00" * 8 + STREAM_RANDOM)
+    assert reader.stream_boundaries == [0]
+    assert reader.block_boundaries == []
+    assert reader.read(0) == b""
+
+    assert reader.read(10) == DATA[:10]
+    assert reader.block_boundaries == [0]
+
+    # read stops at the end of a block
+    remaining = b""
+    while len(remaining) < len(DATA) - 10:
+        data = reader.read(len(DATA))
+        assert data
+        remaining += data
+    assert remaining == DATA[10:]
+    assert reader.stream_boundaries == [0]
+    assert reader.block_boundaries == [0]
+
+    # the next stream is parsed when reading from it
+    assert reader.read(5) == DATA_RANDOM[:5]
+    assert reader.stream_boundaries == [0, len(DATA)]
+    assert reader.block_boundaries == [0, len(DATA)]
+
+    assert read_all(reader) == DATA_RANDOM[5:]
+    assert reader.read() == b""
+    assert reader.pos == len(DATA) + len(DATA_RANDOM)
+
+
+def test_readinto() -> None:
+    reader = create_reader(STREAM)
+    buffer = bytearray(5)
+    assert reader.readinto(memoryview(buffer)) == 5
+    assert buffer == DATA[:5]
+    assert reader.readinto(memoryview(buffer)[:0]) == 0
+
+    output = bytearray(len(DATA))
+    view = memoryview(output)
+    size = 5
+    while read_size := reader.readinto(view[size:]):
+        size += read_size
+    assert size == len(DATA)
+    assert output[5:] == DATA[5:]
+
+
+@pytest.mark.parametrize("check", [CHECK_NONE, CHECK_CRC32])
+def test_read_empty_block_stream(check: int) -> None:
+    data = compress(b"", check=check) + compress(b"abc", check=check)
+    reader = create_reader(data)
+    assert read_all(reader) == b"abc"
+    assert reader.stream_boundaries == [0, 0]
+    assert reader.block_boundaries == [0]
+
+
+def test_read_memlimit() -> None:
+    reader = SequentialRead(BytesIO(STREAM), memlimit=1024)
+    with pytest.raises(
+        XZError,
+        match=r"^block: error while decompressing: Memory usage limit exceeded$",
+    ):
+        read_all(reader)
+
+
+@pytest.mark.parametrize(
+    ["data", "message"],
+    [
+        pytest.param(b"", "file: no streams", id="empty"),
+        pytest.param(b"\x00" * 12, "header magic", id="header"),
+        pytest.param(STREAM[:12], "stream: data eof", id="stream-truncated"),
+        pytest.param(STREAM[:13], "block header length", id="block-header-truncated"),
+        pytest.param(
+            STREAM[:BLOCK_HEADER_END], "block: data eof", id="block-data-missing"
+        ),
+        pytest.param(
+            STREAM[: BLOCK_HEADER_END + 2], "block: data eof", id="chunk-truncated"
+        ),
+        pytest.param(
+            STREAM[: BLOCK_HEADER_END + 10], "block: data eof", id="data-truncated"
+        ),
+        pytest.param(
+            STREAM[:BLOCK_HEADER_END] + b"\x03",
+            "block: invalid LZMA2 chunk",
+            id="chunk-invalid",
+        ),
+        pytest.param(
+            STREAM[:-40] + bytes([STREAM[-40] ^ 1]) + STREAM[-39:],
+            "block: error while decompressing: Corrupt input data",
+            id="check-invalid",
+        ),
+        pytest.param(
+            STREAM[: INDEX_START - 1],
+            "block: error while decompressing: Corrupt input data",
+            id="check-truncated",
+        ),
+        pytest.param(STREAM[:INDEX_START], "stream: data eof", id="index-missing"),
+        pytest.param(
+            STREAM[:INDEX_START] + b"\x00",
+            "stream: index does not match blocks",
+            id="index-truncated",
+        ),
+        pytest.param(
+            STREAM[:-8] + b"\x00" * 8,
+            "stream: index does not match blocks",
+            id="footer-invalid",
+        ),
+        pytest.param(STREAM + b"\x00\x00", "header length", id="padding-invalid"),
+        pytest.param(STREAM + b"garbage!" * 2, "header magic", id="trailing-garbage"),
+    ],
+)
+def test_read_invalid(data: bytes, message: str) -> None:
+    with pytest.raises(XZError, match=rf"^{message}$"):
+        read_all(create_reader(data))
@@ -0,0 +1,126 @@
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+import os
+from pathlib import Path
+
+import pytest
+
+from xz.sidecar import get_signature, load_index, save_index
+
+STREAMS = [(0, 100, 1, [(24, 4), (42, 1337)]), (120, 200, 4, [(64, 10)])]
+
+
+def test_get_signature_fileobj() -> None:
+    assert get_signature(BytesIO(b"abcdefghijklmnopqrstuvwxyz")) == {
+        "size": 26,
+        "mtime_ns": None,
+        "footer": b"opqrstuvwxyz".hex(),
+    }
+    assert get_signature(BytesIO(b"abc")) == {
+        "size": 3,
+        "mtime_ns": None,
+        "footer": b"abc".hex(),
+    }
+
+
+def test_get_signature_file(tmp_path: Path) -> None:
+    file_path = tmp_path / "file.xz"
+    file_path.write_bytes(b"abcdefghijklmnopqrstuvwxyz")
+    os.utime(file_path, ns=(1_000_000_000, 1_234_567_890))
+
+    with file_path.open("rb") as fin:
+        assert get_signature(fin) == {
+            "size": 26,
+            "mtime_ns": 1_234_567_890,
+            "footer": b"opqrstuvwxyz".hex(),
+        }
+
+
+def test_save_load(tmp_path: Path) -> None:
+    index_path = tmp_path / "file.xz.idx"
+    signature = get_signature(BytesIO(b"abcdefghijklmnopqrstuvwxyz"))
+
+    save_index(index_path, signature, STREAMS)
+    assert load_index(index_path, signature) == STREAMS
+    assert load_index(os.fspath(index_path), signature) == STREAMS
+    assert [path.name for path in tmp_path.iterdir()] == ["file.xz.idx"]
+
+    # refresh
+    save_index(index_path, signature, STREAMS[:1])
+    assert load_index(index_path, signature) == STREAMS[:1]
+
+
+def test_save_concurrent(tmp_path: Path) -> None:
+    index_path = tmp_path / "file.xz.idx"
+    signature = get_signature(BytesIO(b"abcdefghijklmnopqrstuvwxyz"))
+
+    # a temporary file left by another save is neither used nor removed
+    other_tmp_path = tmp_path / "file.xz.idx.tmp"
+    other_tmp_path.write_text("partial", encoding="ascii")
+
+    with ThreadPoolExecutor(4) as executor:
+        list(
+            executor.map(
+                lambda streams: save_index(index_path, signature, streams),
+                [STREAMS, STREAMS[:1]] * 20,
+            )
+        )
+    assert load_index(index_path, signature) in (STREAMS, STREAMS[:1])
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "file.xz.idx",
+        "file.xz.idx.tmp",
+    ]
+    assert other_tmp_path.read_text(encoding="ascii") == "partial"
+
+
+def test_save_error(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    index_path = tmp_path / "file.xz.idx"
+
+    def replace_error(_: Path, target: Path) -> None:
+        raise PermissionError(target)
+
+    monkeypatch.setattr(Path, "replace", replace_error)
+    with pytest.raises(PermissionError):
+        save_index(index_path, {}, STREAMS)
+    assert not list(tmp_path.iterdir())  # temporary file removed
+
+
+@pytest.mark.parametrize("key", ["size", "mtime_ns", "footer"])
+def test_load_signature_mismatch(tmp_path: Path, key: str) -> None:
+    index_path = tmp_path / "file.xz.idx"
+    signature = get_signature(BytesIO(b"abcdefghijklmnopqrstuvwxyz"))
+    save_index(index_path, signature, STREAMS)
+
+    assert load_index(index_path, {**signature, key: 42}) is None
+
+
+def test_load_missing(tmp_path: Path) -> None:
+    assert load_index(tmp_path / "file.xz.idx", {}) is None
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        "",
+        "not json",
+        "[]",
+        "{}",
+        '{"version":2,"streams":[]}',
+        '{"version":1}',
+        '{"version":1,"streams":42}',
+        '{"version":1,"streams":[[0,100,1]]}',
+        '{"version":1,"streams":[[0,100,1,[[1]]]]}',
+        '{"version":1,"streams":[[0,100,1,[["a",1]]]]}',
+        "\xe9",
+    ],
+)
+def test_load_invalid(tmp_path: Path, content: str) -> None:
+    index_path = tmp_path / "file.xz.idx"
+    index_path.write_text(content, encoding="latin-1")
+    assert load_index(index_path, {}) is None
+
+
+def test_load_valid_empty(tmp_path: Path) -> None:
+    index_path = tmp_path / "file.xz.idx"
+    index_path.write_text('{"version":1,"streams":[]}', encoding="ascii")
+    assert load_index(index_path, {}) == []
@@ -0,0 +1,158 @@
+from typing import Union
+from unittest.mock import Mock
+
+from xz.strategy import (
+    CostBlockReadStrategy,
+    MemoryBlockReadStrategy,
+    RollingBlockReadStrategy,
+    SharedBlockReadStrategy,
+)
+
+
+def create_block(
+    strategy: Union[
+        RollingBlockReadStrategy,
+        MemoryBlockReadStrategy,
+        CostBlockReadStrategy,
+        SharedBlockReadStrategy,
+    ],
+    read_memory_usage: int = 0,
+) -> Mock:
+    block = Mock()
+    block.read_memory_usage = read_memory_usage
+    block.operation = None
+    block.clear.side_effect = lambda: strategy.on_delete(block)
+    return block
+
+
+def test_rolling() -> None:
+    strategy = RollingBlockReadStrategy(3)
+    assert strategy.max_block_read_nb == 3
+    blocks = [create_block(strategy) for _ in range(5)]
+
+    for block in blocks[:3]:
+        strategy.on_create(block)
+        strategy.on_read(block)
+    assert list(strategy.block_reads) == blocks[:3]
+
+    # block 0 becomes the most recently used
+    strategy.on_read(blocks[0])
+    assert list(strategy.block_reads) == [blocks[1], blocks[2], blocks[0]]
+
+    # least recently used is cleared
+    strategy.on_create(blocks[3])
+    blocks[1].clear.assert_called_once_with()
+    assert list(strategy.block_reads) == [blocks[2], blocks[0], blocks[3]]
+
+    # deleted from outside of the strategy
+    blocks[0].clear()
+    assert list(strategy.block_reads) == [blocks[2], blocks[3]]
+    strategy.on_create(blocks[4])
+    assert list(strategy.block_reads) == [blocks[2], blocks[3], blocks[4]]
+    assert not blocks[2].clear.called
+
+    # cleared concurrently by another thread
+    strategy.on_delete(blocks[0])
+    strategy.on_read(blocks[0])
+    assert list(strategy.block_reads) == [blocks[2], blocks[3], blocks[4]]
+
+
+def test_memory() -> None:
+    strategy = MemoryBlockReadStrategy(100)
+    assert strategy.max_memory == 100
+    blocks = [
+        create_block(strategy, read_memory_usage)
+        for read_memory_usage in (30, 40, 20, 50, 150)
+    ]
+
+    for block in blocks[:3]:
+        strategy.on_create(block)
+        strategy.on_read(block)
+    assert list(strategy.block_reads) == blocks[:3]
+    assert strategy.memory == 90
+
+    # block 0 becomes the most recently used
+    strategy.on_read(blocks[0])
+
+    # least recently used are cleared until under the limit
+    strategy.on_create(blocks[3])
+    blocks[1].clear.assert_called_once_with()
+    assert not blocks[2].clear.called
+    assert list(strategy.block_reads) == [blocks[2], blocks[0], blocks[3]]
+    assert strategy.memory == 100
+
+    # deleted from outside of the strategy
+    blocks[0].clear()
+    assert list(strategy.block_reads) == [blocks[2], blocks[3]]
+    assert strategy.memory == 70
+
+    # block bigger than the limit is kept alone
+    strategy.on_create(blocks[4])
+    assert list(strategy.block_reads) == [blocks[4]]
+    assert strategy.memory == 150
+
+
+def test_cost() -> None:
+    strategy = CostBlockReadStrategy(2)
+    assert strategy.max_block_read_nb == 2
+    blocks = [create_block(strategy) for _ in range(6)]
+
+    def create_and_read(index: int, pos: int) -> None:
+        strategy.on_create(blocks[index])
+        blocks[index].operation = Mock(pos=pos)
+        strategy.on_read(blocks[index])
+
+    create_and_read(0, 900)
+    create_and_read(1, 10)
+    assert list(strategy.block_reads) == blocks[:2]
+
+    # block 1 is cheaper to create again, even if more recently used
+    create_and_read(2, 50)
+    blocks[1].clear.assert_called_once_with()
+    assert list(strategy.block_reads) == [blocks[0], blocks[2]]
+    assert strategy.inflation == 10
+
+    create_and_read(3, 0)
+    blocks[2].clear.assert_called_once_with()
+    assert list(strategy.block_reads) == [blocks[0], blocks[3]]
+    assert strategy.inflation == 60
+
+    # recently used blocks eventually outweight costly ones
+    create_and_read(4, 1000)
+    blocks[3].clear.assert_called_once_with()
+    create_and_read(5, 0)
+    blocks[0].clear.assert_called_once_with()
+    assert list(strategy.block_reads) == [blocks[4], blocks[5]]
+    assert strategy.inflation == 900
+
+    # reading moves the block to the end
+    strategy.on_read(blocks[4])
+    assert list(strategy.block_reads) == [blocks[5], blocks[4]]
+
+
+def test_shared() -> None:
+    strategy = SharedBlockReadStrategy(RollingBlockReadStrategy(2))
+    assert isinstance(strategy.strategy, RollingBlockReadStrategy)
+    wrapped = strategy.strategy
+    blocks = [create_block(strategy) for _ in range(3)]
+
+    for block in blocks:
+        strategy.on_create(block)
+        strategy.on_read(block)
+    # clearing block 0 from the wrapped strategy went through the wrapper
+    blocks[0].clear.assert_called_once_with()
+    assert list(wrapped.block_reads) == blocks[1:]
+
+    # calls for blocks that are not tracked anymore are ignored
+    strategy.on_delete(blocks[0])
+    strategy.on_read(blocks[0])
+    assert list(wrapped.block_reads) == blocks[1:]
+
+    strategy.on_delete(blocks[1])
+    assert list(wrapped.block_reads) == blocks[2:]
+
+
+def test_shared_default() -> None:
+    strategy = SharedBlockReadStrategy()
+    assert isinstance(strategy.strategy, RollingBlockReadStrategy)
+    assert strategy.strategy.max_block_read_nb == 8
@@ -1,13 +1,19 @@
+from array import array
 from collections.abc import Callable
-from io import SEEK_CUR, SEEK_END, BytesIO, UnsupportedOperation
-from typing import cast
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from functools import partial
+from io import SEEK_CUR, SEEK_END, SEEK_SET, BytesIO, UnsupportedOperation
+from typing import Optional, TypeVar, cast
 from unittest.mock import Mock, call
 
 import pytest
 
+from xz.block import XZBlock
 from xz.common import XZError
 from xz.io import IOProxy
-from xz.stream import XZStream
+from xz.stream import XZStream, _BlockIndex
+
+T = TypeVar("T")
 
 # a stream with two blocks (lengths: 100, 90)
 STREAM_BYTES = bytes.fromhex(
@@ -40,12 +46,14 @@ def test_parse(data_pattern_locate: Callable[[bytes], tuple[int, int]]) -> None:
     # make sure we don't read the blocks
     assert fileobj.method_calls == [
         call.seek(-12, SEEK_CUR),
+        call.tell(),
         call.read(12),
         call.seek(-24, SEEK_CUR),
         call.read(12),
         call.seek(-204, SEEK_CUR),  # blocks are skipped over here
         call.read(12),
         call.seek(-12, SEEK_CUR),
+        call.tell(),
     ]
 
     # fileobj should be at the beginning of the stream
@@ -79,6 +87,65 @@ def test_parse(data_pattern_locate: Callable[[bytes], tuple[int, int]]) -> None:
     assert data_pattern_locate(stream.read()) == (170, 20)
 
 
+def test_parse_lazy(data_pattern_locate: Callable[[bytes], tuple[int, int]]) -> None:
+    fileobj = Mock(wraps=BytesIO(b"\xff" * 1000 + STREAM_BYTES + b"\xee" * 1000))
+    fileobj.seek(-1000, SEEK_END)
+    fileobj.method_calls.clear()
+
+    # parse stream
+    stream = XZStream.parse(fileobj, lazy=True)
+    assert stream.check == 1
+    assert len(stream) == 190
+
+    # make sure we don't read the header
+    assert fileobj.method_calls == [
+        call.seek(-12, SEEK_CUR),
+        call.tell(),
+        call.read(12),
+        call.seek(-24, SEEK_CUR),
+        call.read(12),
+        call.seek(-204, SEEK_CUR),  # blocks are skipped over here
+        call.tell(),
+    ]
+    assert fileobj.tell() == 1000
+    fileobj.method_calls.clear()
+
+    # header is read when the blocks are needed
+    assert stream.block_boundaries == [0, 100]
+    assert fileobj.method_calls == [call.seek(1000, SEEK_SET), call.read(12)]
+    assert len(stream) == 190
+    stream.seek(90)
+    assert data_pattern_locate(stream.read(20)) == (90, 20)
+
+
+def test_parse_lazy_threads() -> None:
+    fileobj = BytesIO(STREAM_BYTES)
+    fileobj.seek(0, SEEK_END)
+    stream = XZStream.parse(fileobj, lazy=True)
+
+    # the blocks are created by another thread while waiting for the lock
+    lock = Mock()
+    lock.__enter__ = Mock(side_effect=lambda: stream._create_lazy_blocks())
+    lock.__exit__ = Mock(return_value=None)
+    stream._lazy_lock = lock
+    assert stream.block_boundaries == [0, 100]
+    lock.__enter__.assert_called_once_with()
+    assert len(stream) == 190
+
+
+def test_parse_lazy_invalid_stream_flags_missmatch() -> None:
+    fileobj = BytesIO(
+        bytes.fromhex(
+            "fd377a585a000004e6d6b446000000001cdf44219042990d010000000001595a"
+        )
+    )
+    fileobj.seek(0, SEEK_END)
+    stream = XZStream.parse(fileobj, lazy=True)
+    assert len(stream) == 0
+    with pytest.raises(XZError, match=r"^stream: inconsistent check value$"):
+        stream.block_boundaries
+
+
 def test_parse_invalid_stream_flags_missmatch() -> None:
     fileobj = BytesIO(
         bytes.fromhex(
@@ -112,6 +179,144 @@ def test_parse_empty_stream() -> None:
     assert stream.block_boundaries == []
 
 
+def test_from_records(data_pattern_locate: Callable[[bytes], tuple[int, int]]) -> None:
+    fileobj = BytesIO(b"\xff" * 1000 + STREAM_BYTES)
+
+    stream = XZStream.from_records(
+        fileobj, 1000, 1000 + len(STREAM_BYTES), 1, [(89, 100), (85, 90)]
+    )
+    assert stream.check == 1
+    assert len(stream) == 190
+    assert stream.block_boundaries == [0, 100]
+    assert stream.records == [(89, 100), (85, 90)]
+    stream.seek(90)
+    assert data_pattern_locate(stream.read(20)) == (90, 20)
+
+
+def test_records() -> None:
+    fileobj = BytesIO(STREAM_BYTES)
+    fileobj.seek(0, SEEK_END)
+    assert XZStream.parse(fileobj).records == [(89, 100), (85, 90)]
+
+
+def test_iter_blocks() -> None:
+    fileobj = BytesIO(STREAM_BYTES)
+    fileobj.seek(0, SEEK_END)
+    stream = XZStream.parse(fileobj)
+    blocks = list(stream._fileobjs.values())
+
+    assert list(stream.iter_blocks()) == [(0, blocks[0]), (100, blocks[1])]
+    assert list(stream.iter_blocks(42)) == [(0, blocks[0]), (100, blocks[1])]
+    assert list(stream.iter_blocks(100)) == [(100, blocks[1])]
+    assert list(stream.iter_blocks(1000)) == [(100, blocks[1])]
+
+
+def test_blocks_created_on_demand() -> None:
+    fileobj = BytesIO(STREAM_BYTES)
+    fileobj.seek(0, SEEK_END)
+    stream = XZStream.parse(fileobj)
+    assert not stream._fileobjs._created
+
+    block = stream._fileobjs[120]
+    block_fileobj = cast("IOProxy", block.fileobj)
+    assert block_fileobj.fileobj is fileobj  # not proxied through the stream
+    assert (block_fileobj.start, len(block_fileobj)) == (104, 88)
+    assert (block.unpadded_size, block.uncompressed_size) == (85, 90)
+    assert stream._fileobjs[100] is block  # same object while in use
+    assert list(stream._fileobjs._created) == [100]
+
+    del block
+    assert not stream._fileobjs._created  # freed when not used anymore
+
+
+def test_block_index() -> None:
+    def create_block(offset: int, unpadded_size: int, uncompressed_size: int) -> Mock:
+        return Mock(
+            offset=offset,
+            unpadded_size=unpadded_size,
+            uncompressed_size=uncompressed_size,
+        )
+
+    index = _BlockIndex(create_block)
+    assert repr(index) == "_BlockIndex<0 blocks>"
+    assert index.end_offset(12) == 12
+    with pytest.raises(KeyError):
+        index.last_item
+
+    index.add_records(0, 12, array("Q"))
+    assert not index
+    index.add_records(0, 12, array("Q", [89, 100, 85, 90]))
+    assert repr(index) == "_BlockIndex<2 blocks>"
+    assert list(index) == [0, 100]
+    assert list(index.iter_records()) == [(89, 100), (85, 90)]
+    assert cast("Mock", index[150]).offset == 104
+    assert index.last_item.uncompressed_size == 90
+    assert index.end_offset(12) == 192
+
+    # set blocks (e.g. when writing)
+    written = cast(
+        "XZBlock",
+        Mock(unpadded_size=42, uncompressed_size=50, fileobj=Mock(start=192)),
+    )
+    index[190] = written
+    assert index.end_offset(12) == 236
+    index[50] = Mock(fileobj=Mock(start=0))
+    index[50] = written  # replace
+    assert list(index) == [0, 50, 100, 190]
+    assert index[42].uncompressed_size == 50  # first block is now shorter
+    assert index.get_with_index(60) == (50, written)
+    assert list(index.iter_records()) == [(89, 50), (42, 50), (85, 90), (42, 50)]
+    assert [key for key, _ in index.items_from(120)] == [100, 190]
+
+    # seal blocks no longer written
+    writing = cast(
+        "XZBlock",
+        Mock(unpadded_size=0, uncompressed_size=0, fileobj=Mock(start=236)),
+    )
+    writing.writable.return_value = True  # type: ignore[attr-defined]
+    index[240] = writing
+    written.writable.return_value = False  # type: ignore[attr-defined]
+    index.seal()
+    assert index._dict == {240: writing}
+    assert index.created_blocks() == [writing, written, written]
+    assert index[50] is index[190] is written  # same object while in use
+    writing.writable.return_value = False  # type: ignore[attr-defined]
+    index.seal()
+    assert not index._dict
+    assert list(index.iter_records()) == [
+        (89, 50),
+        (42, 50),
+        (85, 90),
+        (42, 50),
+        (0, 0),
+    ]
+    assert index.end_offset(12) == 236
+
+    # delete blocks
+    del index[240]
+    with pytest.raises(KeyError):
+        del index[120]
+    del index[190]
+    del index[50]
+    assert list(index.iter_records()) == [(89, 100), (85, 90)]
+    assert index.end_offset(12) == 192
+
+    # invalid keys
+    with pytest.raises(TypeError):
+        index["foo"] = written  # type: ignore[index]
+    with pytest.raises(TypeError):
+        index["foo"]  # type: ignore[index]
+    with pytest.raises(TypeError):
+        index.items_from("foo")  # type: ignore[arg-type]
+
+
+def test_iter_blocks_empty_stream() -> None:
+    fileobj = BytesIO(STREAM_BYTES_EMPTY)
+    fileobj.seek(0, SEEK_END)
+    stream = XZStream.parse(fileobj)
+    assert list(stream.iter_blocks()) == []
+
+
 def test_write(data_pattern: bytes) -> None:
     # init with more size than what will be written at the end
     init_size = 1024
@@ -159,6 +364,120 @@ def test_write_from_existing_stream(data_pattern: bytes) -> None:
     assert fileobj.getvalue() == STREAM_BYTES
 
 
+class LazyFuture(Future[T]):
+    """Future computed when its result is first needed."""
+
+    def __init__(self, func: Callable[[], T]) -> None:
+        super().__init__()
+        self.func = func
+
+    def result(self, timeout: Optional[float] = None) -> T:
+        if not self.done():
+            self.set_result(self.func())
+        return super().result(timeout)
+
+
+class LazyExecutor(Executor):
+    def submit(
+        self, fn: Callable[..., T], /, *args: object, **kwargs: object
+    ) -> Future[T]:
+        return LazyFuture(partial(fn, *args, **kwargs))
+
+
+def test_write_executor(data_pattern: bytes) -> None:
+    fileobj = BytesIO()
+
+    with (
+        ThreadPoolExecutor(2) as executor,
+        XZStream(
+            IOProxy(fileobj, 0, 0), 1, block_size=100, executor=executor
+        ) as stream,
+    ):
+        stream.change_block()
+        assert stream.block_boundaries == []
+
+        stream.write(data_pattern[:60])
+        assert stream.block_boundaries == [0]
+
+        stream.write(data_pattern[60:150])  # block is cut
+        assert stream.block_boundaries == [0, 100]
+
+        stream.change_block()
+        assert stream.block_boundaries == [0, 100]
+
+        stream.write(data_pattern[150:190])
+        assert stream.block_boundaries == [0, 100, 150]
+
+    assert stream.block_boundaries == [0, 100, 150]
+    fileobj.seek(0, SEEK_END)
+    stream = XZStream.parse(fileobj)
+    assert stream.block_boundaries == [0, 100, 150]
+    assert stream.read() == data_pattern[:190]
+
+
+def test_write_executor_same_output(data_pattern: bytes) -> None:
+    with ThreadPoolExecutor(2) as executor:
+        for executor_used in (None, executor):
+            fileobj = BytesIO()
+            with XZStream(
+                IOProxy(fileobj, 0, 0), 1, block_size=100, executor=executor_used
+            ) as stream:
+                stream.write(data_pattern[:190])
+            assert fileobj.getvalue() == STREAM_BYTES
+
+
+def test_write_executor_pending_blocks(data_pattern: bytes) -> None:
+    fileobj = BytesIO()
+
+    with XZStream(
+        IOProxy(fileobj, 0, 0),
+        1,
+        block_size=10,
+        executor=LazyExecutor(),
+        max_pending_blocks=2,
+    ) as stream:
+        for pos in range(0, 60, 10):
+            stream.write(data_pattern[pos : pos + 10])
+        # first blocks are written when too many are waiting
+        assert len(stream._block_futures) == 2
+        assert len(stream._blocks) == 3
+        assert len(stream._block_buffer) == 10
+
+        # reading ends the block being buffered
+        stream.seek(0)
+        assert stream.read() == data_pattern[:60]
+        assert not stream._block_futures
+        assert not stream._block_buffer
+        assert stream.block_boundaries == [0, 10, 20, 30, 40, 50]
+
+        stream.write(data_pattern[60:65])
+        stream.change_block()
+        assert len(stream._block_futures) == 1
+        assert stream.block_boundaries == [0, 10, 20, 30, 40, 50, 60]
+        assert not stream._block_futures
+
+    fileobj.seek(0, SEEK_END)
+    stream = XZStream.parse(fileobj)
+    assert stream.block_boundaries == [0, 10, 20, 30, 40, 50, 60]
+    assert stream.read() == data_pattern[:65]
+
+
+def test_write_executor_from_lazy_stream(data_pattern: bytes) -> None:
+    fileobj = BytesIO(STREAM_BYTES)
+    fileobj.seek(0, SEEK_END)
+    with XZStream.parse(fileobj, lazy=True) as stream:
+        stream.block_size = 50
+        stream.executor = LazyExecutor()
+        stream.seek(190)
+        stream.write(data_pattern[190:300])
+        assert stream.block_boundaries == [0, 100, 190, 240, 290]
+
+    fileobj.seek(0, SEEK_END)
+    stream = XZStream.parse(fileobj)
+    assert stream.block_boundaries == [0, 100, 190, 240, 290]
+    assert stream.read() == data_pattern[:300]
+
+
 def test_truncate_and_write(data_pattern: bytes) -> None:
     fileobj = BytesIO(
         bytes.fromhex(